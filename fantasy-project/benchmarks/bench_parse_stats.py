@@ -0,0 +1,97 @@
+"""
+Microbenchmark: table-driven parse_stats vs the old substring cascade
+Runs over the gamelog fixtures in benchmarks/fixtures/gamelogs
+
+    python benchmarks/bench_parse_stats.py [--repeat 2000]
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from stats_scraper import parse_stats, UNKNOWN_STATS
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'gamelogs')
+
+def legacy_parse_stats(stats_data):
+    """parse_stats as it was before the lookup table, kept for comparison"""
+    parsed_stats = {
+        'passing_yards': 0, 'passing_touchdowns': 0, 'completions': 0,
+        'passing_attempts': 0, 'interceptions': 0, 'rushing_attempts': 0,
+        'rushing_yards': 0, 'rushing_touchdowns': 0, 'receptions': 0,
+        'receiving_yards': 0, 'receiving_touchdowns': 0, 'receiving_targets': 0
+    }
+    for stat_group in stats_data:
+        category = stat_group.get('name', '').lower()
+        for stat in stat_group.get('stats', []):
+            name = stat.get('name', '').lower()
+            value = stat.get('value', 0)
+            if 'passing' in category:
+                if 'yards' in name:
+                    parsed_stats['passing_yards'] = value
+                elif 'touchdown' in name:
+                    parsed_stats['passing_touchdowns'] = value
+                elif 'completion' in name and 'percentage' not in name:
+                    parsed_stats['completions'] = value
+                elif 'attempt' in name:
+                    parsed_stats['passing_attempts'] = value
+                elif 'interception' in name:
+                    parsed_stats['interceptions'] = value
+            elif 'rushing' in category:
+                if 'yards' in name:
+                    parsed_stats['rushing_yards'] = value
+                elif 'touchdown' in name:
+                    parsed_stats['rushing_touchdowns'] = value
+                elif 'attempt' in name:
+                    parsed_stats['rushing_attempts'] = value
+            elif 'receiving' in category:
+                if 'yards' in name:
+                    parsed_stats['receiving_yards'] = value
+                elif 'touchdown' in name:
+                    parsed_stats['receiving_touchdowns'] = value
+                elif 'reception' in name and 'yard' not in name:
+                    parsed_stats['receptions'] = value
+                elif 'target' in name:
+                    parsed_stats['receiving_targets'] = value
+    return parsed_stats
+
+def load_events():
+    events = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES, '*.json'))):
+        with open(path) as f:
+            events.extend(event['statistics'] for event in json.load(f)['events'])
+    return events
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=2000, help='passes over the fixture events')
+    args = parser.parse_args()
+
+    events = load_events()
+    stat_count = sum(len(group['stats']) for event in events for group in event)
+
+    results = {}
+    for label, parse in [('legacy', legacy_parse_stats), ('table', parse_stats)]:
+        seconds = min(timeit.repeat(lambda: [parse(event) for event in events],
+                                    number=args.repeat, repeat=3))
+        results[label] = seconds
+        print(f"{label:>6}: {seconds / (args.repeat * stat_count) * 1e9:7.1f} ns/stat  "
+              f"{args.repeat * len(events) / seconds:10.0f} events/s")
+
+    print(f"speedup: {results['legacy'] / results['table']:.2f}x "
+          f"({len(events)} events, {stat_count} stats per pass)")
+
+    # Values the substring cascade got wrong, e.g. yardsPerPassAttempt landing in passing_yards
+    clobbered = sum(
+        legacy_parse_stats(event)[column] != value
+        for event in events for column, value in parse_stats(event).items()
+    )
+    print(f"fields the legacy parser overwrote: {clobbered}")
+    print(f"unmapped stats: {dict(UNKNOWN_STATS.most_common(5))}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Offline benchmark of each pipeline stage against the recorded fixtures
+Nothing touches ESPN or RotoWire: rosters, gamelogs and players.php are
+served by benchmarks/stub_server.py and every database is a temp file.
+
+    python benchmarks/bench_pipeline.py [--repeat 5] [--slate-size 2000] [--output run.json]
+    python benchmarks/bench_pipeline.py --compare run.json     # exit 1 on a regression
+
+Results are JSON: per stage the item count, run times, throughput
+(items/s) and latency (ms per item, median and p95 over repeats).
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from stub_server import StubServer, load_fixture, load_gamelogs
+from config import ROTOWIRE_TO_ESPN_TEAM_IDS
+from database import create_database, insert_players, refresh_players
+from player_lookup import build_player_lookup, find_player_by_name, PlayerMatcher, NameResolver
+from scraper import scrape_rotowire_api, store_weekly_data, weekly_row
+from stats_scraper import parse_stats
+
+SKILL_POSITIONS = {'QB', 'RB', 'FB', 'WR', 'TE'}
+GAMELOG_PASSES = 500   # the gamelog fixtures are tiny - parse them this many times per run
+
+def synthetic_slate(rosters, size, seed=0):
+    """
+    players.php entries for size players drawn from the roster fixture
+    About one in ten names is written the way RotoWire tends to differ from
+    ESPN (suffix dropped, initials without periods)
+    """
+    rng = random.Random(seed)
+    skill = [(athlete, group) for roster in rosters.values() for group in roster['athletes']
+             for athlete in group['items'] if athlete['position']['abbreviation'] in SKILL_POSITIONS]
+    teams = {athlete['id']: team_id for team_id, roster in rosters.items()
+             for group in roster['athletes'] for athlete in group['items']}
+    abbrevs = {str(team_id): abbrev for abbrev, team_id in ROTOWIRE_TO_ESPN_TEAM_IDS.items()}
+
+    slate = []
+    for i in range(size):
+        athlete, _ = skill[i % len(skill)]
+        name = athlete['displayName']
+        if rng.random() < 0.1:
+            name = re.sub(r'\b([A-Z])\.([A-Z])\.', r'\1\2', re.sub(r' (Jr\.|Sr\.|II|III)$', '', name))
+        first, _, last = name.partition(' ')
+        team = abbrevs[teams[athlete['id']]]
+        slate.append({
+            'firstName': first, 'lastName': last,
+            'rotoPos': athlete['position']['abbreviation'],
+            'team': {'abbr': team}, 'opponent': {'team': rng.choice(list(abbrevs.values()))},
+            'salary': rng.randrange(2000, 9000, 100), 'pts': round(rng.uniform(0, 25), 2),
+            'rostership': round(rng.uniform(0, 40), 1), 'injuryStatus': None,
+        })
+    return slate
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the pipeline's progress prints while a stage is timed"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, round(pct / 100 * (len(values) - 1)))]
+
+def time_stage(run, repeat, setup=None):
+    """Time run() repeat times (after an optional untimed setup()); run returns the items processed"""
+    seconds = []
+    items = 0
+    for _ in range(repeat):
+        state = setup() if setup else None
+        with quiet():
+            started = time.perf_counter()
+            items = run(state) if setup else run()
+            seconds.append(time.perf_counter() - started)
+
+    median = statistics.median(seconds)
+    return {
+        'items': items,
+        'runs': len(seconds),
+        'seconds': [round(s, 6) for s in seconds],
+        'median_s': round(median, 6),
+        'throughput_per_s': round(items / median, 1) if median else None,
+        'latency_ms': {
+            'median': round(median / max(items, 1) * 1e3, 6),
+            'p95': round(percentile(seconds, 95) / max(items, 1) * 1e3, 6),
+        },
+    }
+
+def run_benchmarks(repeat=5, slate_size=2000, legacy_names=200, seed=0):
+    rosters = load_fixture('rosters.json')
+    recorded = load_fixture('players_2025-09-25.json')
+    slate = recorded + synthetic_slate(rosters, slate_size, seed)
+    events = [event['statistics'] for gamelog in load_gamelogs() for event in gamelog['events']]
+    events *= GAMELOG_PASSES
+    stages = {}
+
+    with tempfile.TemporaryDirectory() as tmp, StubServer(rosters, slates={1: slate}) as stub:
+        def fresh_db(name):
+            path = os.path.join(tmp, f"{name}.db")
+            for suffix in ['', '-wal', '-shm']:
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+            with quiet():
+                create_database(path)
+            return path
+
+        lookup = {}
+        def fetch():
+            lookup.clear()
+            lookup.update(build_player_lookup(base_url=stub.url, requests_per_second=1000, cache=False))
+            return len(lookup)
+        stages['build_player_lookup'] = time_stage(fetch, repeat)
+
+        def players_db(name):
+            path = fresh_db(name)
+            with quiet():
+                insert_players(lookup, path)
+            return path
+
+        def insert(db_path):
+            insert_players(lookup, db_path)
+            return len(lookup)
+        stages['insert_players'] = time_stage(insert, repeat, setup=lambda: fresh_db('insert_players'))
+
+        def refresh(db_path):
+            refresh_players(lookup, db_path)
+            return len(lookup)
+        stages['refresh_players_unchanged'] = time_stage(refresh, repeat, setup=lambda: players_db('refresh'))
+
+        names = [(f"{p['firstName']} {p['lastName']}", p['team']['abbr'], p['rotoPos']) for p in slate]
+        sample = names[:legacy_names]
+        def legacy_match():
+            for name, team, _ in sample:
+                find_player_by_name(lookup, name, team)
+            return len(sample)
+        stages['find_player_by_name'] = time_stage(legacy_match, repeat)
+
+        matcher = PlayerMatcher(lookup)
+        stages['build_player_matcher'] = time_stage(lambda: len(PlayerMatcher(lookup).names), repeat)
+        stages['match_many'] = time_stage(
+            lambda: len(matcher.match_many((name, team) for name, team, _ in names)), repeat)
+        stages['name_resolver_cold'] = time_stage(
+            lambda db_path: len(NameResolver(matcher, db_path).match_many(names)), repeat,
+            setup=lambda: fresh_db('resolver'))
+
+        stages['parse_stats'] = time_stage(lambda: len([parse_stats(event) for event in events]), repeat)
+
+        matches = matcher.match_many((name, team) for name, team, _ in names)
+        rows = [weekly_row(player, found[0]) for player, found in zip(slate, matches) if found]
+        def store(db_path):
+            store_weekly_data(rows, 1, db_path)
+            return len(rows)
+        stages['store_weekly_data'] = time_stage(store, repeat, setup=lambda: fresh_db('weekly'))
+
+        def stored_slate():
+            path = fresh_db('weekly_rerun')
+            with quiet():
+                store_weekly_data(rows, 1, path)
+            return path
+        stages['store_weekly_data_unchanged'] = time_stage(store, repeat, setup=stored_slate)
+
+        def scrape(db_path):
+            matched, unmatched = scrape_rotowire_api(1, cache=False, db_path=db_path, base_url=stub.url)
+            return matched + len(unmatched)
+        stages['scrape_rotowire_api'] = time_stage(scrape, repeat, setup=lambda: players_db('scrape'))
+
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': repeat,
+            'slate_size': len(slate),
+            'roster_players': len(lookup),
+            'gamelog_events': len(events),
+        },
+        'stages': stages,
+    }
+
+def compare(current, baseline, tolerance):
+    """Stages whose throughput fell more than tolerance below the baseline run"""
+    regressions = {}
+    for stage, result in current['stages'].items():
+        before = baseline.get('stages', {}).get(stage, {}).get('throughput_per_s')
+        after = result['throughput_per_s']
+        if before and after and after < before * (1 - tolerance):
+            regressions[stage] = {'baseline': before, 'current': after, 'ratio': round(after / before, 3)}
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per stage')
+    parser.add_argument('--slate-size', type=int, default=2000, help='synthetic players.php entries')
+    parser.add_argument('--legacy-names', type=int, default=200,
+                        help='names for the linear find_player_by_name scan')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the JSON results here as well as stdout')
+    parser.add_argument('--compare', help='baseline JSON from an earlier run')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed throughput drop against the baseline')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.repeat, args.slate_size, args.legacy_names, args.seed)
+
+    if args.compare:
+        with open(args.compare) as f:
+            results['regressions'] = compare(results, json.load(f), args.tolerance)
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+
+    if results.get('regressions'):
+        print(f"Regressed stages: {', '.join(results['regressions'])}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Local stand-in for the ESPN and RotoWire endpoints, serving the recorded fixtures
+
+    /teams/<espn team id>/roster     fixtures/rosters.json
+    /athletes/<espn id>/gamelog      fixtures/gamelogs/*.json, picked by id
+    /players.php?slateID=<id>        whatever slate was registered under that id
+"""
+import glob
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name)) as f:
+        return json.load(f)
+
+def load_gamelogs():
+    gamelogs = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES, 'gamelogs', '*.json'))):
+        with open(path) as f:
+            gamelogs.append(json.load(f))
+    return gamelogs
+
+class StubServer:
+    """
+    Threaded HTTP server on a free local port
+    latency adds a fixed delay to every response to mimic a remote API
+    """
+
+    def __init__(self, rosters=None, gamelogs=None, slates=None, latency=0.0):
+        self.rosters = {team_id: json.dumps(roster).encode()
+                        for team_id, roster in (rosters or load_fixture('rosters.json')).items()}
+        self.gamelogs = [json.dumps(gamelog).encode() for gamelog in (gamelogs or load_gamelogs())]
+        self.slates = {}
+        for slate_id, players in (slates or {}).items():
+            self.add_slate(slate_id, players)
+        self.latency = latency
+        self.hits = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                stub.hits += 1
+                url = urlparse(self.path)
+                if stub.latency:
+                    time.sleep(stub.latency)
+
+                roster = re.fullmatch(r'/teams/(\d+)/roster', url.path)
+                gamelog = re.fullmatch(r'/athletes/(\d+)/gamelog', url.path)
+                if roster:
+                    body = stub.rosters.get(roster.group(1))
+                elif gamelog:
+                    body = stub.gamelogs[int(gamelog.group(1)) % len(stub.gamelogs)]
+                elif url.path.endswith('/players.php'):
+                    body = stub.slates.get(parse_qs(url.query).get('slateID', [''])[0])
+                else:
+                    body = None
+
+                if body is None:
+                    body, status = b'{}', 404
+                else:
+                    status = 200
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def add_slate(self, slate_id, players):
+        self.slates[str(slate_id)] = json.dumps(players).encode()
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
@@ -2,6 +2,43 @@
 # RotoWire URL for DraftKings lineup builder
 ROTOWIRE_URL = "https://www.rotowire.com/daily/nfl/optimizer.php"
 
+# ESPN site API (rosters and gamelogs)
+ESPN_API_BASE = "http://site.api.espn.com/apis/site/v2/sports/football/nfl"
+
+# On-disk HTTP response cache shared by the scrapers
+HTTP_CACHE_DIR = ".http_cache"
+HTTP_CACHE_MAX_BYTES = 200 * 1024 * 1024
+HTTP_CACHE_TTLS = [
+    (r"/teams/\d+/roster", 24 * 60 * 60),      # rosters change weekly at most
+    (r"/athletes/\d+/gamelog", 60 * 60),        # a new week lands after each game
+    (r"/players\.php\?slateID=", 10 * 60),     # projections move through the day
+]
+
+# Thursday kickoff of each regular season, used to work out completed weeks
+NFL_SEASON_OPENERS = {
+    2024: "2024-09-05",
+    2025: "2025-09-04",
+}
+NFL_REGULAR_SEASON_WEEKS = 18
+
+# ESPN gamelog (category, stat name) -> player_stats column
+# database.STAT_COLUMNS is derived from this table. Add kicking, defense or fumbles
+# rows here (plus the player_stats column); stats not listed are counted, never guessed
+ESPN_STAT_COLUMNS = {
+    ('passing', 'completions'): 'completions',
+    ('passing', 'passingAttempts'): 'passing_attempts',
+    ('passing', 'passingYards'): 'passing_yards',
+    ('passing', 'passingTouchdowns'): 'passing_touchdowns',
+    ('passing', 'interceptions'): 'interceptions',
+    ('rushing', 'rushingAttempts'): 'rushing_attempts',
+    ('rushing', 'rushingYards'): 'rushing_yards',
+    ('rushing', 'rushingTouchdowns'): 'rushing_touchdowns',
+    ('receiving', 'receptions'): 'receptions',
+    ('receiving', 'receivingTargets'): 'receiving_targets',
+    ('receiving', 'receivingYards'): 'receiving_yards',
+    ('receiving', 'receivingTouchdowns'): 'receiving_touchdowns',
+}
+
 # CSV output settings
 CSV_FILENAME = "rotowire_data_{date}.csv"
 CSV_COLUMNS = [
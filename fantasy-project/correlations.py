@@ -0,0 +1,250 @@
+from collections import Counter
+import numpy as np
+from config import ROTOWIRE_TO_ESPN_TEAM_IDS
+from database import get_connection, STAT_COLUMNS
+from history import season_week, jersey_team_sql
+from scoring import fantasy_points, DK_RULES
+import metrics
+
+# Shared games of evidence that weigh as much as the position-pair prior
+SHRINK_GAMES = 8
+# Fewer shared games than this and a pair's correlation is all prior
+MIN_GAMES = 3
+
+PAIR_COLUMNS = ['player_a', 'player_b', 'relation', 'position_a', 'position_b',
+                'games', 'sum_a', 'sum_b', 'sum_aa', 'sum_bb', 'sum_ab']
+
+def week_opponents(conn):
+    """
+    {(season, week, team): opponent} from weekly_data, by majority of each team's rows
+    Only real team abbreviations count, and a game seen from one side fills in the other.
+    A row's team is its team_jersey prefix, so rows of traded or cut players still count.
+    """
+    votes = {}
+    for date, team, opponent, count in conn.execute(f'''
+        SELECT date, {jersey_team_sql('team_jersey')} AS team, opponent, COUNT(*)
+        FROM weekly_data
+        WHERE opponent IS NOT NULL
+        GROUP BY date, team, opponent
+    '''):
+        opponent = opponent.lstrip('@')
+        if team in ROTOWIRE_TO_ESPN_TEAM_IDS and opponent in ROTOWIRE_TO_ESPN_TEAM_IDS and opponent != team:
+            season, week = season_week(date)
+            votes.setdefault((season, week, team), Counter())[opponent] += count
+
+    opponents = {key: counter.most_common(1)[0][0] for key, counter in votes.items()}
+    for (season, week, team), opponent in list(opponents.items()):
+        opponents.setdefault((season, week, opponent), team)
+    return opponents
+
+def week_versions(conn, opponents):
+    """{(season, week): version} - changes whenever a week's stats or known matchups change"""
+    matchups = Counter((season, week) for season, week, _ in opponents)
+    return {
+        (season, week): f"{count}:{max_id}:{updated_at}:{matchups[(season, week)]}"
+        for season, week, count, max_id, updated_at in conn.execute('''
+            SELECT season, week, COUNT(*), MAX(id), MAX(updated_at) FROM player_stats
+            WHERE season IS NOT NULL AND week IS NOT NULL
+            GROUP BY season, week
+        ''')
+    }
+
+def week_rows(weeks, conn):
+    """
+    (season, week, team_jersey, team, position, *STAT_COLUMNS) for the given weeks
+    The team comes from team_jersey, so a player's pairs don't move when the
+    players table changes; position is None for keys it doesn't know
+    """
+    values = ', '.join('(?, ?)' for _ in weeks)
+    return conn.execute(f'''
+        SELECT s.season, s.week, s.team_jersey, {jersey_team_sql('s.team_jersey')}, p.position,
+               {', '.join(f's.{column}' for column in STAT_COLUMNS)}
+        FROM player_stats s
+        LEFT JOIN players p ON p.team_jersey = s.team_jersey
+        WHERE (s.season, s.week) IN (VALUES {values})
+    ''', [value for week in weeks for value in week]).fetchall()
+
+def pair_sums(rows, opponents, rules=DK_RULES):
+    """
+    Co-production sums for every pair of players who shared a game
+    Each player-week is placed in its game (team and opponent, or the team
+    alone when the opponent is unknown). With X the (games x players) points
+    matrix and M its played mask, the sums over shared games for all pairs
+    are four matrix products. Returns {PAIR_COLUMNS column: array}, one entry
+    per pair with player_a < player_b.
+    """
+    keys, player_index = np.unique([row[2] for row in rows], return_inverse=True)
+    info = {row[2]: (row[3] or '', row[4] or '') for row in rows}
+    teams = np.array([info[key][0] for key in keys], dtype=object)
+    positions = np.array([info[key][1] for key in keys], dtype=object)
+
+    games = []
+    for season, week, _, team, *_ in rows:
+        opponent = opponents.get((season, week, team))
+        game = '|'.join(sorted((team, opponent))) if opponent else team
+        games.append(f"{season}:{week}:{game}")
+    _, game_index = np.unique(games, return_inverse=True)
+
+    played = np.zeros((game_index.max() + 1, len(keys)))
+    played[game_index, player_index] = 1
+    points = np.zeros_like(played)
+    points[game_index, player_index] = fantasy_points([row[5:] for row in rows], rules)
+
+    shared = played.T @ played
+    sum_x = points.T @ played              # [i, j]: i's points over the games i shared with j
+    sum_xx = (points ** 2).T @ played
+    sum_xy = points.T @ points
+    a, b = np.nonzero(np.triu(shared, k=1))
+    return {
+        'player_a': keys[a], 'player_b': keys[b],
+        'relation': np.where(teams[a] == teams[b], 'team', 'opponent'),
+        'position_a': positions[a], 'position_b': positions[b],
+        'games': shared[a, b].astype(np.int64),
+        'sum_a': sum_x[a, b], 'sum_b': sum_x[b, a],
+        'sum_aa': sum_xx[a, b], 'sum_bb': sum_xx[b, a],
+        'sum_ab': sum_xy[a, b],
+    }
+
+def add_pair_sums(pairs, conn):
+    """Add pair sums onto the stored ones (new pairs are inserted)"""
+    sums = PAIR_COLUMNS[5:]
+    conn.executemany(f'''
+        INSERT INTO player_correlations ({', '.join(PAIR_COLUMNS)})
+        VALUES ({', '.join('?' for _ in PAIR_COLUMNS)})
+        ON CONFLICT (player_a, player_b) DO UPDATE SET
+        {', '.join(f'{column} = {column} + excluded.{column}' for column in sums)}
+    ''', zip(*(pairs[column].tolist() for column in PAIR_COLUMNS)))
+
+def shrink_correlations(conn, shrink_games=SHRINK_GAMES):
+    """
+    Recompute every stored pair's correlation from its sums
+    Raw Pearson correlations are pooled into a prior per (relation, position
+    pair) by a games-weighted Fisher z mean, and each pair is shrunk toward
+    its prior as games / (games + shrink_games).
+    Returns the number of pairs
+    """
+    rows = conn.execute('''
+        SELECT rowid, relation, position_a, position_b, games, sum_a, sum_b, sum_aa, sum_bb, sum_ab
+        FROM player_correlations
+    ''').fetchall()
+    if not rows:
+        return 0
+
+    row_ids = [row[0] for row in rows]
+    n, sum_a, sum_b, sum_aa, sum_bb, sum_ab = np.array([row[4:] for row in rows], dtype=np.float64).T
+    covariance = n * sum_ab - sum_a * sum_b
+    variance = (n * sum_aa - sum_a ** 2) * (n * sum_bb - sum_b ** 2)
+    defined = (n >= MIN_GAMES) & (variance > 1e-9)
+    raw = np.zeros(len(rows))
+    raw[defined] = np.clip(covariance[defined] / np.sqrt(variance[defined]), -1, 1)
+
+    # Priors are symmetric in position, so QB-WR and WR-QB pool together
+    groups = [f"{relation}|{min(a, b)}|{max(a, b)}" for _, relation, a, b, *_ in rows]
+    names, group = np.unique(groups, return_inverse=True)
+    weight = np.where(defined, np.maximum(n - MIN_GAMES, 0) + 1, 0)
+    z = np.arctanh(np.clip(raw, -0.999, 0.999))
+    z_total = np.bincount(group, weights=weight * z, minlength=len(names))
+    weight_total = np.bincount(group, weights=weight, minlength=len(names))
+    prior = np.tanh(np.divide(z_total, weight_total, out=np.zeros(len(names)), where=weight_total > 0))
+    pairs = np.bincount(group, weights=defined, minlength=len(names)).astype(np.int64)
+
+    shrunk = np.where(defined, (n * raw + shrink_games * prior[group]) / (n + shrink_games), prior[group])
+    with conn:
+        conn.executemany("UPDATE player_correlations SET raw_correlation = ?, correlation = ? WHERE rowid = ?",
+                         zip(np.where(defined, raw.round(4), np.nan).tolist(), shrunk.round(4).tolist(), row_ids))
+        conn.execute("DELETE FROM correlation_priors")
+        conn.executemany('''
+            INSERT INTO correlation_priors (relation, position_a, position_b, correlation, pairs)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [name.split('|') + [value, count]
+              for name, value, count in zip(names.tolist(), prior.round(4).tolist(), pairs.tolist())])
+    return len(rows)
+
+@metrics.timed('update_correlations')
+def update_correlations(db_path="fantasy_data.db", rules=DK_RULES, rebuild=False):
+    """
+    Fold weeks not yet seen into player_correlations and re-shrink
+    Only new weeks are read from player_stats; their pair sums are added to
+    the stored ones. If stats or matchups of a week already folded in have
+    changed (or rebuild is set), everything is rebuilt from scratch.
+    Returns the number of weeks folded in
+    """
+    conn = get_connection(db_path)
+    opponents = week_opponents(conn)
+    versions = week_versions(conn, opponents)
+    processed = dict(((season, week), version) for season, week, version
+                     in conn.execute("SELECT season, week, version FROM correlation_weeks"))
+
+    if rebuild or any(versions.get(key) != version for key, version in processed.items()):
+        if not rebuild:
+            print("Weeks already in player_correlations have changed - rebuilding")
+        with conn:
+            conn.execute("DELETE FROM player_correlations")
+            conn.execute("DELETE FROM correlation_weeks")
+        processed = {}
+
+    new_weeks = sorted(key for key in versions if key not in processed)
+    # One season at a time keeps the (games x players) matrices small
+    for season in sorted({season for season, _ in new_weeks}):
+        weeks = [key for key in new_weeks if key[0] == season]
+        rows = week_rows(weeks, conn)
+        with conn:
+            if rows:
+                add_pair_sums(pair_sums(rows, opponents, rules), conn)
+            conn.executemany("INSERT INTO correlation_weeks (season, week, version) VALUES (?, ?, ?)",
+                             [(season, week, versions[(season, week)]) for season, week in weeks])
+
+    pairs = shrink_correlations(conn) if new_weeks else None
+    conn.close()
+
+    print(f"Folded {len(new_weeks)} new weeks into player correlations"
+          + (f" ({pairs} pairs)" if pairs is not None else ""))
+    return len(new_weeks)
+
+def load_correlations(keys, conn):
+    """{(player_a, player_b): correlation} for every stored pair within keys, player_a < player_b"""
+    keys = list(keys)
+    placeholders = ', '.join('?' for _ in keys)
+    cursor = conn.execute(f'''
+        SELECT player_a, player_b, correlation FROM player_correlations
+        WHERE player_a IN ({placeholders}) AND player_b IN ({placeholders})
+    ''', keys + keys)
+    return {(a, b): correlation for a, b, correlation in cursor}
+
+def pair_correlation(player_a, player_b, conn, week=None, opponents=None):
+    """
+    Shrunk correlation of two players' fantasy points
+    Pairs that never shared a game get their position-pair prior: the
+    teammate prior, or the opponent prior if their teams play each other in
+    week ((season, week), default the latest week with known matchups).
+    None when nothing is known or the players don't meet that week.
+    opponents is a week_opponents result to reuse across calls.
+    """
+    player_a, player_b = sorted((player_a, player_b))
+    row = conn.execute("SELECT correlation FROM player_correlations WHERE player_a = ? AND player_b = ?",
+                       (player_a, player_b)).fetchone()
+    if row:
+        return row[0]
+
+    positions = dict(conn.execute("SELECT team_jersey, position FROM players WHERE team_jersey IN (?, ?)",
+                                  (player_a, player_b)))
+    if len(positions) < 2 or None in positions.values():
+        return None
+    team_a, team_b = player_a.split('_')[0], player_b.split('_')[0]
+    if team_a == team_b:
+        relation = 'team'
+    else:
+        opponents = week_opponents(conn) if opponents is None else opponents
+        if week is None:
+            week = max(((season, number) for season, number, _ in opponents), default=None)
+        if week is None or opponents.get((*week, team_a)) != team_b:
+            return None
+        relation = 'opponent'
+    position_a, position_b = positions[player_a], positions[player_b]
+    row = conn.execute('''
+        SELECT correlation FROM correlation_priors WHERE relation = ? AND position_a = ? AND position_b = ?
+    ''', (relation, min(position_a, position_b), max(position_a, position_b))).fetchone()
+    return row[0] if row else None
+
+if __name__ == "__main__":
+    update_correlations()
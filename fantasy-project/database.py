@@ -1,5 +1,12 @@
 import sqlite3
 import os
+import json
+import queue
+import threading
+import time
+from datetime import datetime
+from config import ESPN_STAT_COLUMNS
+import metrics
 
 def create_database(db_path="fantasy_data.db"):
     """Create the database and tables"""
@@ -9,62 +16,10 @@ def create_database(db_path="fantasy_data.db"):
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
         
-        # Create players table (from ESPN lookup)
-        print("Creating players table...")
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS players (
-                team_jersey TEXT PRIMARY KEY,
-                name TEXT NOT NULL,
-                position TEXT,
-                team TEXT,
-                jersey TEXT,
-                espn_id TEXT,
-                height TEXT,
-                weight TEXT,
-                age INTEGER
-            )
-        ''')
+        create_tables(conn, verbose=True)
         
-        # Create weekly_data table (from RotoWire scraping)
-        print("Creating weekly_data table...")
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS weekly_data (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date TEXT NOT NULL,
-                team_jersey TEXT NOT NULL,
-                salary REAL,
-                projected_fpts REAL,
-                actual_fpts REAL,
-                value_score REAL,
-                ownership_pct REAL,
-                opponent TEXT,
-                FOREIGN KEY (team_jersey) REFERENCES players (team_jersey)
-            )
-        ''')
-        
-        # Create player_stats table (for actual weekly performance)
-        print("Creating player_stats table...")
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS player_stats (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date TEXT NOT NULL,
-                week INTEGER,
-                team_jersey TEXT NOT NULL,
-                completions INTEGER DEFAULT 0,
-                passing_attempts INTEGER DEFAULT 0,
-                passing_yards INTEGER DEFAULT 0,
-                passing_touchdowns INTEGER DEFAULT 0,
-                interceptions INTEGER DEFAULT 0,
-                rushing_attempts INTEGER DEFAULT 0,
-                rushing_yards INTEGER DEFAULT 0,
-                rushing_touchdowns INTEGER DEFAULT 0,
-                receptions INTEGER DEFAULT 0,
-                receiving_targets INTEGER DEFAULT 0,
-                receiving_yards INTEGER DEFAULT 0,
-                receiving_touchdowns INTEGER DEFAULT 0,
-                FOREIGN KEY (team_jersey) REFERENCES players (team_jersey)
-            )
-        ''')
+        # Bring tables created by older versions up to date
+        migrate_database(conn)
         
         # Verify tables were created
         cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
@@ -78,9 +33,549 @@ def create_database(db_path="fantasy_data.db"):
     except Exception as e:
         print(f"Error creating database: {e}")
 
+def create_tables(conn, verbose=False):
+    """Create any missing tables"""
+    # Create players table (from ESPN lookup)
+    if verbose:
+        print("Creating players table...")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS players (
+            team_jersey TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            position TEXT,
+            team TEXT,
+            jersey TEXT,
+            espn_id TEXT,
+            height TEXT,
+            weight TEXT,
+            age INTEGER,
+            active INTEGER NOT NULL DEFAULT 1
+        )
+    ''')
+    
+    # Create weekly_data table (from RotoWire scraping)
+    if verbose:
+        print("Creating weekly_data table...")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS weekly_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            slate_id INTEGER NOT NULL DEFAULT 0,
+            team_jersey TEXT NOT NULL,
+            salary REAL,
+            projected_fpts REAL,
+            actual_fpts REAL,
+            value_score REAL,
+            ownership_pct REAL,
+            opponent TEXT,
+            floor_fpts REAL,
+            median_fpts REAL,
+            ceiling_fpts REAL,
+            actual_scored_at TEXT,
+            actual_rules TEXT,
+            FOREIGN KEY (team_jersey) REFERENCES players (team_jersey)
+        )
+    ''')
+    
+    # Create player_stats table (for actual weekly performance)
+    if verbose:
+        print("Creating player_stats table...")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS player_stats (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            season INTEGER,
+            week INTEGER,
+            team_jersey TEXT NOT NULL,
+            completions INTEGER DEFAULT 0,
+            passing_attempts INTEGER DEFAULT 0,
+            passing_yards INTEGER DEFAULT 0,
+            passing_touchdowns INTEGER DEFAULT 0,
+            interceptions INTEGER DEFAULT 0,
+            rushing_attempts INTEGER DEFAULT 0,
+            rushing_yards INTEGER DEFAULT 0,
+            rushing_touchdowns INTEGER DEFAULT 0,
+            receptions INTEGER DEFAULT 0,
+            receiving_targets INTEGER DEFAULT 0,
+            receiving_yards INTEGER DEFAULT 0,
+            receiving_touchdowns INTEGER DEFAULT 0,
+            updated_at TEXT,
+            FOREIGN KEY (team_jersey) REFERENCES players (team_jersey)
+        )
+    ''')
+    
+    # Create player_changes table (roster moves found by refresh_players)
+    if verbose:
+        print("Creating player_changes table...")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS player_changes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            changed_at TEXT NOT NULL,
+            team_jersey TEXT NOT NULL,
+            change TEXT NOT NULL,
+            old_values TEXT,
+            new_values TEXT
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_player_changes_changed_at ON player_changes (changed_at)")
+    
+    # Create stats_checkpoints table (per-player progress of a stats scrape, see stats_scraper)
+    if verbose:
+        print("Creating stats_checkpoints table...")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS stats_checkpoints (
+            run TEXT NOT NULL,
+            team_jersey TEXT NOT NULL,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 1,
+            fetched_at TEXT NOT NULL,
+            PRIMARY KEY (run, team_jersey)
+        )
+    ''')
+    
+    # Create pipeline_runs table (input fingerprint of each stage's last successful run, see pipeline)
+    if verbose:
+        print("Creating pipeline_runs table...")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS pipeline_runs (
+            stage TEXT PRIMARY KEY,
+            fingerprint TEXT NOT NULL,
+            inputs TEXT,
+            finished_at TEXT NOT NULL,
+            seconds REAL
+        )
+    ''')
+    
+    # Create player_correlations table (pairwise weekly fantasy point sums, see correlations)
+    if verbose:
+        print("Creating player_correlations table...")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS player_correlations (
+            player_a TEXT NOT NULL,
+            player_b TEXT NOT NULL,
+            relation TEXT NOT NULL,
+            position_a TEXT,
+            position_b TEXT,
+            games INTEGER NOT NULL,
+            sum_a REAL NOT NULL,
+            sum_b REAL NOT NULL,
+            sum_aa REAL NOT NULL,
+            sum_bb REAL NOT NULL,
+            sum_ab REAL NOT NULL,
+            raw_correlation REAL,
+            correlation REAL,
+            PRIMARY KEY (player_a, player_b)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS correlation_priors (
+            relation TEXT NOT NULL,
+            position_a TEXT NOT NULL,
+            position_b TEXT NOT NULL,
+            correlation REAL NOT NULL,
+            pairs INTEGER NOT NULL,
+            PRIMARY KEY (relation, position_a, position_b)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS correlation_weeks (
+            season INTEGER NOT NULL,
+            week INTEGER NOT NULL,
+            version TEXT NOT NULL,
+            PRIMARY KEY (season, week)
+        )
+    ''')
+    
+    # Create name_resolutions table (RotoWire name + team -> player, learned by NameResolver)
+    if verbose:
+        print("Creating name_resolutions table...")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS name_resolutions (
+            rotowire_name TEXT NOT NULL,
+            team TEXT NOT NULL,
+            team_jersey TEXT NOT NULL,
+            match_type TEXT,
+            resolved_at TEXT,
+            PRIMARY KEY (rotowire_name, team)
+        )
+    ''')
+
+def get_connection(db_path="fantasy_data.db", check_same_thread=True):
+    """
+    Open a connection in WAL mode with write-friendly pragmas and an up to date schema
+    check_same_thread=False allows sharing it between threads (callers serialize access)
+    """
+    conn = sqlite3.connect(db_path, timeout=30, check_same_thread=check_same_thread)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-20000")
+    create_tables(conn)
+    migrate_database(conn)
+    return conn
+
+def table_columns(cursor, table):
+    cursor.execute(f"PRAGMA table_info({table})")
+    return {row[1] for row in cursor.fetchall()}
+
+# Bump when migrate_database gains a step; PRAGMA user_version records the last one applied
+SCHEMA_VERSION = 3
+
+def migrate_database(conn):
+    """
+    Add columns and constraints introduced after a table was first created
+    Runs once per schema version, so opening a connection doesn't repeat the dedupe scans
+    """
+    cursor = conn.cursor()
+    
+    # Up to date - the common case - needs no write lock, so readers never queue behind writers
+    if cursor.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+        return
+    
+    # Hold the write lock while migrating and check again under it, since
+    # another connection may have finished the migration in the meantime
+    if not conn.in_transaction:
+        cursor.execute("BEGIN IMMEDIATE")
+    if cursor.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+        conn.commit()
+        return
+    
+    # Players that leave a roster are kept (inactive) so history still joins to them
+    if 'active' not in table_columns(cursor, 'players'):
+        print("Adding active column to players...")
+        cursor.execute("ALTER TABLE players ADD COLUMN active INTEGER NOT NULL DEFAULT 1")
+    
+    if 'season' not in table_columns(cursor, 'player_stats'):
+        print("Adding season column to player_stats...")
+        cursor.execute("ALTER TABLE player_stats ADD COLUMN season INTEGER")
+    
+    if 'slate_id' not in table_columns(cursor, 'weekly_data'):
+        print("Adding slate_id column to weekly_data...")
+        cursor.execute("ALTER TABLE weekly_data ADD COLUMN slate_id INTEGER NOT NULL DEFAULT 0")
+    
+    weekly_columns = table_columns(cursor, 'weekly_data')
+    for column in ['floor_fpts', 'median_fpts', 'ceiling_fpts']:
+        if column not in weekly_columns:
+            print(f"Adding {column} column to weekly_data...")
+            cursor.execute(f"ALTER TABLE weekly_data ADD COLUMN {column} REAL")
+    
+    # Change stamps that let scoring.score_weekly_data rescore only what changed
+    if 'actual_scored_at' not in weekly_columns:
+        print("Adding actual_scored_at column to weekly_data...")
+        cursor.execute("ALTER TABLE weekly_data ADD COLUMN actual_scored_at TEXT")
+    # Rule table the stored actual_fpts were scored with
+    if 'actual_rules' not in weekly_columns:
+        print("Adding actual_rules column to weekly_data...")
+        cursor.execute("ALTER TABLE weekly_data ADD COLUMN actual_rules TEXT")
+    if 'updated_at' not in table_columns(cursor, 'player_stats'):
+        print("Adding updated_at column to player_stats...")
+        cursor.execute("ALTER TABLE player_stats ADD COLUMN updated_at TEXT")
+    
+    # Re-scrapes used to append a second copy of the slate - keep the latest row
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type='index' AND name='idx_weekly_data_natural_key'")
+    if not cursor.fetchone():
+        cursor.execute('''
+            DELETE FROM weekly_data WHERE id NOT IN (
+                SELECT MAX(id) FROM weekly_data GROUP BY date, slate_id, team_jersey
+            )
+        ''')
+        if cursor.rowcount:
+            print(f"Removed {cursor.rowcount} duplicate weekly_data rows")
+        cursor.execute('''
+            CREATE UNIQUE INDEX idx_weekly_data_natural_key
+            ON weekly_data (date, slate_id, team_jersey)
+        ''')
+    
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type='index' AND name='idx_player_stats_natural_key'")
+    if not cursor.fetchone():
+        cursor.execute('''
+            DELETE FROM player_stats WHERE id NOT IN (
+                SELECT MAX(id) FROM player_stats GROUP BY season, week, team_jersey
+            )
+        ''')
+        if cursor.rowcount:
+            print(f"Removed {cursor.rowcount} duplicate player_stats rows")
+        cursor.execute('''
+            CREATE UNIQUE INDEX idx_player_stats_natural_key
+            ON player_stats (season, week, team_jersey)
+        ''')
+    
+    # Secondary indexes for slate and player history queries (see queries.py).
+    # player_stats (season, week) lookups use the natural key index above.
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_weekly_data_date_player ON weekly_data (date, team_jersey)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_weekly_data_player_date ON weekly_data (team_jersey, date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_player_stats_player_date ON player_stats (team_jersey, date)")
+    
+    cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    conn.commit()
+
+# player_stats stat columns, in the order config.ESPN_STAT_COLUMNS maps them
+STAT_COLUMNS = list(dict.fromkeys(ESPN_STAT_COLUMNS.values()))
+
+def insert_player_stats(stat_rows, conn):
+    """
+    Bulk upsert player_stats rows in one executemany, keyed on (season, week, team_jersey)
+    Each row is a dict with date, season, week, team_jersey and the STAT_COLUMNS.
+    An existing row is only rewritten (and its updated_at bumped) when a value differs.
+    Returns the number of rows inserted or updated; unchanged rows are not counted
+    """
+    columns = ['date', 'season', 'week', 'team_jersey'] + STAT_COLUMNS
+    placeholders = ', '.join('?' for _ in columns)
+    updates = ', '.join(f'{column} = excluded.{column}' for column in ['date'] + STAT_COLUMNS + ['updated_at'])
+    changed = ' OR '.join(f'player_stats.{column} IS NOT excluded.{column}' for column in ['date'] + STAT_COLUMNS)
+    now = datetime.now().isoformat()
+    values = [tuple(row.get(column, 0) for column in columns) + (now,) for row in stat_rows]
+    
+    started = time.monotonic()
+    with conn:
+        # executemany's rowcount skips conflicts the WHERE clause left alone
+        written = conn.executemany(f'''
+            INSERT INTO player_stats ({', '.join(columns)}, updated_at)
+            VALUES ({placeholders}, ?)
+            ON CONFLICT (season, week, team_jersey) DO UPDATE SET {updates}
+            WHERE {changed}
+        ''', values).rowcount
+    metrics.record_rows('player_stats', written, time.monotonic() - started)
+    return written
+
+def load_checkpoints(run, conn):
+    """Return {team_jersey: (status, fetched_at)} for one stats run"""
+    cursor = conn.execute("SELECT team_jersey, status, fetched_at FROM stats_checkpoints WHERE run = ?", (run,))
+    return {team_jersey: (status, fetched_at) for team_jersey, status, fetched_at in cursor}
+
+def save_checkpoints(checkpoints, conn):
+    """Upsert (run, team_jersey, status, fetched_at) rows, counting attempts per player"""
+    with conn:
+        conn.executemany('''
+            INSERT INTO stats_checkpoints (run, team_jersey, status, fetched_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (run, team_jersey) DO UPDATE SET
+            status = excluded.status, fetched_at = excluded.fetched_at, attempts = attempts + 1
+        ''', checkpoints)
+
+class StatsWriter:
+    """
+    Background writer that batches player_stats rows into upserts
+    Fetchers put() rows onto a bounded queue and carry on; a single thread
+    with its own connection flushes every batch_size rows (or when the queue
+    goes quiet for flush_interval seconds). Memory stays at one queue plus
+    one batch no matter how many players are ingested.
+    Checkpoints queued with checkpoint() are saved right after the stat rows
+    queued before them, so a player is never marked done before its stats land.
+    rows_written counts the rows actually inserted or changed.
+    """
+    
+    def __init__(self, db_path="fantasy_data.db", batch_size=500, max_queue=2000, flush_interval=1.0):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.rows_written = 0
+        self.error = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+    
+    def put(self, row):
+        """Queue one row, blocking only if the writer is max_queue rows behind"""
+        if self.error:
+            raise self.error
+        self.queue.put(row)
+    
+    def checkpoint(self, run, team_jersey, status):
+        """Queue a stats_checkpoints row for a player whose stats have all been put()"""
+        self.put((run, team_jersey, status, datetime.now().isoformat(timespec='seconds')))
+    
+    def close(self):
+        """Flush what is left, stop the thread and re-raise any write error"""
+        self.queue.put(None)
+        self.thread.join()
+        if self.error:
+            raise self.error
+        return self.rows_written
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+            return
+        # Still flush what was queued, but let the body's exception propagate rather than a write error
+        try:
+            self.close()
+        except Exception as e:
+            print(f"Stats writer also failed: {e}")
+    
+    def run(self):
+        conn = None
+        batch = []
+        done = False
+        try:
+            conn = get_connection(self.db_path)
+            while not done:
+                try:
+                    row = self.queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    row = False
+                done = row is None
+                
+                if row:
+                    batch.append(row)
+                # Flush on a full batch, an idle queue or shutdown
+                if batch and (len(batch) >= self.batch_size or not row):
+                    stat_rows = [item for item in batch if isinstance(item, dict)]
+                    checkpoints = [item for item in batch if isinstance(item, tuple)]
+                    if stat_rows:
+                        self.rows_written += insert_player_stats(stat_rows, conn)
+                    if checkpoints:
+                        save_checkpoints(checkpoints, conn)
+                    batch = []
+        except Exception as e:
+            self.error = e
+            # Keep draining so producers never block on a dead writer
+            while not done:
+                done = self.queue.get() is None
+        finally:
+            if conn:
+                conn.close()
+
+PLAYER_COLUMNS = ['name', 'position', 'team', 'jersey', 'espn_id', 'height', 'weight', 'age']
+
+def player_values(player):
+    """Comparable form of a player's columns - SQLite hands back ints where ESPN sent strings"""
+    return tuple('' if player.get(column) is None else str(player.get(column))
+                 for column in PLAYER_COLUMNS)
+
+def diff_players(player_lookup, conn, teams=None):
+    """
+    Compare a freshly fetched lookup against the players table
+    Returns {'added': {key: player}, 'changed': {key: (old, new)}, 'removed': {key: player}}
+    Only teams in `teams` (default: every team in player_lookup) can lose players,
+    so a roster that failed to download is not read as the whole team being cut.
+    Inactive (removed) players that reappear count as added.
+    """
+    if teams is None:
+        teams = {player['team'] for player in player_lookup.values()}
+    
+    stored = {}
+    cursor = conn.execute(f"SELECT team_jersey, {', '.join(PLAYER_COLUMNS)} FROM players WHERE active = 1")
+    for row in cursor:
+        stored[row[0]] = dict(zip(PLAYER_COLUMNS, row[1:]))
+    
+    diff = {'added': {}, 'changed': {}, 'removed': {}}
+    for key, player in player_lookup.items():
+        old = stored.get(key)
+        if old is None:
+            diff['added'][key] = player
+        elif player_values(old) != player_values(player):
+            diff['changed'][key] = (old, player)
+    
+    for key, old in stored.items():
+        if key not in player_lookup and old['team'] in teams:
+            diff['removed'][key] = old
+    return diff
+
+def apply_player_diff(diff, conn, changed_at=None):
+    """
+    Apply a diff_players result and log every change, all in one transaction
+    Removed players are marked inactive rather than deleted: weekly_data,
+    player_stats and correlations keep joining to their rows, and a key
+    reused by a new signing (or a returning player) is reactivated
+    """
+    if changed_at is None:
+        changed_at = datetime.now().isoformat(timespec='seconds')
+    
+    columns = ', '.join(PLAYER_COLUMNS)
+    placeholders = ', '.join('?' for _ in PLAYER_COLUMNS)
+    updates = ', '.join(f'{column} = ?' for column in PLAYER_COLUMNS)
+    
+    log = []
+    for key, player in diff['added'].items():
+        log.append((changed_at, key, 'added', None, json.dumps(player)))
+    for key, (old, new) in diff['changed'].items():
+        # Only the fields that moved, e.g. {"position": "WR"} -> {"position": "TE"}
+        fields = [column for column, a, b in zip(PLAYER_COLUMNS, player_values(old), player_values(new)) if a != b]
+        log.append((changed_at, key, 'changed',
+                    json.dumps({column: old.get(column) for column in fields}),
+                    json.dumps({column: new.get(column) for column in fields})))
+    for key, old in diff['removed'].items():
+        log.append((changed_at, key, 'removed', json.dumps(old), None))
+    
+    started = time.monotonic()
+    with conn:
+        conn.executemany(f'''
+            INSERT INTO players (team_jersey, {columns}) VALUES (?, {placeholders})
+            ON CONFLICT (team_jersey) DO UPDATE SET
+            {', '.join(f'{column} = excluded.{column}' for column in PLAYER_COLUMNS)}, active = 1
+        ''', [(key, *(player.get(column) for column in PLAYER_COLUMNS))
+              for key, player in diff['added'].items()])
+        conn.executemany(f"UPDATE players SET {updates} WHERE team_jersey = ?",
+                         [(*(new.get(column) for column in PLAYER_COLUMNS), key)
+                          for key, (old, new) in diff['changed'].items()])
+        conn.executemany("UPDATE players SET active = 0 WHERE team_jersey = ?",
+                         [(key,) for key in diff['removed']])
+        conn.executemany('''
+            INSERT INTO player_changes (changed_at, team_jersey, change, old_values, new_values)
+            VALUES (?, ?, ?, ?, ?)
+        ''', log)
+    metrics.record_rows('players', len(log), time.monotonic() - started)
+    return log
+
+@metrics.timed('refresh_players')
+def refresh_players(player_lookup, db_path="fantasy_data.db", teams=None):
+    """
+    Bring the players table in line with a fresh roster fetch
+    Only added, changed and removed players are written; the diff is returned
+    and also kept in player_changes for anything downstream that needs it
+    """
+    conn = get_connection(db_path)
+    diff = diff_players(player_lookup, conn, teams)
+    apply_player_diff(diff, conn)
+    conn.close()
+    
+    print(f"Players: {len(diff['added'])} added, {len(diff['changed'])} changed, "
+          f"{len(diff['removed'])} removed")
+    return diff
+
+def load_stage_runs(conn):
+    """Return {stage: (fingerprint, inputs)} of each pipeline stage's last successful run"""
+    cursor = conn.execute("SELECT stage, fingerprint, inputs FROM pipeline_runs")
+    return {stage: (fingerprint, json.loads(inputs)) for stage, fingerprint, inputs in cursor}
+
+def save_stage_run(stage, fingerprint, inputs, seconds, conn):
+    """Record a successful pipeline stage run with its (JSON-serializable) inputs"""
+    with conn:
+        conn.execute('''
+            INSERT INTO pipeline_runs (stage, fingerprint, inputs, finished_at, seconds) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (stage) DO UPDATE SET
+            fingerprint = excluded.fingerprint, inputs = excluded.inputs,
+            finished_at = excluded.finished_at, seconds = excluded.seconds
+        ''', (stage, fingerprint, json.dumps(inputs, default=str),
+              datetime.now().isoformat(timespec='seconds'), round(seconds, 3)))
+
+def load_name_resolutions(conn):
+    """Return {(rotowire_name, team): (team_jersey, match_type)}"""
+    cursor = conn.execute("SELECT rotowire_name, team, team_jersey, match_type FROM name_resolutions")
+    return {(name, team): (team_jersey, match_type) for name, team, team_jersey, match_type in cursor}
+
+def save_name_resolutions(resolutions, conn):
+    """Upsert (rotowire_name, team, team_jersey, match_type) rows in one transaction"""
+    resolved_at = datetime.now().isoformat(timespec='seconds')
+    resolutions = list(resolutions)
+    started = time.monotonic()
+    with conn:
+        conn.executemany('''
+            INSERT INTO name_resolutions (rotowire_name, team, team_jersey, match_type, resolved_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (rotowire_name, team) DO UPDATE SET
+            team_jersey = excluded.team_jersey, match_type = excluded.match_type,
+            resolved_at = excluded.resolved_at
+        ''', [row + (resolved_at,) for row in resolutions])
+    metrics.record_rows('name_resolutions', len(resolutions), time.monotonic() - started)
+
 def insert_players(player_lookup, db_path="fantasy_data.db"):
     """Insert player data from lookup table"""
-    conn = sqlite3.connect(db_path)
+    conn = get_connection(db_path)
     
     data = []
     for key, player in player_lookup.items():
@@ -96,6 +591,7 @@ def insert_players(player_lookup, db_path="fantasy_data.db"):
             player.get('age')
         ))
     
+    started = time.monotonic()
     cursor = conn.cursor()
     cursor.executemany('''
         INSERT OR REPLACE INTO players 
@@ -104,17 +600,18 @@ def insert_players(player_lookup, db_path="fantasy_data.db"):
     ''', data)
     
     conn.commit()
+    metrics.record_rows('players', len(data), time.monotonic() - started)
     conn.close()
     print(f"Inserted {len(data)} players into database")
         
 if __name__ == "__main__":
     create_database()
 
-    # Load and insert player data
+    # Player data lives in the players table; an old player_lookup.json is imported on first load
     from player_lookup import load_player_lookup
     players = load_player_lookup()
     if players:
-        insert_players(players)
+        print(f"{len(players)} players in database")
     else:
         print("No player data found. Run player_lookup.py first.")
 
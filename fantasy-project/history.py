@@ -0,0 +1,305 @@
+"""
+Columnar export of weekly_data and player_stats for offline analysis
+
+    python history.py [history_dir]
+
+Each table is split into one partition per (season, week), written as one
+.npy file per column:
+
+    history/manifest.json                 partition fingerprints and row counts
+    history/dictionaries.json             player, team and position values
+    history/weekly_data/season=2025/week=04/salary.npy
+    history/player_stats/season=2025/week=04/passing_yards.npy
+
+Player, team and position columns are dictionary encoded as small integer
+codes (-1 for missing) into append-only dictionaries, so codes never change
+and old partitions stay valid. A run only rewrites partitions whose source
+rows changed. History.partitions() memory-maps the files, so loading a full
+multi-season history copies nothing.
+"""
+import hashlib
+import json
+import os
+import shutil
+import sys
+from datetime import datetime
+import numpy as np
+from database import get_connection, STAT_COLUMNS
+from stats_scraper import season_opener
+import metrics
+
+HISTORY_DIR = "history"
+
+# Code dtype per dictionary
+DICTIONARY_DTYPES = {'player': np.int32, 'team': np.int16, 'position': np.int8}
+
+# (column, numpy dtype or dictionary name) in export order
+WEEKLY_EXPORT = [
+    ('id', 'int64'), ('date', 'datetime64[D]'), ('slate_id', 'int32'),
+    ('team_jersey', 'player'), ('team', 'team'), ('position', 'position'), ('opponent', 'team'),
+    ('salary', 'float32'), ('projected_fpts', 'float32'), ('actual_fpts', 'float32'),
+    ('value_score', 'float32'), ('ownership_pct', 'float32'),
+    ('floor_fpts', 'float32'), ('median_fpts', 'float32'), ('ceiling_fpts', 'float32'),
+]
+STATS_EXPORT = [
+    ('id', 'int64'), ('date', 'datetime64[D]'), ('season', 'int16'), ('week', 'int8'),
+    ('team_jersey', 'player'), ('team', 'team'), ('position', 'position'),
+] + [(column, 'int16') for column in STAT_COLUMNS]
+
+def jersey_team_sql(column):
+    """SQL for the team of a team_jersey column - the part before '_' (NULL without one)"""
+    return f"NULLIF(substr({column}, 1, instr({column}, '_') - 1), '')"
+
+def export_column(table, column):
+    """
+    SQL for one exported column of alias table
+    The team is the team_jersey prefix, so it is the team of the row even after
+    a trade; position comes from the players table, whose changes are part of
+    the partition fingerprints (see weekly_partitions and PLAYER_CHANGES_SQL)
+    """
+    if column == 'team':
+        return jersey_team_sql(f"{table}.team_jersey")
+    if column == 'position':
+        return 'p.position'
+    return f"{table}.{column}"
+
+WEEKLY_SQL = f'''
+    SELECT {', '.join(export_column('w', column) for column, _ in WEEKLY_EXPORT)}
+    FROM weekly_data w
+    LEFT JOIN players p ON p.team_jersey = w.team_jersey
+    {{where}}
+    ORDER BY w.date, w.slate_id, w.id
+'''
+STATS_SQL = f'''
+    SELECT {', '.join(export_column('s', column) for column, _ in STATS_EXPORT)}
+    FROM player_stats s
+    LEFT JOIN players p ON p.team_jersey = s.team_jersey
+    WHERE s.season = ? AND s.week = ?
+    ORDER BY s.id
+'''
+
+def season_week(date):
+    """
+    (season, week) whose games a date belongs to
+    Weeks roll over on Tuesday as in stats_scraper.completed_weeks; dates
+    before the opener week are week 0
+    """
+    day = datetime.strptime(date[:10], "%Y-%m-%d")
+    season = day.year if day.month >= 3 else day.year - 1
+    days = (day - season_opener(season)).days
+    return season, max(0, (days + 2) // 7 + 1)
+
+# Last roster change per player, so a partition is rewritten when one of its players' rows changes
+PLAYER_CHANGES_SQL = '''
+    SELECT team_jersey, MAX(changed_at) AS changed_at FROM player_changes GROUP BY team_jersey
+'''
+
+def partition_fingerprint(value):
+    return hashlib.sha256(json.dumps(value, default=str).encode()).hexdigest()[:16]
+
+def weekly_partitions(conn):
+    """
+    {(season, week): (fingerprint, dates)} for weekly_data
+    The exported rows are hashed date by date, so any changed value - an
+    opponent, numbers swapped between rows, a player's position - rewrites
+    the partition. weekly_data has no change stamp covering every writer.
+    """
+    hashes = {}
+    for row in conn.execute(WEEKLY_SQL.format(where='')):
+        hashes.setdefault(row[1], hashlib.sha256()).update(repr(row).encode())
+    dates = {}
+    for date, digest in hashes.items():
+        dates.setdefault(season_week(date), []).append((date, digest.hexdigest()))
+    return {key: (partition_fingerprint(rows), [date for date, _ in rows]) for key, rows in dates.items()}
+
+def stats_partitions(conn):
+    """{(season, week): (fingerprint, (season, week))} for player_stats, from one grouped query"""
+    return {
+        (season, week): (partition_fingerprint(row), (season, week))
+        for season, week, *row in conn.execute(f'''
+            SELECT s.season, s.week, COUNT(*), MAX(s.id), MAX(s.updated_at), MAX(c.changed_at)
+            FROM player_stats s
+            LEFT JOIN ({PLAYER_CHANGES_SQL}) c ON c.team_jersey = s.team_jersey
+            WHERE s.season IS NOT NULL AND s.week IS NOT NULL
+            GROUP BY s.season, s.week
+        ''')
+    }
+
+def weekly_rows(conn, dates):
+    where = f"WHERE w.date IN ({', '.join('?' for _ in dates)})"
+    return conn.execute(WEEKLY_SQL.format(where=where), dates).fetchall()
+
+def stats_rows(conn, season_and_week):
+    return conn.execute(STATS_SQL, season_and_week).fetchall()
+
+# table -> (columns, partitions(conn), rows(conn, partition params))
+TABLES = {
+    'weekly_data': (WEEKLY_EXPORT, weekly_partitions, weekly_rows),
+    'player_stats': (STATS_EXPORT, stats_partitions, stats_rows),
+}
+
+class Dictionaries:
+    """Append-only value lists; a value's code is its position"""
+
+    def __init__(self, values=None):
+        self.values = {name: list((values or {}).get(name, [])) for name in DICTIONARY_DTYPES}
+        self.index = {name: {value: code for code, value in enumerate(values)}
+                      for name, values in self.values.items()}
+
+    def encode(self, name, values):
+        index, known = self.index[name], self.values[name]
+        codes = np.empty(len(values), dtype=DICTIONARY_DTYPES[name])
+        for i, value in enumerate(values):
+            if value is None:
+                codes[i] = -1
+                continue
+            code = index.get(value)
+            if code is None:
+                code = index[value] = len(known)
+                known.append(value)
+            codes[i] = code
+        return codes
+
+def column_array(values, kind, dictionaries):
+    """One exported column from a tuple of SQLite values"""
+    if kind in DICTIONARY_DTYPES:
+        return dictionaries.encode(kind, values)
+    if kind.startswith('datetime64'):
+        return np.array([value[:10] if value else 'NaT' for value in values], dtype=kind)
+    if kind.startswith('float'):
+        # None becomes NaN
+        return np.array(values, dtype=np.float64).astype(kind)
+    return np.array([value if value is not None else 0 for value in values], dtype=kind)
+
+def write_json(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+def read_json(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path) as f:
+        return json.load(f)
+
+def partition_path(root, table, season, week):
+    return os.path.join(root, table, f"season={season}", f"week={week:02d}")
+
+def write_partition(path, arrays):
+    """Write every column to a temp directory and swap it in whole"""
+    tmp_path, old_path = f"{path}.tmp", f"{path}.old"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_path, f"{name}.npy"), array)
+    if os.path.exists(path):
+        os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path)
+    else:
+        os.replace(tmp_path, path)
+
+@metrics.timed('export_history')
+def export_history(root=HISTORY_DIR, db_path="fantasy_data.db", tables=TABLES):
+    """
+    Bring the columnar store at root up to date with the database
+    Partitions whose fingerprint (a hash of the exported weekly_data rows;
+    row count, max id, change stamps and the last roster change of their
+    players for player_stats) matches the manifest are left alone; new or changed ones are rewritten and ones whose rows are
+    gone are removed.
+    Returns {table: [(season, week) written]}
+    """
+    os.makedirs(root, exist_ok=True)
+    manifest_path = os.path.join(root, 'manifest.json')
+    dictionaries_path = os.path.join(root, 'dictionaries.json')
+    manifest = read_json(manifest_path, {'tables': {}})
+    dictionaries = Dictionaries(read_json(dictionaries_path, {}))
+    conn = get_connection(db_path)
+
+    written = {}
+    for table, (columns, partitions, rows) in tables.items():
+        stored = manifest['tables'].setdefault(table, {})
+        current = partitions(conn)
+        written[table] = []
+
+        for (season, week), (fingerprint, params) in sorted(current.items()):
+            key = f"{season}/{week:02d}"
+            path = partition_path(root, table, season, week)
+            if stored.get(key, {}).get('fingerprint') == fingerprint and os.path.isdir(path):
+                continue
+            data = rows(conn, params)
+            values = list(zip(*data)) if data else [()] * len(columns)
+            arrays = {name: column_array(column, kind, dictionaries)
+                      for (name, kind), column in zip(columns, values)}
+            write_partition(path, arrays)
+            # Dictionaries first, so the manifest never points at codes not yet saved
+            write_json(dictionaries_path, dictionaries.values)
+            stored[key] = {'fingerprint': fingerprint, 'rows': len(data)}
+            write_json(manifest_path, manifest)
+            metrics.counter('fantasy_history_rows_total', 'Rows exported to the columnar store').inc(
+                len(data), table=table)
+            written[table].append((season, week))
+
+        for key in [key for key in stored if tuple(map(int, key.split('/'))) not in current]:
+            shutil.rmtree(partition_path(root, table, *map(int, key.split('/'))), ignore_errors=True)
+            del stored[key]
+            write_json(manifest_path, manifest)
+
+        print(f"{table}: {len(written[table])} of {len(current)} partitions written")
+    conn.close()
+    return written
+
+class History:
+    """
+    Read side of the columnar store
+    partitions() hands out memory-mapped columns (nothing is read until
+    used); column() and frame() concatenate partitions into one copy.
+    """
+
+    def __init__(self, root=HISTORY_DIR):
+        self.root = root
+        self.manifest = read_json(os.path.join(root, 'manifest.json'), {'tables': {}})
+        self.dictionaries = read_json(os.path.join(root, 'dictionaries.json'), {})
+        self.columns = {table: [name for name, _ in columns] for table, (columns, _, _) in TABLES.items()}
+
+    def keys(self, table, seasons=None, weeks=None):
+        """Sorted (season, week) partitions of a table, optionally filtered"""
+        keys = sorted(tuple(map(int, key.split('/'))) for key in self.manifest['tables'].get(table, {}))
+        return [(season, week) for season, week in keys
+                if (seasons is None or season in seasons) and (weeks is None or week in weeks)]
+
+    def partitions(self, table, seasons=None, weeks=None, columns=None):
+        """Yield ((season, week), {column: read-only memmap}) per partition"""
+        for season, week in self.keys(table, seasons, weeks):
+            path = partition_path(self.root, table, season, week)
+            yield (season, week), {
+                name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r')
+                for name in (columns or self.columns[table])
+            }
+
+    def column(self, table, name, seasons=None, weeks=None):
+        """One column across partitions as a single array"""
+        parts = [arrays[name] for _, arrays in self.partitions(table, seasons, weeks, [name])]
+        return np.concatenate(parts) if parts else np.array([])
+
+    def decode(self, dictionary, codes):
+        """Dictionary codes back to values (None for -1)"""
+        values = np.array(self.dictionaries.get(dictionary, []) + [None], dtype=object)
+        return values[np.asarray(codes)]
+
+    def frame(self, table, seasons=None, weeks=None, columns=None):
+        """pandas DataFrame of a table, dictionary columns as Categoricals"""
+        import pandas as pd   # only needed here - the memmap path stays light
+
+        kinds = dict(TABLES[table][0])
+        data = {}
+        for name in columns or self.columns[table]:
+            values = self.column(table, name, seasons, weeks)
+            if kinds[name] in DICTIONARY_DTYPES:
+                values = pd.Categorical.from_codes(values, categories=self.dictionaries.get(kinds[name], []))
+            data[name] = values
+        return pd.DataFrame(data)
+
+if __name__ == "__main__":
+    export_history(sys.argv[1] if len(sys.argv) > 1 else HISTORY_DIR)
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import requests
+from config import HTTP_CACHE_DIR, HTTP_CACHE_MAX_BYTES, HTTP_CACHE_TTLS
+
+class CacheMiss(requests.RequestException):
+    """Raised in cache-only mode when a URL has never been fetched"""
+
+class HTTPCache:
+    """
+    On-disk cache of JSON GET responses, one file per URL
+    Entries are fresh for a per-endpoint TTL, then revalidated with
+    If-None-Match / If-Modified-Since. File mtimes double as the LRU
+    order, and the oldest entries are evicted once max_bytes is exceeded.
+    In cache_only mode nothing touches the network.
+    """
+
+    def __init__(self, directory=HTTP_CACHE_DIR, ttls=HTTP_CACHE_TTLS, default_ttl=0,
+                 max_bytes=HTTP_CACHE_MAX_BYTES, cache_only=False):
+        self.directory = directory
+        self.ttls = [(re.compile(pattern), ttl) for pattern, ttl in ttls]
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.cache_only = cache_only
+        self.lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        self.sizes = {
+            entry.path: entry.stat().st_size
+            for entry in os.scandir(directory) if entry.name.endswith('.json')
+        }
+
+    def ttl_for(self, url):
+        """Seconds a response from this URL stays fresh"""
+        for pattern, ttl in self.ttls:
+            if pattern.search(url):
+                return ttl
+        return self.default_ttl
+
+    def path_for(self, url):
+        return os.path.join(self.directory, hashlib.sha1(url.encode()).hexdigest() + '.json')
+
+    def get(self, url):
+        """Return the stored entry for url (marking it recently used) or None"""
+        path = self.path_for(url)
+        try:
+            with open(path, 'r') as f:
+                entry = json.load(f)
+            os.utime(path)
+            return entry
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def is_fresh(self, entry, url):
+        return time.time() - entry['stored_at'] < self.ttl_for(url)
+
+    def conditional_headers(self, entry):
+        """Validators to send when revalidating a stale entry"""
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, url, response):
+        """Save a 200 response"""
+        return self.write(url, {
+            'url': url,
+            'stored_at': time.time(),
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'body': response.text
+        })
+
+    def store_stream(self, url, response, chunks):
+        """
+        Pass a 200 response's text chunks through while spooling them to disk
+        The entry is only stored once the last chunk has gone through
+        """
+        path = self.path_for(url)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        header = json.dumps({
+            'url': url,
+            'stored_at': time.time(),
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        })
+        try:
+            with open(tmp_path, 'w') as f:
+                # Same layout as store(): the body is written as one JSON string, a chunk at a time
+                f.write(header[:-1] + ', "body": "')
+                for chunk in chunks:
+                    f.write(json.dumps(chunk)[1:-1])
+                    yield chunk
+                f.write('"}')
+        except BaseException:
+            # Abandoned or failed download - never leave a truncated entry behind
+            os.remove(tmp_path)
+            raise
+        self.commit(path, tmp_path)
+
+    def revalidated(self, url, entry, response):
+        """Restart an entry's TTL after a 304, picking up any new validators"""
+        entry['stored_at'] = time.time()
+        entry['etag'] = response.headers.get('ETag') or entry.get('etag')
+        entry['last_modified'] = response.headers.get('Last-Modified') or entry.get('last_modified')
+        return self.write(url, entry)
+
+    def write(self, url, entry):
+        path = self.path_for(url)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(entry, f)
+        self.commit(path, tmp_path)
+        return entry
+
+    def commit(self, path, tmp_path):
+        """Move a finished temp file into place and evict if the cache is now too big"""
+        os.replace(tmp_path, path)
+        with self.lock:
+            self.sizes[path] = os.path.getsize(path)
+            self.evict()
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        total = sum(self.sizes.values())
+        if total <= self.max_bytes:
+            return
+
+        def last_used(path):
+            try:
+                return os.path.getmtime(path)
+            except FileNotFoundError:
+                return 0
+
+        for path in sorted(self.sizes, key=last_used):
+            if total <= self.max_bytes:
+                break
+            total -= self.sizes.pop(path)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def default_cache():
+    """
+    Shared cache used by the scrapers
+    Set FANTASY_HTTP_CACHE=off to bypass it or =offline for cache-only runs
+    """
+    global _default_cache
+    mode = os.environ.get('FANTASY_HTTP_CACHE', 'on').lower()
+    if mode == 'off':
+        return None
+
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = HTTPCache()
+        _default_cache.cache_only = mode == 'offline'
+        return _default_cache
+
+def resolve_cache(cache):
+    """Map a caller's cache argument (True, False/None or an HTTPCache) to a cache or None"""
+    if cache is True:
+        return default_cache()
+    return cache or None
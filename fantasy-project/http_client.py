@@ -0,0 +1,278 @@
+import codecs
+import json
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from http_cache import CacheMiss
+import metrics
+
+# Statuses worth another attempt - everything else in 4xx is final
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter
+    Allows bursts of up to `capacity` requests and `rate` requests per second after that
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def record(self, status, latency, retry_after=None):
+        """Fixed-rate limiter ignores response feedback"""
+
+class AdaptiveThrottle:
+    """
+    Thread-safe request pacer that adapts to the upstream server
+    Spacing shrinks while responses are fast and healthy, grows when latency
+    climbs above the observed baseline, and backs off hard on 429/5xx
+    """
+
+    def __init__(self, min_delay=0.0, max_delay=5.0, initial_delay=0.1):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.delay = initial_delay
+        self.latency = None       # EWMA of response latency
+        self.baseline = None      # fastest smoothed latency seen so far
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Reserve the next request slot and sleep until it arrives"""
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.delay
+        if slot > now:
+            time.sleep(slot - now)
+
+    def record(self, status, latency, retry_after=None):
+        """Feed back one response (status None for a connection error)"""
+        with self.lock:
+            if status is None or status == 429 or status >= 500:
+                # Multiplicative decrease of the request rate
+                self.delay = min(self.max_delay, max(self.delay * 2, 0.05))
+                if retry_after:
+                    self.next_slot = max(self.next_slot, time.monotonic() + retry_after)
+                return
+
+            self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+            self.baseline = self.latency if self.baseline is None else min(self.baseline, self.latency)
+
+            if self.latency > 3 * self.baseline:
+                # Server is slowing down - ease off before it starts refusing
+                self.delay = min(self.max_delay, max(self.delay * 1.25, 0.005))
+            else:
+                self.delay = max(self.min_delay, self.delay * 0.8)
+
+def retry_after_seconds(response):
+    """Retry-After header in seconds, if the server sent a numeric one"""
+    value = response.headers.get('Retry-After')
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def make_session(pool_size=10):
+    """Create a requests session with a keep-alive connection pool shared across threads"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def request_with_retries(session, url, headers=None, rate_limiter=None, retries=3, backoff=0.5,
+                         timeout=10, stream=False):
+    """
+    GET url, retrying connection errors, 429s and 5xx with exponential backoff
+    Returns the first response that is not an error status (200, 304, ...) and
+    raises the last requests exception once retries are exhausted
+    """
+    for attempt in range(retries + 1):
+        if rate_limiter:
+            rate_limiter.acquire()
+
+        started = time.monotonic()
+        try:
+            response = session.get(url, timeout=timeout, headers=headers or {}, stream=stream)
+        except (requests.ConnectionError, requests.Timeout):
+            latency = time.monotonic() - started
+            metrics.record_http(url, None, latency)
+            if rate_limiter:
+                rate_limiter.record(None, latency)
+            if attempt == retries:
+                raise
+            status = None
+        else:
+            latency = time.monotonic() - started
+            metrics.record_http(url, response.status_code, latency)
+            if rate_limiter:
+                rate_limiter.record(response.status_code, latency, retry_after_seconds(response))
+            try:
+                response.raise_for_status()
+                return response
+            except requests.HTTPError:
+                response.close()
+                if response.status_code not in RETRY_STATUSES or attempt == retries:
+                    raise
+            status = response.status_code
+
+        metrics.record_retry(url, status, attempt + 1)
+        time.sleep(backoff * (2 ** attempt))
+
+def get_json(session, url, rate_limiter=None, retries=3, backoff=0.5, timeout=10, cache=None):
+    """
+    GET a JSON endpoint, retrying connection errors, 429s and 5xx with exponential backoff
+    Raises the last requests exception once retries are exhausted
+
+    rate_limiter is a TokenBucket or AdaptiveThrottle; it is acquired before
+    every attempt and told how each attempt went. With an HTTPCache, fresh
+    entries are served from disk and stale ones are revalidated.
+    """
+    entry = cache.get(url) if cache else None
+    if entry and (cache.cache_only or cache.is_fresh(entry, url)):
+        metrics.record_cache(url, 'hit')
+        return json.loads(entry['body'])
+    if cache and cache.cache_only:
+        raise CacheMiss(f"{url} is not cached")
+    headers = cache.conditional_headers(entry) if entry else {}
+
+    response = request_with_retries(session, url, headers, rate_limiter, retries, backoff, timeout)
+    if response.status_code == 304 and entry:
+        # Unchanged upstream - keep the body, restart its TTL
+        metrics.record_cache(url, 'revalidated')
+        cache.revalidated(url, entry, response)
+        return json.loads(entry['body'])
+    data = response.json()
+    if cache:
+        metrics.record_cache(url, 'miss')
+        cache.store(url, response)
+    return data
+
+def text_chunks(text, chunk_size=64 * 1024):
+    for start in range(0, len(text), chunk_size):
+        yield text[start:start + chunk_size]
+
+def iter_json_array(chunks):
+    """
+    Yield the elements of a top-level JSON array as its text arrives
+    chunks is any iterable of str; only the element being decoded (plus one
+    chunk) is held in memory. Malformed input, including missing, doubled or
+    trailing commas, raises ValueError.
+    """
+    decoder = json.JSONDecoder()
+    chunks = iter(chunks)
+    buffer = ''
+    pos = 0
+    started = False
+    expect = 'first'   # 'first' (value or ']'), 'value' (after a comma) or 'separator' (',' or ']')
+    exhausted = False
+
+    def more():
+        nonlocal buffer, pos, exhausted
+        chunk = next(chunks, None)
+        if chunk is None:
+            exhausted = True
+            return False
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        return True
+
+    while True:
+        # Skip whitespace and the separator before the next element
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n':
+                pos += 1
+            if pos < len(buffer) or not more():
+                break
+        if pos == len(buffer):
+            raise ValueError("Unexpected end of JSON array")
+
+        char = buffer[pos]
+        if not started:
+            if char != '[':
+                raise ValueError("Expected a JSON array")
+            started = True
+            pos += 1
+            continue
+        if char == ']':
+            if expect == 'value':
+                raise ValueError("Trailing comma in JSON array")
+            return
+        if char == ',':
+            if expect != 'separator':
+                raise ValueError("Unexpected comma in JSON array")
+            expect = 'value'
+            pos += 1
+            continue
+        if expect == 'separator':
+            raise ValueError("Missing comma between JSON array elements")
+
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if exhausted or not more():
+                    raise
+                continue
+            # A value not yet followed by a separator may be a number cut off mid-chunk
+            if (end == len(buffer) or buffer[end] not in ',] \t\r\n') and not exhausted and more():
+                continue
+            break
+        pos = end
+        expect = 'separator'
+        yield value
+
+def stream_json_array(session, url, rate_limiter=None, retries=3, backoff=0.5, timeout=10, cache=None,
+                      chunk_size=64 * 1024):
+    """
+    Like get_json for endpoints that return a JSON array, but yields the
+    elements while the body is still downloading. Retries only happen before
+    the first byte; with an HTTPCache the body is spooled to disk as it streams.
+    """
+    entry = cache.get(url) if cache else None
+    if entry and (cache.cache_only or cache.is_fresh(entry, url)):
+        metrics.record_cache(url, 'hit')
+        yield from iter_json_array(text_chunks(entry['body'], chunk_size))
+        return
+    if cache and cache.cache_only:
+        raise CacheMiss(f"{url} is not cached")
+    headers = cache.conditional_headers(entry) if entry else {}
+
+    response = request_with_retries(session, url, headers, rate_limiter, retries, backoff, timeout,
+                                    stream=True)
+    with response:
+        if response.status_code == 304 and entry:
+            metrics.record_cache(url, 'revalidated')
+            cache.revalidated(url, entry, response)
+            yield from iter_json_array(text_chunks(entry['body'], chunk_size))
+            return
+
+        decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+        chunks = (decoder.decode(chunk) for chunk in response.iter_content(chunk_size))
+        if cache:
+            metrics.record_cache(url, 'miss')
+            chunks = cache.store_stream(url, response, chunks)
+        yield from iter_json_array(chunks)
+        # Let the cache see the rest of the body (trailing whitespace) so the entry completes
+        for _ in chunks:
+            pass
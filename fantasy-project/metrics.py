@@ -0,0 +1,258 @@
+import atexit
+import functools
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+# Seconds - covers a fast cache-warm API call up to a stalled request
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+logger = logging.getLogger('fantasy')
+
+class Counter:
+    """Monotonic count per label set"""
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            return [(dict(key), value) for key, value in self.values.items()]
+
+class Histogram:
+    """Bucketed observations per label set, Prometheus style"""
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.values = {}   # labels -> [count per bucket..., +Inf count, sum]
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            counts = self.values.get(key)
+            if counts is None:
+                counts = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[len(self.buckets)] += 1
+            counts[-1] += value
+
+    def samples(self):
+        """(labels, cumulative bucket counts, count, sum) per label set"""
+        with self.lock:
+            values = [(dict(key), list(counts)) for key, counts in self.values.items()]
+        samples = []
+        for labels, counts in values:
+            cumulative, running = [], 0
+            for count in counts[:-1]:
+                running += count
+                cumulative.append(running)
+            samples.append((labels, cumulative, running, counts[-1]))
+        return samples
+
+class Registry:
+    """Every metric recorded during a run, exportable as JSON or Prometheus text"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self.started = time.time()
+
+    def get(self, cls, name, help_text, **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, help_text, **kwargs)
+            return metric
+
+    def counter(self, name, help_text=''):
+        return self.get(Counter, name, help_text)
+
+    def histogram(self, name, help_text='', buckets=LATENCY_BUCKETS):
+        return self.get(Histogram, name, help_text, buckets=buckets)
+
+    def reset(self):
+        """Zero every metric, keeping the objects modules already hold"""
+        with self.lock:
+            for metric in self.metrics.values():
+                with metric.lock:
+                    metric.values.clear()
+            self.started = time.time()
+
+    def snapshot(self):
+        """Plain dict of every metric - counters as values, histograms as count/sum/buckets"""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        snapshot = {'started': self.started, 'taken': time.time(), 'counters': {}, 'histograms': {}}
+        for metric in metrics:
+            if isinstance(metric, Counter):
+                snapshot['counters'][metric.name] = [
+                    {'labels': labels, 'value': value} for labels, value in metric.samples()
+                ]
+            else:
+                snapshot['histograms'][metric.name] = [
+                    {'labels': labels, 'count': count, 'sum': round(total, 6),
+                     'buckets': dict(zip([str(b) for b in metric.buckets] + ['+Inf'], cumulative))}
+                    for labels, cumulative, count, total in metric.samples()
+                ]
+        snapshot['rows_per_second'] = rows_per_second(snapshot)
+        return snapshot
+
+    def prometheus_text(self):
+        """Prometheus text exposition format"""
+        with self.lock:
+            metrics = sorted(self.metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            if metric.help:
+                lines.append(f"# HELP {metric.name} {metric.help}")
+            if isinstance(metric, Counter):
+                lines.append(f"# TYPE {metric.name} counter")
+                for labels, value in metric.samples():
+                    lines.append(f"{metric.name}{format_labels(labels)} {value}")
+            else:
+                lines.append(f"# TYPE {metric.name} histogram")
+                for labels, cumulative, count, total in metric.samples():
+                    for bound, running in zip([str(b) for b in metric.buckets] + ['+Inf'], cumulative):
+                        lines.append(f"{metric.name}_bucket{format_labels({**labels, 'le': bound})} {running}")
+                    lines.append(f"{metric.name}_sum{format_labels(labels)} {total}")
+                    lines.append(f"{metric.name}_count{format_labels(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"') for value in labels.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+def rows_per_second(snapshot):
+    """Rows written per second of write time, per table"""
+    rows = {sample['labels']['table']: sample['value']
+            for sample in snapshot['counters'].get('fantasy_rows_written_total', [])}
+    seconds = {sample['labels']['table']: sample['sum']
+               for sample in snapshot['histograms'].get('fantasy_write_seconds', [])}
+    return {table: round(count / seconds[table], 1) for table, count in rows.items() if seconds.get(table)}
+
+REGISTRY = Registry()
+
+def counter(name, help_text=''):
+    return REGISTRY.counter(name, help_text)
+
+def histogram(name, help_text='', buckets=LATENCY_BUCKETS):
+    return REGISTRY.histogram(name, help_text, buckets)
+
+def log_event(event, **fields):
+    """One structured (JSON) log line on the 'fantasy' logger"""
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({'ts': round(time.time(), 3), 'event': event, **fields}, default=str))
+
+def endpoint(url):
+    """Low-cardinality endpoint label: host and path with ids replaced, e.g. /athletes/{id}/gamelog"""
+    parsed = urlparse(url)
+    path = re.sub(r'/\d+(?=/|$)', '/{id}', parsed.path)
+    return f"{parsed.netloc}{path}"
+
+@contextmanager
+def stage(name, **labels):
+    """Time a pipeline stage into fantasy_stage_seconds and log its wall time"""
+    started = time.monotonic()
+    status = 'ok'
+    try:
+        yield
+    except BaseException:
+        status = 'error'
+        raise
+    finally:
+        seconds = time.monotonic() - started
+        histogram('fantasy_stage_seconds', 'Wall time of each pipeline stage').observe(
+            seconds, stage=name, **labels)
+        log_event('stage', stage=name, seconds=round(seconds, 4), status=status, **labels)
+
+def timed(name):
+    """Decorator form of stage() for a whole function"""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def record_http(url, status, seconds):
+    """One HTTP attempt; status is None for a connection error or timeout"""
+    labels = {'endpoint': endpoint(url)}
+    histogram('fantasy_http_request_seconds', 'HTTP request latency per endpoint').observe(seconds, **labels)
+    counter('fantasy_http_requests_total', 'HTTP attempts by endpoint and status').inc(
+        status=str(status or 'error'), **labels)
+    if status == 429:
+        counter('fantasy_http_throttled_total', '429 responses by endpoint').inc(**labels)
+
+def record_retry(url, status, attempt):
+    counter('fantasy_http_retries_total', 'Requests retried by endpoint').inc(endpoint=endpoint(url))
+    log_event('http_retry', endpoint=endpoint(url), status=status, attempt=attempt)
+
+def record_cache(url, result):
+    """result is 'hit', 'revalidated' or 'miss'"""
+    counter('fantasy_http_cache_total', 'HTTP cache lookups by result').inc(
+        endpoint=endpoint(url), result=result)
+
+def record_match(match_type):
+    counter('fantasy_matches_total', 'Name matches by match type').inc(match_type=match_type)
+
+def record_rows(table, rows, seconds):
+    """Rows written to a table and the time the write took"""
+    counter('fantasy_rows_written_total', 'Rows written by table').inc(rows, table=table)
+    histogram('fantasy_write_seconds', 'Time per database write batch').observe(seconds, table=table)
+
+def write_snapshot(path=None):
+    """
+    Write every metric to path (default $FANTASY_METRICS_FILE)
+    A .prom path gets Prometheus text, anything else JSON
+    """
+    path = path or os.environ.get('FANTASY_METRICS_FILE')
+    if not path:
+        return None
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        if path.endswith('.prom'):
+            f.write(REGISTRY.prometheus_text())
+        else:
+            json.dump(REGISTRY.snapshot(), f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+def configure_from_env():
+    """
+    FANTASY_METRICS_LOG=- sends structured logs to stderr (or give a file path)
+    FANTASY_METRICS_FILE=metrics.json|metrics.prom writes a snapshot when the run exits
+    """
+    log_target = os.environ.get('FANTASY_METRICS_LOG')
+    if log_target and not logger.handlers:
+        handler = logging.StreamHandler() if log_target == '-' else logging.FileHandler(log_target)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    if os.environ.get('FANTASY_METRICS_FILE'):
+        atexit.register(write_snapshot)
+
+configure_from_env()
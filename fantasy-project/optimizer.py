@@ -0,0 +1,235 @@
+import numpy as np
+from database import get_connection
+
+# DraftKings NFL classic: QB, 2 RB, 3 WR, TE, FLEX (RB/WR/TE), DST, $50k cap
+SALARY_CAP = 50000
+SALARY_UNIT = 100   # DK salaries are multiples of $100
+POSITIONS = ['QB', 'RB', 'WR', 'TE', 'DST']
+POSITION_ALIASES = {'FB': 'RB', 'D': 'DST', 'DEF': 'DST', 'D/ST': 'DST'}
+SLOTS = ['QB', 'RB', 'RB', 'WR', 'WR', 'WR', 'TE', 'FLEX', 'DST']
+
+# Each way to fill FLEX as exact counts per position
+ROSTER_CONFIGS = [
+    {'QB': 1, 'RB': 3, 'WR': 3, 'TE': 1, 'DST': 1},
+    {'QB': 1, 'RB': 2, 'WR': 4, 'TE': 1, 'DST': 1},
+    {'QB': 1, 'RB': 2, 'WR': 3, 'TE': 2, 'DST': 1},
+]
+
+class Slate:
+    """One slate as parallel arrays, grouped by position and sorted by projection"""
+
+    def __init__(self, keys, positions, salaries, projections):
+        order = np.lexsort((-np.asarray(projections, dtype=float),
+                            [POSITIONS.index(position) for position in positions]))
+        self.keys = np.asarray(keys, dtype=object)[order]
+        self.position_codes = np.array([POSITIONS.index(positions[i]) for i in order], dtype=np.int8)
+        self.salaries = np.asarray(salaries, dtype=np.int64)[order]
+        self.projections = np.asarray(projections, dtype=np.float64)[order]
+        self.salary_units = np.rint(self.salaries / SALARY_UNIT).astype(np.int64)
+
+        # [start, end) of each position's block
+        self.bounds = {
+            position: tuple(int(i) for i in np.searchsorted(self.position_codes, [code, code + 1]))
+            for code, position in enumerate(POSITIONS)
+        }
+
+    def __len__(self):
+        return len(self.keys)
+
+def load_slate(date, slate_id=None, db_path="fantasy_data.db"):
+    """Load a slate from weekly_data joined with players.position"""
+    conn = get_connection(db_path)
+    sql = '''
+        SELECT w.team_jersey, p.position, w.salary, w.projected_fpts
+        FROM weekly_data w
+        JOIN players p ON p.team_jersey = w.team_jersey
+        WHERE w.date = ? AND w.salary > 0
+    '''
+    params = [date]
+    if slate_id is not None:
+        sql += ' AND w.slate_id = ?'
+        params.append(slate_id)
+    rows = conn.execute(sql, params).fetchall()
+    conn.close()
+
+    rows = [(key, POSITION_ALIASES.get(position, position), salary, fpts)
+            for key, position, salary, fpts in rows]
+    rows = [row for row in rows if row[1] in POSITIONS]
+    if not rows:
+        return Slate([], [], [], [])
+    keys, positions, salaries, projections = zip(*rows)
+    return Slate(keys, list(positions), salaries, projections)
+
+class LineupOptimizer:
+    """
+    Exact top-N lineup search for one slate
+    A dynamic program over salary (in $100 units) gives, for every player index,
+    remaining picks and remaining budget, the best projection still reachable.
+    A depth-first branch and bound walks players in position order and prunes
+    any branch whose DP bound cannot beat the best lineup found so far.
+    """
+
+    def __init__(self, slate, salary_cap=SALARY_CAP, roster_configs=ROSTER_CONFIGS):
+        self.slate = slate
+        self.budget = salary_cap // SALARY_UNIT
+        self.configs = [config for config in roster_configs if self.fillable(config)]
+        if not self.configs and any('DST' in config for config in roster_configs):
+            # RotoWire defenses never match an ESPN roster entry - optimize the other 8 slots
+            print("No DST in slate, building lineups without the DST slot")
+            roster_configs = [{p: n for p, n in config.items() if p != 'DST'} for config in roster_configs]
+            self.configs = [config for config in roster_configs if self.fillable(config)]
+        if not self.configs:
+            raise ValueError("Slate does not have enough players to fill a lineup")
+
+    def fillable(self, config):
+        return all(
+            self.slate.bounds[position][1] - self.slate.bounds[position][0] >= count
+            for position, count in config.items()
+        )
+
+    def bound_tables(self, config, projections):
+        """
+        For each position group in config, an array H of shape (players + 1, picks + 1, budget + 1)
+        H[i, r, s] = best projection from group players i.. (taking exactly r) plus all later
+        groups, within salary s. -inf where that is impossible.
+        """
+        groups = [position for position in POSITIONS if position in config]
+        tables = {}
+        after = np.zeros(self.budget + 1)   # nothing left to pick: 0 points at any budget
+
+        for position in reversed(groups):
+            start, end = self.slate.bounds[position]
+            picks = config[position]
+            table = np.full((end - start + 1, picks + 1, self.budget + 1), -np.inf)
+            table[end - start, 0] = after
+
+            for offset in range(end - start - 1, -1, -1):
+                i = start + offset
+                row = table[offset + 1].copy()
+                cost = self.slate.salary_units[i]
+                if projections[i] > -np.inf and cost <= self.budget:
+                    take = table[offset + 1, :-1, :self.budget + 1 - cost] + projections[i]
+                    row[1:, cost:] = np.maximum(row[1:, cost:], take)
+                table[offset] = row
+
+            tables[position] = table
+            after = table[0, picks]
+        return groups, tables
+
+    def search(self, config, groups, tables, projections, best, accept):
+        """Depth-first branch and bound over one roster config, returns (value, lineup)"""
+        bounds = self.slate.bounds
+        costs = self.slate.salary_units.tolist()
+        points = projections.tolist()
+        best_lineup = None
+        chosen = []
+
+        def visit(group_index, offset, remaining, budget, value):
+            nonlocal best, best_lineup
+            if remaining == 0:
+                group_index += 1
+                if group_index == len(groups):
+                    if value > best and accept(chosen):
+                        best, best_lineup = value, list(chosen)
+                    return
+                offset, remaining = 0, config[groups[group_index]]
+
+            position = groups[group_index]
+            reachable = tables[position][:, remaining, budget]
+            start, end = bounds[position]
+
+            # Try each player as the next pick; the bound only shrinks as offset grows
+            for offset in range(offset, end - start):
+                if value + reachable[offset] <= best:
+                    break
+                i = start + offset
+                if costs[i] <= budget and points[i] > -np.inf:
+                    chosen.append(i)
+                    visit(group_index, offset + 1, remaining - 1, budget - costs[i], value + points[i])
+                    chosen.pop()
+
+        visit(0, 0, config[groups[0]], self.budget, 0.0)
+        return best, best_lineup
+
+    def optimize(self, num_lineups=1, max_exposure=1.0, min_unique=1, exclude=()):
+        """
+        Build up to num_lineups lineups, best first
+        max_exposure caps the share of lineups any player appears in, and every
+        lineup differs from each earlier one by at least min_unique players
+        """
+        slate = self.slate
+        projections = slate.projections.copy()
+        excluded = set(exclude)
+        projections[[i for i, key in enumerate(slate.keys) if key in excluded]] = -np.inf
+
+        max_count = max(1, int(max_exposure * num_lineups))
+        counts = np.zeros(len(slate), dtype=np.int64)
+        roster_size = sum(self.configs[0].values())
+        max_overlap = roster_size - min_unique
+        masks = []
+        lineups = []
+
+        def accept(chosen):
+            mask = 0
+            for i in chosen:
+                mask |= 1 << i
+            return all((mask & previous).bit_count() <= max_overlap for previous in masks)
+
+        tables = [self.bound_tables(config, projections) for config in self.configs]
+        while len(lineups) < num_lineups:
+            best, best_lineup = -np.inf, None
+            for config, (groups, table) in zip(self.configs, tables):
+                value, lineup = self.search(config, groups, table, projections, best, accept)
+                if lineup is not None:
+                    best, best_lineup = value, lineup
+            if best_lineup is None:
+                break
+
+            lineups.append(self.describe(best_lineup))
+            masks.append(sum(1 << i for i in best_lineup))
+            counts[best_lineup] += 1
+
+            capped = [i for i in best_lineup if counts[i] >= max_count]
+            if capped:
+                projections[capped] = -np.inf
+                tables = [self.bound_tables(config, projections) for config in self.configs]
+
+        return lineups
+
+    def describe(self, indexes):
+        """Lineup dict with players in DK slot order"""
+        slate = self.slate
+        by_position = {position: [] for position in POSITIONS}
+        for i in sorted(indexes, key=lambda i: -slate.projections[i]):
+            by_position[POSITIONS[slate.position_codes[i]]].append(i)
+
+        players = []
+        for slot in SLOTS:
+            if slot == 'FLEX':
+                continue
+            if by_position[slot]:
+                players.append((slot, by_position[slot].pop(0)))
+        flex = [i for position in ['RB', 'WR', 'TE'] for i in by_position[position]]
+        if flex:
+            players.insert(SLOTS.index('FLEX'), ('FLEX', flex[0]))
+
+        return {
+            'players': [(slot, slate.keys[i]) for slot, i in players],
+            'salary': int(slate.salaries[indexes].sum()),
+            'projected_fpts': round(float(slate.projections[indexes].sum()), 2)
+        }
+
+def optimize_slate(date, slate_id=None, num_lineups=1, max_exposure=1.0, min_unique=1,
+                   db_path="fantasy_data.db"):
+    """Load a slate and return its top lineups"""
+    slate = load_slate(date, slate_id, db_path)
+    return LineupOptimizer(slate).optimize(num_lineups, max_exposure, min_unique)
+
+if __name__ == "__main__":
+    from datetime import datetime
+
+    today = datetime.now().strftime("%Y-%m-%d")
+    for lineup in optimize_slate(today, num_lineups=5):
+        print(f"${lineup['salary']}  {lineup['projected_fpts']} pts")
+        for slot, key in lineup['players']:
+            print(f"  {slot:<4} {key}")
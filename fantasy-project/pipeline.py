@@ -0,0 +1,256 @@
+"""
+Run the whole pipeline with one command
+
+    python pipeline.py [--slates 8602 8603] [--season 2025] [--rules dk] [--force [stage ...]]
+
+Stages form a dependency graph and independent ones run concurrently:
+
+    rosters --> slates --+--> scoring --> history
+           \\--> stats  --+--> correlations
+
+Each stage has an input fingerprint (roster hash, slate ids + date, completed
+week, ...) combined with the fingerprints of the stages it depends on. A stage
+whose fingerprint matches its last successful run (pipeline_runs table) is
+skipped, so a routine run only does the work that is actually new.
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from database import (get_connection, diff_players, apply_player_diff, load_checkpoints,
+                      load_stage_runs, save_stage_run, PLAYER_COLUMNS)
+from player_lookup import build_player_lookup, PlayerLookup
+from scraper import scrape_rotowire_slates
+from scoring import score_weekly_data, RULE_TABLES
+from stats_scraper import scrape_season_stats, completed_weeks
+from history import export_history, HISTORY_DIR
+from correlations import update_correlations
+import metrics
+
+def fingerprint(value):
+    """Short stable hash of any JSON-serializable value"""
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+class PipelineContext:
+    """
+    State shared by every stage of one run
+    One connection (guarded by lock) serves the roster diff, fingerprint
+    queries and pipeline_runs bookkeeping, and one PlayerLookup is shared by
+    the slate and stats stages. Bulk writers running concurrently on other
+    threads still open their own connections, since a SQLite connection
+    holds one transaction at a time.
+    """
+
+    def __init__(self, db_path="fantasy_data.db", slate_ids=(8602,), date=None, season=2025,
+                 rules='dk', max_workers=8):
+        self.db_path = db_path
+        self.slate_ids = list(slate_ids)
+        self.date = date or datetime.now().strftime("%Y-%m-%d")
+        self.season = season
+        self.rules = rules
+        self.max_workers = max_workers
+        self.conn = get_connection(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.previous = {}   # stage -> (fingerprint, inputs) of its last successful run
+        self._player_lookup = None
+
+    @property
+    def player_lookup(self):
+        # Opened on first use, after the rosters stage has written the players table
+        with self.lock:
+            if self._player_lookup is None:
+                self._player_lookup = PlayerLookup(self.db_path)
+            return self._player_lookup
+
+    def query(self, sql, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def close(self):
+        if self._player_lookup is not None:
+            self._player_lookup.close()
+        self.conn.close()
+
+# Stage functions. fingerprint(context) returns the stage's inputs as a small
+# JSON-serializable value; run(context) does the work and may return False to
+# leave the fingerprint unrecorded, so the next run tries again. A run that
+# changes its own inputs returns them instead, and those are recorded and
+# passed downstream.
+
+def rosters_fingerprint(context):
+    # Rosters are fetched once per slate date, and downstream stages follow the stored roster
+    players = context.query(f"SELECT team_jersey, {', '.join(PLAYER_COLUMNS)} FROM players WHERE active = 1 "
+                            "ORDER BY team_jersey")
+    return [context.date, fingerprint(players)]
+
+def rosters_run(context):
+    # The HTTP cache makes an unchanged roster a cheap revalidation
+    roster = build_player_lookup()
+    with context.lock:
+        diff = diff_players(roster, context.conn)
+        apply_player_diff(diff, context.conn)
+    print(f"Players: {len(diff['added'])} added, {len(diff['changed'])} changed, "
+          f"{len(diff['removed'])} removed")
+    # The roster as it stands now, so an unchanged roster on the next run is skipped
+    return rosters_fingerprint(context)
+
+def slates_fingerprint(context):
+    return [sorted(context.slate_ids), context.date]
+
+def slates_run(context):
+    scrape_rotowire_slates(context.slate_ids, db_path=context.db_path, player_lookup=context.player_lookup,
+                           date=context.date)
+
+def stats_fingerprint(context):
+    return [context.season, completed_weeks(context.season)]
+
+def stats_run(context):
+    through_week = completed_weeks(context.season)
+    scrape_season_stats(context.season, through_week, context.max_workers, context.db_path,
+                        player_lookup=context.player_lookup)
+    # Players that failed or were fetched mid-week keep the stage pending
+    # (run key as in scrape_season_stats)
+    with context.lock:
+        checkpoints = load_checkpoints(f"season:{context.season}:{through_week}", context.conn)
+    if any(status != 'done' for status, _ in checkpoints.values()):
+        return False
+
+def scoring_fingerprint(context):
+    return [context.rules,
+            context.query("SELECT MAX(updated_at), COUNT(*) FROM player_stats"),
+            context.query("SELECT MAX(id), COUNT(*) FROM weekly_data")]
+
+def scoring_run(context):
+    # Rows scored under other rules are only stale if the rules changed
+    last_rules = context.previous.get('scoring', (None, [context.rules]))[1][0]
+    score_weekly_data(RULE_TABLES[context.rules], context.db_path, rescore_all=last_rules != context.rules)
+
+def correlations_fingerprint(context):
+    return [context.rules]
+
+def correlations_run(context):
+    # update_correlations folds in only new weeks; other rules mean starting over
+    last_rules = context.previous.get('correlations', (None, [context.rules]))[1][0]
+    update_correlations(context.db_path, RULE_TABLES[context.rules], rebuild=last_rules != context.rules)
+
+def history_fingerprint(context):
+    # Nothing beyond the upstream fingerprints - export_history itself skips unchanged partitions
+    return HISTORY_DIR
+
+def history_run(context):
+    export_history(HISTORY_DIR, context.db_path)
+
+# name -> (dependencies, fingerprint, run)
+STAGES = {
+    'rosters': ([], rosters_fingerprint, rosters_run),
+    'slates': (['rosters'], slates_fingerprint, slates_run),
+    'stats': (['rosters'], stats_fingerprint, stats_run),
+    'scoring': (['slates', 'stats'], scoring_fingerprint, scoring_run),
+    'history': (['scoring'], history_fingerprint, history_run),
+    'correlations': (['slates', 'stats'], correlations_fingerprint, correlations_run),
+}
+
+def run_stage(name, stage, context, upstream, force):
+    """Fingerprint one stage and run it unless unchanged; returns (status, fingerprint, inputs, seconds)"""
+    dependencies, stage_fingerprint, stage_run = stage
+    started = time.monotonic()
+    inputs = stage_fingerprint(context)
+    current = fingerprint([inputs, {dep: upstream[dep] for dep in dependencies}])
+    if current == context.previous.get(name, (None,))[0] and not force:
+        metrics.log_event('pipeline_stage', stage=name, status='skipped', fingerprint=current)
+        return 'skipped', current, inputs, time.monotonic() - started
+
+    print(f"[{name}] running")
+    with metrics.stage(f"pipeline_{name}"):
+        result = stage_run(context)
+    if result is False:
+        return 'partial', current, inputs, time.monotonic() - started
+    if result is not None:
+        inputs = result
+        current = fingerprint([inputs, {dep: upstream[dep] for dep in dependencies}])
+    return 'done', current, inputs, time.monotonic() - started
+
+def run_pipeline(context, stages=STAGES, force=()):
+    """
+    Run every stage once its dependencies have finished, independent stages in parallel
+    force is a collection of stage names to run regardless of fingerprints (True for all)
+    A failed stage blocks the stages downstream of it, as does a dependency
+    missing from stages.
+    Returns {stage: status} with status done, partial, skipped, failed or blocked.
+    """
+    with context.lock:
+        context.previous = load_stage_runs(context.conn)
+    upstream = {}   # stage -> fingerprint it ran (or was skipped) with
+    results = {}
+    pending = dict(stages)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=len(stages)) as executor:
+        while pending or running:
+            for name, stage in list(pending.items()):
+                dependencies = stage[0]
+                if any(results.get(dep) in ('failed', 'blocked') for dep in dependencies):
+                    results[name] = 'blocked'
+                    del pending[name]
+                elif all(dep in upstream for dep in dependencies):
+                    stage_force = force is True or name in force
+                    running[executor.submit(run_stage, name, stage, context, upstream, stage_force)] = name
+                    del pending[name]
+            if not running:
+                # Nothing left can finish the dependencies of what is still pending
+                for name, stage in pending.items():
+                    missing = [dep for dep in stage[0] if dep not in stages]
+                    if missing:
+                        print(f"[{name}] blocked - unknown dependencies: {', '.join(missing)}")
+                    results[name] = 'blocked'
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    status, current, inputs, seconds = future.result()
+                except Exception as e:
+                    print(f"[{name}] failed: {e}")
+                    results[name] = 'failed'
+                    continue
+                results[name] = status
+                upstream[name] = current
+                if status == 'done':
+                    with context.lock:
+                        save_stage_run(name, current, inputs, seconds, context.conn)
+                if status == 'skipped':
+                    print(f"[{name}] inputs unchanged - skipped")
+                else:
+                    print(f"[{name}] {status} in {seconds:.1f}s")
+
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--db', default="fantasy_data.db")
+    parser.add_argument('--slates', type=int, nargs='+', default=[8602], help='RotoWire slate ids')
+    parser.add_argument('--date', help='slate date (default today)')
+    parser.add_argument('--season', type=int, default=2025)
+    parser.add_argument('--rules', choices=sorted(RULE_TABLES), default='dk', help='scoring rules for actual_fpts')
+    parser.add_argument('--workers', type=int, default=8, help='gamelog fetch threads')
+    parser.add_argument('--force', nargs='*', choices=sorted(STAGES),
+                        help='run these stages (all when none given) even if their inputs are unchanged')
+    args = parser.parse_args()
+
+    context = PipelineContext(args.db, args.slates, args.date, args.season, args.rules, args.workers)
+    try:
+        force = True if args.force == [] else set(args.force or ())
+        results = run_pipeline(context, force=force)
+    finally:
+        context.close()
+
+    print("\n" + ", ".join(f"{name}: {status}" for name, status in results.items()))
+    if any(status in ('failed', 'blocked') for status in results.values()):
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,71 +1,99 @@
 import requests
 import json
-import time
-from config import ROTOWIRE_TO_ESPN_TEAM_IDS
+import os
+import re
+import sqlite3
+import threading
+from collections.abc import ItemsView, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from config import ROTOWIRE_TO_ESPN_TEAM_IDS, ESPN_API_BASE
+from http_client import TokenBucket, make_session, get_json
+from http_cache import resolve_cache
+from database import refresh_players, get_connection, load_name_resolutions, save_name_resolutions
+import metrics
 
-def build_player_lookup():
+def parse_roster(team_abbrev, data):
+    """Turn one ESPN roster response into {team_jersey: player_info}"""
+    roster = {}
+    
+    # Extract player data - ESPN groups by position
+    for position_group in data.get('athletes', []):
+        # The actual players are in the 'items' array
+        for athlete in position_group.get('items', []):
+            name = athlete.get('displayName', '')
+            jersey = athlete.get('jersey', None)
+            
+            # Skip if no jersey number
+            if not jersey:
+                continue
+            
+            # Get position from the athlete's individual data
+            athlete_position = athlete.get('position', {})
+            if isinstance(athlete_position, dict):
+                position_name = athlete_position.get('abbreviation', 'UNKNOWN')
+            else:
+                position_name = str(athlete_position)
+            
+            # Create unique key: TEAM_JERSEY
+            key = f"{team_abbrev}_{jersey}"
+            
+            roster[key] = {
+                'name': name,
+                'position': position_name,
+                'team': team_abbrev,
+                'jersey': str(jersey),
+                'espn_id': athlete.get('id', ''),
+                'height': athlete.get('displayHeight', ''),
+                'weight': athlete.get('displayWeight', ''),
+                'age': athlete.get('age', '')
+            }
+    
+    return roster
+
+@metrics.timed('build_player_lookup')
+def build_player_lookup(max_workers=8, requests_per_second=10, retries=3, backoff=0.5,
+                        base_url=ESPN_API_BASE, cache=True):
     """
     Fetch all NFL player data from ESPN API and create lookup table
     Returns dictionary with team_jersey as key and player info as value
+
+    Rosters are fetched by `max_workers` threads over one pooled session,
+    sharing a token bucket of `requests_per_second`. Each team is retried
+    with exponential backoff before it is reported as failed. Responses go
+    through the shared HTTP cache unless cache=False.
     """
-    player_lookup = {}
-    failed_teams = []
+    cache = resolve_cache(cache)
+    session = make_session(pool_size=max_workers)
+    rate_limiter = TokenBucket(requests_per_second)
+    
+    def fetch_team(team_abbrev, espn_team_id):
+        print(f"Fetching {team_abbrev} roster...")
+        url = f"{base_url}/teams/{espn_team_id}/roster"
+        data = get_json(session, url, rate_limiter=rate_limiter,
+                        retries=retries, backoff=backoff, cache=cache)
+        return parse_roster(team_abbrev, data)
     
     print("Fetching player data from ESPN API...")
     
-    for team_abbrev, espn_team_id in ROTOWIRE_TO_ESPN_TEAM_IDS.items():
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            team_abbrev: executor.submit(fetch_team, team_abbrev, espn_team_id)
+            for team_abbrev, espn_team_id in ROTOWIRE_TO_ESPN_TEAM_IDS.items()
+        }
+    session.close()
+    
+    # Merge in team order so the lookup matches a serial fetch
+    player_lookup = {}
+    failed_teams = []
+    for team_abbrev, future in futures.items():
         try:
-            print(f"Fetching {team_abbrev} roster...")
-            
-            url = f"http://site.api.espn.com/apis/site/v2/sports/football/nfl/teams/{espn_team_id}/roster"
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            # Extract player data - ESPN groups by position
-            for position_group in data.get('athletes', []):
-                # The actual players are in the 'items' array
-                for athlete in position_group.get('items', []):
-                    name = athlete.get('displayName', '')
-                    jersey = athlete.get('jersey', None)
-                    
-                    # Skip if no jersey number
-                    if not jersey:
-                        continue
-                    
-                    # Get position from the athlete's individual data
-                    athlete_position = athlete.get('position', {})
-                    if isinstance(athlete_position, dict):
-                        position_name = athlete_position.get('abbreviation', 'UNKNOWN')
-                    else:
-                        position_name = str(athlete_position)
-                    
-                    # Create unique key: TEAM_JERSEY
-                    key = f"{team_abbrev}_{jersey}"
-                    
-                    player_lookup[key] = {
-                        'name': name,
-                        'position': position_name,
-                        'team': team_abbrev,
-                        'jersey': str(jersey),
-                        'espn_id': athlete.get('id', ''),
-                        'height': athlete.get('displayHeight', ''),
-                        'weight': athlete.get('displayWeight', ''),
-                        'age': athlete.get('age', '')
-                    }
-            
-            # Small delay to be respectful to ESPN's servers
-            time.sleep(0.1)
-            
+            player_lookup.update(future.result())
         except requests.RequestException as e:
             print(f"Failed to fetch {team_abbrev}: {e}")
             failed_teams.append(team_abbrev)
-            continue
         except Exception as e:
             print(f"Error processing {team_abbrev}: {e}")
             failed_teams.append(team_abbrev)
-            continue
     
     print(f"\nFetched data for {len(ROTOWIRE_TO_ESPN_TEAM_IDS) - len(failed_teams)}/32 teams")
     print(f"Total players in lookup: {len(player_lookup)}")
@@ -75,26 +103,126 @@ def build_player_lookup():
     
     return player_lookup
 
-def save_player_lookup(player_data, filename="player_lookup.json"):
-    """Save player lookup data to JSON file"""
-    with open(filename, 'w') as f:
-        json.dump(player_data, f, indent=2)
-    print(f"Player lookup saved to {filename}")
-
-def load_player_lookup(filename="player_lookup.json"):
-    """Load player lookup data from JSON file"""
-    try:
-        with open(filename, 'r') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        print(f"{filename} not found. Run build_player_lookup() first.")
-        return {}
+PLAYER_FIELDS = ['name', 'position', 'team', 'jersey', 'espn_id', 'height', 'weight', 'age']
+
+class PlayerLookupItems(ItemsView):
+    """items() view that streams rows from one query instead of a lookup per key"""
+
+    def __iter__(self):
+        yield from self._mapping.iter_rows()
+
+class PlayerLookup(Mapping):
+    """
+    Read-through {team_jersey: player_info} mapping over the active players
+    Nothing is loaded up front: point lookups are single indexed queries and
+    items()/values() stream the table, so callers written against the old
+    JSON dict keep working without materializing the roster. Players removed
+    from their roster stay in the table but are not part of the lookup.
+    """
+
+    def __init__(self, db_path="fantasy_data.db"):
+        self.db_path = db_path
+        self._conn = None
+        self._columns = ', '.join(PLAYER_FIELDS)
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            # get_connection brings older databases up to date (players.active)
+            self._conn = get_connection(self.db_path, check_same_thread=False)
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def query(self, sql, params=()):
+        try:
+            return self.conn.execute(sql, params)
+        except sqlite3.OperationalError as e:
+            # No players table yet - behave like an empty lookup
+            if 'no such table' not in str(e):
+                raise
+            return iter(())
+
+    def __getitem__(self, team_jersey):
+        row = next(self.query(f"SELECT {self._columns} FROM players WHERE team_jersey = ? AND active = 1",
+                              (team_jersey,)), None)
+        if row is None:
+            raise KeyError(team_jersey)
+        return dict(zip(PLAYER_FIELDS, row))
+
+    def __contains__(self, team_jersey):
+        return next(self.query("SELECT 1 FROM players WHERE team_jersey = ? AND active = 1",
+                               (team_jersey,)), None) is not None
+
+    def __len__(self):
+        # Not cached: refresh_players may write the table while the lookup is open
+        return next(self.query("SELECT COUNT(*) FROM players WHERE active = 1"), (0,))[0]
+
+    def __iter__(self):
+        for (team_jersey,) in self.query("SELECT team_jersey FROM players WHERE active = 1 ORDER BY rowid"):
+            yield team_jersey
+
+    def iter_rows(self):
+        sql = f"SELECT team_jersey, {self._columns} FROM players WHERE active = 1 ORDER BY rowid"
+        for row in self.query(sql):
+            yield row[0], dict(zip(PLAYER_FIELDS, row[1:]))
+
+    def items(self):
+        return PlayerLookupItems(self)
+
+def save_player_lookup(player_data, db_path="fantasy_data.db"):
+    """
+    Save player lookup data to the players table
+    Only roster moves are written - returns the added/changed/removed diff
+    """
+    diff = refresh_players(player_data, db_path)
+    print(f"Player lookup saved to {db_path}")
+    return diff
+
+def load_player_lookup(db_path="fantasy_data.db", legacy_json="player_lookup.json"):
+    """
+    Open the player lookup stored in the players table
+    A lookup saved by older versions as player_lookup.json is imported once
+    """
+    player_lookup = PlayerLookup(db_path)
+    if not player_lookup and os.path.exists(legacy_json):
+        print(f"Importing {legacy_json} into {db_path}...")
+        with open(legacy_json, 'r') as f:
+            save_player_lookup(json.load(f), db_path)
+        player_lookup = PlayerLookup(db_path)
+    
+    if not player_lookup:
+        print(f"No players in {db_path}. Run build_player_lookup() first.")
+    return player_lookup
+
+MATCH_ORDER = {'exact': 0, 'partial_team': 1, 'partial': 2, 'fuzzy': 3}
+
+def normalize_name(name):
+    """Lowercase a player name and collapse runs of whitespace"""
+    return ' '.join(name.lower().split())
+
+def name_tokens(name):
+    """Tokens of a normalized name, hyphenated surnames also split into parts"""
+    tokens = set(name.split())
+    for token in list(tokens):
+        if '-' in token:
+            tokens.update(part for part in token.split('-') if part)
+    return tokens
 
 def find_player_by_name(player_lookup, name, team=None):
     """
     Find player by name (fuzzy matching)
     Returns list of potential matches
+
+    Scans the whole lookup on every call - build a PlayerMatcher once
+    when matching more than a handful of names
     """
+    if isinstance(player_lookup, PlayerMatcher):
+        return player_lookup.match(name, team)
+
     matches = []
     name_lower = name.lower()
     
@@ -113,11 +241,249 @@ def find_player_by_name(player_lookup, name, team=None):
                 matches.append((key, player, 'partial'))
     
     # Sort by match quality
-    match_order = {'exact': 0, 'partial_team': 1, 'partial': 2}
-    matches.sort(key=lambda x: match_order.get(x[2], 3))
+    matches.sort(key=lambda x: MATCH_ORDER.get(x[2], 3))
     
     return matches
 
+class PlayerMatcher:
+    """
+    Prebuilt name index over a player lookup
+    Answers the same queries as find_player_by_name without scanning the roster
+    """
+
+    def __init__(self, player_lookup):
+        self.player_lookup = player_lookup
+        self.by_name = {}     # normalized name -> [team_jersey, ...]
+        self.by_team = {}     # team -> {team_jersey, ...}
+        self.by_prefix = {}   # name token prefix -> {team_jersey, ...}
+        self.names = {}       # team_jersey -> normalized name
+        self.order = {}       # team_jersey -> position in player_lookup
+
+        for index, (key, player) in enumerate(player_lookup.items()):
+            name = normalize_name(player['name'])
+            self.names[key] = name
+            self.order[key] = index
+            self.by_name.setdefault(name, []).append(key)
+            self.by_team.setdefault(player['team'], set()).add(key)
+
+            for token in name_tokens(name):
+                for end in range(1, len(token) + 1):
+                    self.by_prefix.setdefault(token[:end], set()).add(key)
+
+    def candidates(self, name):
+        """
+        Keys of players sharing a name token (or token prefix) with name
+        Substrings inside a single word (e.g. "smith" in "highsmith") are not candidates
+        """
+        keys = set()
+        for token in name_tokens(name):
+            keys |= self.by_prefix.get(token, set())
+        return keys
+
+    def match(self, name, team=None):
+        """
+        Find player by name using the prebuilt indexes
+        Returns list of (team_jersey, player, match_type) sorted like find_player_by_name
+        """
+        name_norm = normalize_name(name)
+        exact_keys = self.by_name.get(name_norm, [])
+        team_keys = self.by_team.get(team, set()) if team else set()
+
+        matches = []
+        for key in self.candidates(name_norm):
+            player_name = self.names[key]
+            if key in exact_keys:
+                match_type = 'exact'
+            elif name_norm in player_name or player_name in name_norm:
+                match_type = 'partial_team' if key in team_keys else 'partial'
+            else:
+                continue
+            matches.append((key, self.player_lookup[key], match_type))
+
+        # Same ranking as find_player_by_name, ties keep lookup order
+        matches.sort(key=lambda x: (MATCH_ORDER[x[2]], self.order[x[0]]))
+        return matches
+
+    def match_many(self, players, memo=None):
+        """
+        Match a whole slate at once
+        Takes (name, team) pairs, returns a list of match lists in the same order
+        Pass the same memo dict across calls to match each (name, team) only once
+        """
+        results = []
+        seen = {} if memo is None else memo
+        for name, team in players:
+            query = (normalize_name(name), team)
+            if query not in seen:
+                seen[query] = self.match(name, team)
+            results.append(seen[query])
+        return results
+
+NAME_SUFFIXES = {'jr', 'sr', 'ii', 'iii', 'iv', 'v'}
+
+# RotoWire position -> ESPN roster positions it may be listed under
+POSITION_GROUPS = {
+    'QB': {'QB'},
+    'RB': {'RB', 'FB'},
+    'FB': {'RB', 'FB'},
+    'WR': {'WR'},
+    'TE': {'TE'},
+    'K': {'PK'},
+}
+
+FUZZY_MIN_SIMILARITY = 0.5   # trigram Jaccard needed for a fuzzy match...
+FUZZY_MAX_DISTANCE = 2       # ...or at most this many single-character edits
+
+def canonical_name(name):
+    """Normalized name without punctuation or suffixes, e.g. D.J. Moore Jr. -> dj moore"""
+    name = re.sub(r"[.'’]", '', normalize_name(name)).replace('-', ' ')
+    tokens = name.split()
+    while len(tokens) > 1 and tokens[-1] in NAME_SUFFIXES:
+        tokens.pop()
+    return ' '.join(tokens)
+
+def trigrams(name):
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def edit_distance(a, b, limit):
+    """Levenshtein distance, or limit + 1 as soon as it must exceed limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+class NameResolver:
+    """
+    Remembers which player each (RotoWire name, team) resolved to
+    Lookups go to the name_resolutions table first (loaded once into a dict),
+    then to the PlayerMatcher, and finally to a fuzzy search over the
+    trigrams of the player's own team and position. Only players on the
+    given team are returned - a name found on another roster is more often
+    a namesake than a trade. Anything newly resolved is written back by
+    save(), so next week the same name is a keyed lookup.
+    One resolver can be shared by threads: matching and saving hold its lock,
+    so concurrent slates never resolve the same player twice.
+    """
+
+    def __init__(self, matcher, db_path="fantasy_data.db"):
+        self.matcher = matcher
+        self.player_lookup = matcher.player_lookup
+        self.db_path = db_path
+        conn = get_connection(db_path)
+        self.resolutions = load_name_resolutions(conn)
+        conn.close()
+        self.pending = {}
+        self.team_index = {}   # team -> [(team_jersey, position, canonical name, trigrams), ...]
+        self.hits = 0
+        self.lock = threading.RLock()
+
+    def team_players(self, team):
+        # In lookup order, so ties in fuzzy_match always go to the same player
+        if team not in self.team_index:
+            self.team_index[team] = [
+                (key, self.player_lookup[key]['position'], canonical_name(self.player_lookup[key]['name']),
+                 trigrams(canonical_name(self.player_lookup[key]['name'])))
+                for key in sorted(self.matcher.by_team.get(team, ()), key=self.matcher.order.get)
+            ]
+        return self.team_index[team]
+
+    def fuzzy_match(self, name, team, position=None):
+        """
+        Best same-team player whose canonical name is close to name
+        Restricted to players listed at a compatible position when one is given.
+        Fewest edits wins, then trigram similarity, then lookup order.
+        Returns [(team_jersey, player, 'fuzzy')] or []
+        """
+        target = canonical_name(name)
+        target_grams = trigrams(target)
+        allowed = POSITION_GROUPS.get(position, {position}) if position else None
+
+        best, best_score = None, None
+        for key, player_position, candidate, grams in self.team_players(team):
+            if allowed and player_position not in allowed:
+                continue
+            if candidate == target:
+                return [(key, self.player_lookup[key], 'fuzzy')]
+            similarity = len(target_grams & grams) / len(target_grams | grams)
+            distance = edit_distance(target, candidate, FUZZY_MAX_DISTANCE)
+            if similarity < FUZZY_MIN_SIMILARITY and distance > FUZZY_MAX_DISTANCE:
+                continue
+            score = (-distance, similarity)
+            if best_score is None or score > best_score:
+                best, best_score = key, score
+        return [(best, self.player_lookup[best], 'fuzzy')] if best else []
+
+    def cached(self, name, team):
+        """The remembered match for (name, team), if that player is still on that team"""
+        resolution = self.resolutions.get((normalize_name(name), team))
+        if resolution is None:
+            return None
+        key, match_type = resolution
+        player = self.player_lookup.get(key)
+        if player is None or player['team'] != team:
+            return None   # released or traded since - resolve again
+        return [(key, player, match_type)]
+
+    def match(self, name, team, position=None):
+        """Matches in the same form as PlayerMatcher.match"""
+        with self.lock:
+            return self._match(name, team, position)
+
+    def _match(self, name, team, position):
+        matches = self.cached(name, team)
+        if matches:
+            self.hits += 1
+            metrics.counter('fantasy_name_cache_total', 'Name resolution cache lookups').inc(result='hit')
+            return matches
+        metrics.counter('fantasy_name_cache_total', 'Name resolution cache lookups').inc(result='miss')
+
+        matches = [match for match in self.matcher.match(name, team) if match[1]['team'] == team]
+        if not matches:
+            # Nothing on this roster by substring - try spelling variants
+            matches = self.fuzzy_match(name, team, position)
+        if matches:
+            key, _, match_type = matches[0]
+            resolution = (key, match_type)
+            self.resolutions[(normalize_name(name), team)] = resolution
+            self.pending[(normalize_name(name), team)] = resolution
+        return matches
+
+    def match_many(self, players, memo=None):
+        """
+        Resolve (name, team, position) triples, returns match lists in the same order
+        A memo shared between threads is only touched under the resolver's lock
+        """
+        results = []
+        seen = {} if memo is None else memo
+        with self.lock:
+            for name, team, position in players:
+                query = (normalize_name(name), team, position)
+                if query not in seen:
+                    seen[query] = self._match(name, team, position)
+                results.append(seen[query])
+        return results
+
+    def save(self):
+        """Write resolutions learned since the last save"""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        if not pending:
+            return 0
+        conn = get_connection(self.db_path)
+        save_name_resolutions([(name, team, key, match_type)
+                               for (name, team), (key, match_type) in pending.items()], conn)
+        conn.close()
+        return len(pending)
+
 if __name__ == "__main__":
     # Build and save player lookup
     players = build_player_lookup()
@@ -1,9 +1,8 @@
-from database import insert_players
 from player_lookup import load_player_lookup
 
-# Load player lookup data and insert into database
+# The lookup is stored in the players table - loading imports a legacy player_lookup.json if needed
 players = load_player_lookup()
 if players:
-    insert_players(players)
+    print(f"{len(players)} players in database")
 else:
     print("No player data found. Run player_lookup.py first.")
\ No newline at end of file
@@ -0,0 +1,95 @@
+import sqlite3
+from database import get_connection
+
+# Every query is a fixed, parameterized statement, so sqlite3's per-connection
+# statement cache compiles each one once for the life of the connection
+QUERIES = {
+    'slate_by_date': '''
+        SELECT w.team_jersey, p.name, p.position, p.team, w.slate_id, w.salary,
+               w.projected_fpts, w.actual_fpts, w.value_score, w.ownership_pct, w.opponent
+        FROM weekly_data w
+        LEFT JOIN players p ON p.team_jersey = w.team_jersey
+        WHERE w.date = ?
+        ORDER BY w.salary DESC
+    ''',
+    'player_history': '''
+        SELECT date, slate_id, salary, projected_fpts, actual_fpts, value_score, ownership_pct, opponent
+        FROM weekly_data
+        WHERE team_jersey = ?
+        ORDER BY date
+    ''',
+    'player_stats_history': '''
+        SELECT *
+        FROM player_stats
+        WHERE team_jersey = ?
+        ORDER BY date
+    ''',
+    'week_stats': '''
+        SELECT *
+        FROM player_stats
+        WHERE season = ? AND week = ?
+    ''',
+    # Projections scraped on a date joined to the game played in the following week
+    'projection_vs_actual': '''
+        SELECT w.team_jersey, p.name, p.position, w.salary, w.projected_fpts, w.actual_fpts,
+               s.season, s.week, s.passing_yards, s.passing_touchdowns, s.interceptions,
+               s.rushing_yards, s.rushing_touchdowns,
+               s.receptions, s.receiving_yards, s.receiving_touchdowns
+        FROM weekly_data w
+        LEFT JOIN players p ON p.team_jersey = w.team_jersey
+        LEFT JOIN player_stats s ON s.team_jersey = w.team_jersey
+            AND s.date >= w.date AND s.date < date(w.date, '+7 days')
+        WHERE w.date = ?
+    ''',
+    # Roster moves logged by database.refresh_players after a given timestamp
+    'player_changes_since': '''
+        SELECT changed_at, team_jersey, change, old_values, new_values
+        FROM player_changes
+        WHERE changed_at > ?
+        ORDER BY changed_at, id
+    ''',
+}
+
+_connection = None
+
+def connection(db_path="fantasy_data.db"):
+    """Persistent connection shared by the query functions, opened on first use"""
+    global _connection
+    if _connection is None:
+        _connection = get_connection(db_path)
+        _connection.row_factory = sqlite3.Row
+    return _connection
+
+def close_connection():
+    global _connection
+    if _connection is not None:
+        _connection.close()
+        _connection = None
+
+def run_query(name, params, conn=None):
+    """Run one of the QUERIES and return its rows"""
+    return (conn or connection()).execute(QUERIES[name], params).fetchall()
+
+def slate_by_date(date, conn=None):
+    """Every player projected on a date, with name and position"""
+    return run_query('slate_by_date', (date,), conn)
+
+def player_history(team_jersey, conn=None):
+    """Salary and projection history for one player"""
+    return run_query('player_history', (team_jersey,), conn)
+
+def player_stats_history(team_jersey, conn=None):
+    """Weekly stat lines for one player"""
+    return run_query('player_stats_history', (team_jersey,), conn)
+
+def week_stats(season, week, conn=None):
+    """All stat lines for one week"""
+    return run_query('week_stats', (season, week), conn)
+
+def projection_vs_actual(date, conn=None):
+    """Projections from a slate date next to the stats each player actually put up"""
+    return run_query('projection_vs_actual', (date,), conn)
+
+def player_changes_since(changed_at, conn=None):
+    """Players added, changed or removed by roster refreshes after changed_at"""
+    return run_query('player_changes_since', (changed_at,), conn)
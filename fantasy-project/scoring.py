@@ -0,0 +1,201 @@
+import json
+import time
+import zlib
+from datetime import date, datetime
+import numpy as np
+from database import get_connection, STAT_COLUMNS
+import metrics
+
+# DraftKings classic scoring for the player_stats columns
+DK_RULES = {
+    'points': {
+        'passing_yards': 0.04,
+        'passing_touchdowns': 4,
+        'interceptions': -1,
+        'rushing_yards': 0.1,
+        'rushing_touchdowns': 6,
+        'receptions': 1,
+        'receiving_yards': 0.1,
+        'receiving_touchdowns': 6,
+    },
+    # (column, threshold, bonus) - bonus points once a column reaches the threshold
+    'bonuses': [
+        ('passing_yards', 300, 3),
+        ('rushing_yards', 100, 3),
+        ('receiving_yards', 100, 3),
+    ],
+}
+
+# FanDuel: half point per reception, no yardage bonuses
+FD_RULES = {
+    'points': {
+        'passing_yards': 0.04,
+        'passing_touchdowns': 4,
+        'interceptions': -1,
+        'rushing_yards': 0.1,
+        'rushing_touchdowns': 6,
+        'receptions': 0.5,
+        'receiving_yards': 0.1,
+        'receiving_touchdowns': 6,
+    },
+}
+
+# Season-long half-PPR league scoring
+HALF_PPR_RULES = {
+    'points': {
+        'passing_yards': 0.04,
+        'passing_touchdowns': 4,
+        'interceptions': -2,
+        'rushing_yards': 0.1,
+        'rushing_touchdowns': 6,
+        'receptions': 0.5,
+        'receiving_yards': 0.1,
+        'receiving_touchdowns': 6,
+    },
+}
+
+RULE_TABLES = {'dk': DK_RULES, 'fd': FD_RULES, 'half_ppr': HALF_PPR_RULES}
+
+def rules_name(rules):
+    """Name stored with scored rows: the RULE_TABLES key, or a checksum for a custom table"""
+    for name, table in RULE_TABLES.items():
+        if table == rules:
+            return name
+    return f"custom:{zlib.crc32(json.dumps(rules, sort_keys=True).encode()):08x}"
+
+# Upper bounds of the salary tiers in the projection error report
+SALARY_TIER_EDGES = (4000, 5000, 6000, 7000, 8000)
+
+def rule_vectors(rules, columns=STAT_COLUMNS):
+    """Per-column weights plus bonus (column index, threshold, points) arrays for a rule table"""
+    weights = np.array([rules['points'].get(column, 0) for column in columns], dtype=np.float64)
+    bonuses = rules.get('bonuses', [])
+    bonus_columns = np.array([columns.index(column) for column, _, _ in bonuses], dtype=np.int64)
+    thresholds = np.array([threshold for _, threshold, _ in bonuses], dtype=np.float64)
+    bonus_points = np.array([points for _, _, points in bonuses], dtype=np.float64)
+    return weights, bonus_columns, thresholds, bonus_points
+
+def fantasy_points(stats, rules=DK_RULES, columns=STAT_COLUMNS):
+    """
+    Fantasy points for a (rows x columns) stat matrix in one vectorized pass
+    Columns follow database.STAT_COLUMNS unless given
+    """
+    stats = np.asarray(stats, dtype=np.float64).reshape(-1, len(columns))
+    weights, bonus_columns, thresholds, bonus_points = rule_vectors(rules, columns)
+    points = stats @ weights
+    if len(bonus_columns):
+        points += (stats[:, bonus_columns] >= thresholds) @ bonus_points
+    return points
+
+def salary_tier_sql(column, edges=SALARY_TIER_EDGES):
+    """SQL CASE expression labelling a salary column '<4000', '4000-4999', ... '8000+'"""
+    cases = [f"WHEN {column} < {edges[0]} THEN '<{edges[0]}'"]
+    cases += [f"WHEN {column} < {high} THEN '{low}-{high - 1}'" for low, high in zip(edges, edges[1:])]
+    return f"CASE {' '.join(cases)} ELSE '{edges[-1]}+' END"
+
+# Projections scraped on a date are scored against the game played in the
+# following week (the same window as queries.projection_vs_actual). A player
+# with no stat line in a completed week - the window is over and other
+# players' stats for it are stored - didn't play and scores 0.
+SCORE_ROWS_SQL = f'''
+    WITH stat_dates AS (SELECT DISTINCT date FROM player_stats)
+    SELECT w.id, {', '.join(f'COALESCE(s.{column}, 0)' for column in STAT_COLUMNS)}
+    FROM weekly_data w
+    LEFT JOIN player_stats s ON s.team_jersey = w.team_jersey
+        AND s.date >= w.date AND s.date < date(w.date, '+7 days')
+    WHERE (s.team_jersey IS NOT NULL
+           OR (date(w.date, '+7 days') <= :today
+               AND EXISTS (SELECT 1 FROM stat_dates d
+                           WHERE d.date >= w.date AND d.date < date(w.date, '+7 days'))))
+    {{where}}
+    ORDER BY w.id, s.date
+'''
+
+# Never scored, scored with other rules, or the stats row changed after the last scoring pass
+STALE_ROWS = '''
+    AND (w.actual_fpts IS NULL OR w.actual_scored_at IS NULL OR w.actual_rules IS NOT :rules
+         OR s.updated_at > w.actual_scored_at)
+'''
+
+@metrics.timed('score_weekly_data')
+def score_weekly_data(rules=DK_RULES, db_path="fantasy_data.db", rescore_all=False):
+    """
+    Backfill weekly_data.actual_fpts from player_stats
+    One query gathers the rows to score, fantasy_points() scores them in a
+    single vectorized pass and one executemany writes them back. Only rows
+    never scored, scored with other rules or whose stats changed since are
+    touched, unless rescore_all.
+    """
+    # Stamp with the start time so stats updated mid-pass are picked up next time
+    scored_at = datetime.now().isoformat()
+    name = rules_name(rules)
+    conn = get_connection(db_path)
+    rows = conn.execute(SCORE_ROWS_SQL.format(where='' if rescore_all else STALE_ROWS),
+                        {'today': date.today().isoformat(), 'rules': name}).fetchall()
+    
+    if rows:
+        points = fantasy_points([row[1:] for row in rows], rules)
+        # A week with two games in the window keeps the first
+        ids, first = np.unique(np.array([row[0] for row in rows], dtype=np.int64), return_index=True)
+        started = time.monotonic()
+        with conn:
+            conn.executemany(
+                "UPDATE weekly_data SET actual_fpts = ?, actual_scored_at = ?, actual_rules = ? WHERE id = ?",
+                [(value, scored_at, name, row_id) for value, row_id
+                 in zip(points[first].round(2).tolist(), ids.tolist())])
+        metrics.record_rows('weekly_data', len(ids), time.monotonic() - started)
+    else:
+        ids = []
+    conn.close()
+    
+    print(f"Scored actual_fpts for {len(ids)} weekly_data rows")
+    return len(ids)
+
+def projection_error_report(db_path="fantasy_data.db", since=None, edges=SALARY_TIER_EDGES):
+    """
+    Projection error of every scored weekly_data row, in one query
+    Players who didn't play in a completed week count with 0 actual points.
+    Returns dicts of position, salary_tier ('all' for the whole position),
+    players, mae and bias (actual minus projected, so positive means the
+    projections ran low)
+    """
+    where = "WHERE w.actual_fpts IS NOT NULL AND w.projected_fpts IS NOT NULL"
+    params = []
+    if since:
+        where += " AND w.date >= ?"
+        params.append(since)
+    
+    sql = f'''
+        WITH errors AS (
+            SELECT COALESCE(p.position, '?') AS position, {salary_tier_sql('w.salary', edges)} AS salary_tier,
+                   w.salary, w.actual_fpts - w.projected_fpts AS error
+            FROM weekly_data w
+            LEFT JOIN players p ON p.team_jersey = w.team_jersey
+            {where}
+        )
+        SELECT position, salary_tier, COUNT(*), AVG(ABS(error)), AVG(error), MIN(salary) AS tier_order
+        FROM errors GROUP BY position, salary_tier
+        UNION ALL
+        SELECT position, 'all', COUNT(*), AVG(ABS(error)), AVG(error), -1
+        FROM errors GROUP BY position
+        ORDER BY 1, 6
+    '''
+    conn = get_connection(db_path)
+    rows = conn.execute(sql, params).fetchall()
+    conn.close()
+    
+    return [
+        {'position': position, 'salary_tier': tier, 'players': players,
+         'mae': round(mae, 2), 'bias': round(bias, 2)}
+        for position, tier, players, mae, bias, _ in rows
+    ]
+
+if __name__ == "__main__":
+    import sys
+    
+    # python scoring.py [dk|fd|half_ppr]
+    score_weekly_data(RULE_TABLES[sys.argv[1] if len(sys.argv) > 1 else 'dk'])
+    
+    print(f"{'POS':<5}{'SALARY':<12}{'N':>6}{'MAE':>8}{'BIAS':>8}")
+    for row in projection_error_report():
+        print(f"{row['position']:<5}{row['salary_tier']:<12}{row['players']:>6}{row['mae']:>8}{row['bias']:>8}")
@@ -1,116 +1,249 @@
 import requests
-import sqlite3
+import time
 from datetime import datetime
-from player_lookup import load_player_lookup, find_player_by_name
+from concurrent.futures import ThreadPoolExecutor
+from player_lookup import load_player_lookup, PlayerMatcher, NameResolver
+from http_client import make_session, stream_json_array
+from http_cache import resolve_cache
+from database import get_connection
+import metrics
 
-def scrape_rotowire_api(slate_id=8602):
-    """Scrape RotoWire data directly from their API"""
-    
-    # Load player lookup
-    player_lookup = load_player_lookup()
-    if not player_lookup:
-        print("No player lookup data found. Run player_lookup.py first.")
-        return [], []
-    
-    print("Fetching data from RotoWire API...")
-    
-    # Hit the API endpoint directly
-    api_url = f"https://www.rotowire.com/daily/nfl/api/players.php?slateID={slate_id}"
-    
-    try:
-        response = requests.get(api_url, timeout=30)
-        response.raise_for_status()
-        data = response.json()
-        
-        print(f"Found {len(data)} players in API response")
-        
-        matched_players = []
-        unmatched_players = []
-        
-        for player_data in data:
-            # Extract player info from JSON
-            player_name = f"{player_data['firstName']} {player_data['lastName']}"
-            position = player_data['rotoPos']
-            team = player_data['team']['abbr']
-            opponent = player_data['opponent']['team']
-            salary = player_data['salary']
-            projected_pts = player_data['pts']
-            ownership = player_data['rostership']
-            injury_status = player_data.get('injuryStatus', '')
-            
-            # Try to match player to lookup data
-            matches = find_player_by_name(player_lookup, player_name, team)
-            
+ROTOWIRE_API_BASE = "https://www.rotowire.com/daily/nfl/api"
+
+def batched(iterable, size):
+    """Yield lists of up to size items"""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def weekly_row(player_data, match):
+    """Turn one RotoWire entry and its best lookup match into a store_weekly_data row"""
+    team_jersey, player_info, match_type = match
+    salary = player_data['salary']
+    projected_pts = player_data['pts']
+    return {
+        'team_jersey': team_jersey,
+        'rotowire_name': f"{player_data['firstName']} {player_data['lastName']}",
+        'lookup_name': player_info['name'],
+        'match_type': match_type,
+        'position': player_data['rotoPos'],
+        'team': player_data['team']['abbr'],
+        'opponent': player_data['opponent']['team'],
+        'salary': salary,
+        'fpts': projected_pts,
+        'value': salary / float(projected_pts) if float(projected_pts) > 0 else 0,  # Calculate value
+        'roster_pct': player_data['rostership'],
+        'injury_status': player_data.get('injuryStatus', '') or ""
+    }
+
+def match_batches(players, resolver, unmatched, batch_size=500, memo=None):
+    """
+    Match a stream of RotoWire entries a batch at a time
+    Yields lists of weekly rows; entries with no match are appended to unmatched
+    """
+    for batch in batched(players, batch_size):
+        all_matches = resolver.match_many(
+            ((f"{p['firstName']} {p['lastName']}", p['team']['abbr'], p['rotoPos']) for p in batch), memo
+        )
+        rows = []
+        for player_data, matches in zip(batch, all_matches):
+            metrics.record_match(matches[0][2] if matches else 'unmatched')
             if matches:
                 # Use the best match
-                team_jersey, player_info, match_type = matches[0]
-                matched_players.append({
-                    'team_jersey': team_jersey,
-                    'rotowire_name': player_name,
-                    'lookup_name': player_info['name'],
-                    'match_type': match_type,
-                    'position': position,
-                    'team': team,
-                    'opponent': opponent,
-                    'salary': salary,
-                    'fpts': projected_pts,
-                    'value': salary / float(projected_pts) if float(projected_pts) > 0 else 0,  # Calculate value
-                    'roster_pct': ownership,
-                    'injury_status': injury_status or ""
-                })
+                rows.append(weekly_row(player_data, matches[0]))
             else:
-                unmatched_players.append({
-                    'name': player_name,
-                    'team': team,
-                    'position': position
+                unmatched.append({
+                    'name': f"{player_data['firstName']} {player_data['lastName']}",
+                    'team': player_data['team']['abbr'],
+                    'position': player_data['rotoPos']
                 })
+        yield rows
+
+@metrics.timed('scrape_slate')
+def scrape_slate(slate_id, resolver, session=requests, cache=None, batch_size=500,
+                 db_path="fantasy_data.db", base_url=ROTOWIRE_API_BASE, memo=None, date=None):
+    """
+    Stream one slate from the players.php API into weekly_data
+    The response is parsed, matched and stored batch_size players at a time
+    while it downloads, so memory does not grow with the slate and early
+    batches are committed before the rest has arrived.
+    Returns (number of players matched, unmatched players). The matched rows
+    themselves are only written to weekly_data, not returned - read them back
+    with queries.slate_by_date. date (YYYY-MM-DD, default today) is the date
+    the rows are stored under.
+    """
+    print(f"Fetching slate {slate_id} from RotoWire API...")
+    
+    # Hit the API endpoint directly
+    api_url = f"{base_url}/players.php?slateID={slate_id}"
+    
+    matched_count = 0
+    unmatched_players = []
+    counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+    conn = get_connection(db_path)
+    try:
+        players = stream_json_array(session, api_url, timeout=30, cache=cache)
+        for rows in match_batches(players, resolver, unmatched_players, batch_size, memo):
+            if rows:
+                stored = store_weekly_data(rows, slate_id, db_path, conn=conn, verbose=False, date=date)
+                for change, count in stored.items():
+                    counts[change] += count
+            matched_count += len(rows)
         
-        print(f"Matched: {len(matched_players)} players")
-        print(f"Unmatched: {len(unmatched_players)} players")
+        print(f"Slate {slate_id}: found {matched_count + len(unmatched_players)} players in API response")
+        print(f"Slate {slate_id}: matched {matched_count}, unmatched {len(unmatched_players)}")
+        print(f"Slate {slate_id}: stored {matched_count} players ({counts['inserted']} inserted, "
+              f"{counts['updated']} updated, {counts['unchanged']} unchanged)")
         
         if unmatched_players:
             print("Unmatched players:")
             for player in unmatched_players[:5]:  # Show first 5
                 print(f"  {player['name']} ({player['team']} {player['position']})")
         
-        # Store in database
-        if matched_players:
-            store_weekly_data(matched_players)
-        
-        return matched_players, unmatched_players
+        return matched_count, unmatched_players
         
     except requests.RequestException as e:
-        print(f"Error fetching API data: {e}")
-        return [], []
+        print(f"Error fetching API data for slate {slate_id}: {e}")
+        return matched_count, unmatched_players
     except ValueError as e:
-        print(f"Error parsing JSON response: {e}")
-        return [], []
+        print(f"Error parsing JSON response for slate {slate_id}: {e}")
+        return matched_count, unmatched_players
+    finally:
+        conn.close()
+
+def scrape_rotowire_api(slate_id=8602, cache=True, batch_size=500, db_path="fantasy_data.db",
+                        base_url=ROTOWIRE_API_BASE):
+    """
+    Scrape RotoWire data directly from their API
+    Returns (number of players matched, unmatched players); older versions
+    returned the matched rows, which now go straight to weekly_data
+    """
+    
+    # Load player lookup
+    player_lookup = load_player_lookup(db_path)
+    if not player_lookup:
+        print("No player lookup data found. Run player_lookup.py first.")
+        return 0, []
+    resolver = NameResolver(PlayerMatcher(player_lookup), db_path)
+    
+    result = scrape_slate(slate_id, resolver, cache=resolve_cache(cache), batch_size=batch_size,
+                          db_path=db_path, base_url=base_url)
+    resolver.save()
+    return result
+
+@metrics.timed('scrape_rotowire_slates')
+def scrape_rotowire_slates(slate_ids, max_workers=4, cache=True, batch_size=500,
+                           db_path="fantasy_data.db", base_url=ROTOWIRE_API_BASE, player_lookup=None,
+                           date=None):
+    """
+    Scrape several slates (main, early, afternoon, showdown...) concurrently
+    All slates share one NameResolver and one match memo, so a player listed
+    on every slate is matched once; each slate still gets its own weekly_data
+    rows under its slate_id. An already open player_lookup can be passed in,
+    and date stores the slates under a date other than today.
+    Returns {slate_id: (number of players matched, unmatched players)}
+    """
+    player_lookup = player_lookup if player_lookup is not None else load_player_lookup(db_path)
+    if not player_lookup:
+        print("No player lookup data found. Run player_lookup.py first.")
+        return {}
+    resolver = NameResolver(PlayerMatcher(player_lookup), db_path)
+    memo = {}   # (normalized name, team, position) -> matches, shared by every slate under resolver.lock
+    cache = resolve_cache(cache)
+    session = make_session(pool_size=max_workers)
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            slate_id: executor.submit(scrape_slate, slate_id, resolver, session, cache, batch_size,
+                                      db_path, base_url, memo, date)
+            for slate_id in dict.fromkeys(slate_ids)
+        }
+    session.close()
+    resolver.save()
+    
+    results = {slate_id: future.result() for slate_id, future in futures.items()}
+    entries = sum(matched + len(unmatched) for matched, unmatched in results.values())
+    print(f"\nScraped {len(results)} slates: {entries} entries, {len(memo)} distinct players matched")
+    return results
+
+WEEKLY_COLUMNS = ['salary', 'projected_fpts', 'value_score', 'ownership_pct', 'opponent']
 
-def store_weekly_data(players_data):
-    """Store weekly data in database"""
-    conn = sqlite3.connect("fantasy_data.db")
-    cursor = conn.cursor()
+def store_weekly_data(players_data, slate_id=0, db_path="fantasy_data.db", conn=None, verbose=True,
+                      date=None):
+    """
+    Upsert weekly data for one slate (or one batch of it) in a single transaction
+    Rows are keyed on (date, slate_id, team_jersey), so re-running a slate
+    updates it in place. Returns inserted/updated/unchanged counts.
+    Pass conn to reuse an open connection across batches, and verbose=False
+    to leave the summary to the caller adding up the batches. date
+    (YYYY-MM-DD) defaults to today.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection(db_path)
     
-    today = datetime.now().strftime("%Y-%m-%d")
+    today = date or datetime.now().strftime("%Y-%m-%d")
     
+    # Last match wins if two RotoWire entries resolved to the same player
+    rows = {}
     for player in players_data:
-        cursor.execute('''
-            INSERT INTO weekly_data 
-            (date, team_jersey, salary, projected_fpts, value_score, ownership_pct, opponent)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            today,
-            player['team_jersey'],
+        rows[player['team_jersey']] = (
             float(player['salary']),
             float(player['fpts']),
             float(player['value']),
             float(player['roster_pct']),
             player['opponent']
-        ))
+        )
+    
+    counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+    started = time.monotonic()
+    with conn:
+        # Only the stored rows for these players, so a batch never reads the whole slate
+        keys = list(rows)
+        cursor = conn.execute(f'''
+            SELECT team_jersey, {', '.join(WEEKLY_COLUMNS)} FROM weekly_data
+            WHERE date = ? AND slate_id = ? AND team_jersey IN ({', '.join('?' for _ in keys)})
+        ''', [today, slate_id] + keys)
+        existing = {row[0]: tuple(row[1:]) for row in cursor}
+        
+        changed = []
+        for team_jersey, values in rows.items():
+            if team_jersey not in existing:
+                counts['inserted'] += 1
+            elif existing[team_jersey] != values:
+                counts['updated'] += 1
+            else:
+                counts['unchanged'] += 1
+                continue
+            changed.append((today, slate_id, team_jersey) + values)
+        
+        conn.executemany(f'''
+            INSERT INTO weekly_data 
+            (date, slate_id, team_jersey, {', '.join(WEEKLY_COLUMNS)})
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (date, slate_id, team_jersey) DO UPDATE SET
+            {', '.join(f'{column} = excluded.{column}' for column in WEEKLY_COLUMNS)}
+        ''', changed)
+    metrics.record_rows('weekly_data', len(changed), time.monotonic() - started)
     
-    conn.commit()
-    conn.close()
-    print(f"Stored {len(players_data)} players in database")
+    if own_conn:
+        conn.close()
+    if verbose:
+        print(f"Stored {len(rows)} players in database "
+              f"({counts['inserted']} inserted, {counts['updated']} updated, {counts['unchanged']} unchanged)")
+    return counts
 
 if __name__ == "__main__":
-    matched, unmatched = scrape_rotowire_api()
\ No newline at end of file
+    import sys
+
+    # python scraper.py [slate_id ...]
+    slate_ids = [int(arg) for arg in sys.argv[1:]]
+    if len(slate_ids) > 1:
+        scrape_rotowire_slates(slate_ids)
+    else:
+        scrape_rotowire_api(*slate_ids)
\ No newline at end of file
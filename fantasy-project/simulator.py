@@ -0,0 +1,216 @@
+import numpy as np
+from database import get_connection, STAT_COLUMNS
+from scoring import fantasy_points, DK_RULES
+
+# Outcome spread relative to projection when a player has little history
+POSITION_CV = {'QB': 0.35, 'RB': 0.5, 'WR': 0.6, 'TE': 0.65, 'DST': 0.7}
+DEFAULT_CV = 0.6
+PRIOR_GAMES = 4   # weight of the position prior against a player's own history
+
+# Loadings on the shared game and team factors. Same-team correlation is
+# game*game + team*team, opponents share only the game term. DST leans
+# against the game total, so shootouts hurt both defenses.
+FACTOR_LOADINGS = {
+    'QB': (0.35, 0.55),
+    'RB': (0.2, 0.3),
+    'WR': (0.25, 0.45),
+    'TE': (0.2, 0.35),
+    'DST': (-0.35, 0.0),
+}
+DEFAULT_LOADINGS = (0.15, 0.25)
+
+PERCENTILES = (10, 50, 90)   # floor, median, ceiling
+
+class SlateSimulation:
+    """
+    Correlated outcome draws for one slate
+    samples is an (n_sims x players) float32 matrix; column j belongs to keys[j]
+    Each key may appear once, since lineups are scored by key
+    """
+
+    def __init__(self, row_ids, keys, positions, teams, opponents, projections, history_sd):
+        self.row_ids = np.asarray(row_ids, dtype=np.int64)
+        self.keys = np.asarray(keys, dtype=object)
+        self.positions = np.asarray(positions, dtype=object)
+        self.index = {key: i for i, key in enumerate(keys)}
+        if len(self.index) != len(self.keys):
+            raise ValueError("A player appears more than once - simulate one slate at a time")
+        self.mean = np.maximum(np.asarray(projections, dtype=np.float64), 0)
+        self.sd = np.asarray(history_sd, dtype=np.float64)
+
+        teams = np.asarray(teams, dtype=str)
+        opponents = np.char.lstrip(np.asarray(opponents, dtype=str), '@')
+        games = np.where(teams < opponents,
+                         np.char.add(np.char.add(teams, '|'), opponents),
+                         np.char.add(np.char.add(opponents, '|'), teams))
+        _, self.team_index = np.unique(teams, return_inverse=True)
+        _, self.game_index = np.unique(games, return_inverse=True)
+
+        loadings = np.array([FACTOR_LOADINGS.get(position, DEFAULT_LOADINGS) for position in positions])
+        self.game_loading = loadings[:, 0].astype(np.float32)
+        self.team_loading = loadings[:, 1].astype(np.float32)
+        self.own_loading = np.sqrt(1 - loadings[:, 0] ** 2 - loadings[:, 1] ** 2).astype(np.float32)
+
+        # Lognormal marginals matched to (mean, sd); zero projections stay at zero
+        positive = self.mean > 0
+        ratio = np.divide(self.sd, self.mean, out=np.zeros_like(self.mean), where=positive)
+        self.sigma = np.sqrt(np.log1p(ratio ** 2)).astype(np.float32)
+        self.mu = np.where(positive, np.log(np.where(positive, self.mean, 1)) - self.sigma ** 2 / 2, -np.inf)
+        self.mu = self.mu.astype(np.float32)
+        self.samples = None
+
+    def run(self, n_sims=20000, seed=None, chunk_size=5000):
+        """Draw n_sims slate outcomes, chunk_size simulations at a time"""
+        rng = np.random.default_rng(seed)
+        n_games = self.game_index.max() + 1 if len(self.keys) else 0
+        n_teams = self.team_index.max() + 1 if len(self.keys) else 0
+        self.samples = np.empty((n_sims, len(self.keys)), dtype=np.float32)
+
+        for start in range(0, n_sims, chunk_size):
+            rows = min(chunk_size, n_sims - start)
+            game = rng.standard_normal((rows, n_games), dtype=np.float32)
+            team = rng.standard_normal((rows, n_teams), dtype=np.float32)
+            z = rng.standard_normal((rows, len(self.keys)), dtype=np.float32)
+            z *= self.own_loading
+            z += game[:, self.game_index] * self.game_loading
+            z += team[:, self.team_index] * self.team_loading
+            np.exp(self.mu + self.sigma * z, out=self.samples[start:start + rows])
+        return self.samples
+
+    def percentiles(self, percentiles=PERCENTILES):
+        """(len(percentiles) x players) outcome percentiles"""
+        return np.percentile(self.samples, percentiles, axis=0)
+
+    def lineup_matrix(self, lineups):
+        """(players x lineups) 0/1 membership matrix; lineups are lists of team_jersey keys"""
+        matrix = np.zeros((len(self.keys), len(lineups)), dtype=np.float32)
+        rows = [self.index[key] for lineup in lineups for key in lineup]
+        cols = [j for j, lineup in enumerate(lineups) for _ in lineup]
+        matrix[rows, cols] = 1
+        return matrix
+
+    def score_lineups(self, lineups, percentiles=PERCENTILES):
+        """
+        Score many lineups against the same draws with one matrix product
+        Returns the (n_sims x lineups) score matrix and a summary per lineup
+        """
+        scores = self.samples @ self.lineup_matrix(lineups)
+        summary = {
+            'mean': scores.mean(axis=0),
+            'sd': scores.std(axis=0),
+            'percentiles': np.percentile(scores, percentiles, axis=0),
+            # Share of simulations in which each lineup is the top scorer
+            'win_rate': np.bincount(scores.argmax(axis=1), minlength=len(lineups)) / len(scores),
+        }
+        return scores, summary
+
+    def write_percentiles(self, db_path="fantasy_data.db"):
+        """Store floor/median/ceiling for every simulated weekly_data row"""
+        floor, median, ceiling = self.percentiles()
+        conn = get_connection(db_path)
+        with conn:
+            conn.executemany('''
+                UPDATE weekly_data SET floor_fpts = ?, median_fpts = ?, ceiling_fpts = ?
+                WHERE id = ?
+            ''', zip(floor.round(2).tolist(), median.round(2).tolist(),
+                     ceiling.round(2).tolist(), self.row_ids.tolist()))
+        conn.close()
+        print(f"Stored floor/median/ceiling for {len(self.row_ids)} players")
+
+def history_sd(keys, positions, projections, conn, rules=DK_RULES):
+    """
+    Outcome standard deviation per player
+    Each player's sample variance of past fantasy points is shrunk toward a
+    position prior of (POSITION_CV x projection), weighted by games played
+    """
+    keys = np.asarray(keys, dtype=object)
+    projections = np.maximum(np.asarray(projections, dtype=np.float64), 0)
+    cv = np.array([POSITION_CV.get(position, DEFAULT_CV) for position in positions])
+    prior_var = (cv * projections) ** 2
+
+    placeholders = ', '.join('?' for _ in keys)
+    rows = conn.execute(f'''
+        SELECT team_jersey, {', '.join(STAT_COLUMNS)} FROM player_stats
+        WHERE team_jersey IN ({placeholders})
+    ''', keys.tolist()).fetchall() if len(keys) else []
+    if not rows:
+        return np.sqrt(prior_var)
+
+    index = {key: i for i, key in enumerate(keys)}
+    owners = np.array([index[row[0]] for row in rows])
+    points = fantasy_points([row[1:] for row in rows], rules)
+
+    games = np.bincount(owners, minlength=len(keys))
+    total = np.bincount(owners, weights=points, minlength=len(keys))
+    squares = np.bincount(owners, weights=points ** 2, minlength=len(keys))
+    dof = np.maximum(games - 1, 0)
+    sample_var = np.maximum(squares - total ** 2 / np.maximum(games, 1), 0) / np.maximum(dof, 1)
+
+    return np.sqrt((dof * sample_var + PRIOR_GAMES * prior_var) / (dof + PRIOR_GAMES))
+
+def date_slates(date, conn):
+    """Slate ids stored for a date"""
+    return [row[0] for row in conn.execute(
+        "SELECT DISTINCT slate_id FROM weekly_data WHERE date = ? ORDER BY slate_id", (date,))]
+
+def load_simulation(date, slate_id=None, db_path="fantasy_data.db"):
+    """
+    Build a SlateSimulation from weekly_data, players and player_stats history
+    slate_id can only be left out when the date has a single slate: the same
+    player on two slates (often with different projections) is two rows
+    """
+    conn = get_connection(db_path)
+    if slate_id is None:
+        slates = date_slates(date, conn)
+        if len(slates) > 1:
+            conn.close()
+            raise ValueError(f"{date} has slates {slates} - pass a slate_id")
+    sql = '''
+        SELECT w.id, w.team_jersey, p.position, p.team, w.opponent, w.projected_fpts
+        FROM weekly_data w
+        JOIN players p ON p.team_jersey = w.team_jersey
+        WHERE w.date = ?
+    '''
+    params = [date]
+    if slate_id is not None:
+        sql += ' AND w.slate_id = ?'
+        params.append(slate_id)
+    rows = conn.execute(sql, params).fetchall()
+
+    row_ids = [row[0] for row in rows]
+    keys = [row[1] for row in rows]
+    positions = [row[2] for row in rows]
+    teams = [row[3] for row in rows]
+    opponents = [row[4] or '' for row in rows]
+    projections = [row[5] or 0 for row in rows]
+    sd = history_sd(keys, positions, projections, conn)
+    conn.close()
+
+    return SlateSimulation(row_ids, keys, positions, teams, opponents, projections, sd)
+
+def simulate_slate(date, slate_id=None, n_sims=20000, seed=None, db_path="fantasy_data.db"):
+    """
+    Simulate a slate and write floor/median/ceiling back to weekly_data
+    Without a slate_id every slate of the date is simulated on its own.
+    Returns {slate_id: SlateSimulation}
+    """
+    if slate_id is None:
+        conn = get_connection(db_path)
+        slates = date_slates(date, conn)
+        conn.close()
+        if not slates:
+            print(f"No players found for {date}")
+        return {slate: simulate_slate(date, slate, n_sims, seed, db_path)[slate] for slate in slates}
+
+    simulation = load_simulation(date, slate_id, db_path)
+    if not len(simulation.keys):
+        print(f"No players found for {date} slate {slate_id}")
+        return {slate_id: simulation}
+    simulation.run(n_sims, seed)
+    simulation.write_percentiles(db_path)
+    return {slate_id: simulation}
+
+if __name__ == "__main__":
+    from datetime import datetime
+
+    simulate_slate(datetime.now().strftime("%Y-%m-%d"))
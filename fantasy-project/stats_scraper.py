@@ -1,147 +1,337 @@
 import requests
-import sqlite3
 import json
-from datetime import datetime
+import threading
+import zlib
+from collections import Counter
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from config import ESPN_API_BASE, ESPN_STAT_COLUMNS, NFL_SEASON_OPENERS, NFL_REGULAR_SEASON_WEEKS
+from database import get_connection, load_checkpoints, StatsWriter
+from http_client import AdaptiveThrottle, make_session, get_json
+from http_cache import resolve_cache
 from player_lookup import load_player_lookup
+import metrics
 
-def fetch_player_stats(espn_player_id, week=3, season=2025):
-    """Fetch player stats for Week 3"""
-    try:
-        url = f"http://site.api.espn.com/apis/site/v2/sports/football/nfl/athletes/{espn_player_id}/gamelog"
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        
-        data = response.json()
+SKILL_POSITIONS = ['QB', 'RB', 'WR', 'TE']
+
+GAMELOG_RESULTS = metrics.counter('fantasy_gamelog_fetches_total', 'Gamelog fetches by outcome')
+
+def parse_gamelog(data, season=2025):
+    """
+    Parse every event of one gamelog response
+    Returns {week: {'date': game date, 'stats': parsed stats}} for the given season
+    """
+    weeks = {}
+    for event in data.get('events', []):
+        week_num = event.get('week', {}).get('number')
+        season_year = event.get('season', {}).get('year')
         
-        # Find stats for Week 3
-        events = data.get('events', [])
-        for event in events:
-            week_num = event.get('week', {}).get('number')
-            season_year = event.get('season', {}).get('year')
-            
-            if week_num == week and season_year == season:
-                stats = event.get('statistics', [])
-                return parse_stats(stats)
+        if week_num is None or season_year != season:
+            continue
         
-        return None
+        weeks[week_num] = {
+            'date': (event.get('gameDate') or datetime.now().strftime("%Y-%m-%d"))[:10],
+            'stats': parse_stats(event.get('statistics', []))
+        }
+    return weeks
+
+def fetch_gamelog_status(espn_player_id, season=2025, session=None, throttle=None, cache=True):
+    """
+    Fetch a player's gamelog once and parse all of its weeks
+    Returns (status, weeks): 'done' with the weeks, 'empty' when ESPN has no
+    gamelog for the player, or 'failed' when the request should be retried
+    """
+    try:
+        url = f"{ESPN_API_BASE}/athletes/{espn_player_id}/gamelog"
+        data = get_json(session or requests, url, rate_limiter=throttle, cache=resolve_cache(cache))
+        weeks = parse_gamelog(data, season)
+        GAMELOG_RESULTS.inc(result='ok')
+        return 'done', weeks
         
     except requests.exceptions.HTTPError as e:
         if e.response.status_code == 404:
             # Player doesn't have game log data - this is normal
-            return None
+            GAMELOG_RESULTS.inc(result='not_found')
+            return 'empty', None
         else:
+            GAMELOG_RESULTS.inc(result='http_error')
             print(f"HTTP error for player {espn_player_id}: {e}")
-            return None
+            return 'failed', None
     except Exception as e:
+        GAMELOG_RESULTS.inc(result='error')
         print(f"Error fetching stats for player {espn_player_id}: {e}")
-        return None
-
-def parse_stats(stats_data):
-    """Parse ESPN stats data - just raw numbers"""
-    parsed_stats = {
-        'passing_yards': 0,
-        'passing_touchdowns': 0,
-        'completions': 0,
-        'passing_attempts': 0,
-        'interceptions': 0,
-        'rushing_attempts': 0,
-        'rushing_yards': 0,
-        'rushing_touchdowns': 0,
-        'receptions': 0,
-        'receiving_yards': 0,
-        'receiving_touchdowns': 0,
-        'receiving_targets': 0
-    }
+        return 'failed', None
+
+def fetch_player_gamelog(espn_player_id, season=2025, session=None, throttle=None, cache=True):
+    """Fetch a player's gamelog once and parse all of its weeks (None if unavailable)"""
+    return fetch_gamelog_status(espn_player_id, season, session, throttle, cache)[1]
+
+def fetch_player_stats(espn_player_id, week=3, season=2025, session=None, throttle=None):
+    """Fetch player stats for Week 3"""
+    weeks = fetch_player_gamelog(espn_player_id, season, session, throttle)
+    if weeks and week in weeks:
+        return weeks[week]['stats']
+    return None
+
+def season_opener(season):
+    """
+    Kickoff date of a season
+    Seasons missing from NFL_SEASON_OPENERS fall back to the usual schedule,
+    the Thursday after Labor Day (first Monday of September)
+    """
+    if season in NFL_SEASON_OPENERS:
+        return datetime.strptime(NFL_SEASON_OPENERS[season], "%Y-%m-%d")
+    september = datetime(season, 9, 1)
+    labor_day = september + timedelta(days=-september.weekday() % 7)
+    return labor_day + timedelta(days=3)
+
+def completed_weeks(season=2025, today=None):
+    """Number of regular season weeks whose games have all finished (Tuesday rollover)"""
+    opener = season_opener(season)
+    days = ((today or datetime.now()) - opener).days
+    return max(0, min(NFL_REGULAR_SEASON_WEEKS, (days + 2) // 7))
+
+def compile_stat_columns(stat_columns):
+    """
+    Turn a (category, stat name) -> column table into {category: {stat name: column}}
+    Exact and lowercased spellings are both indexed; parse_stats tries the
+    exact one first and falls back to the lowercased one
+    """
+    compiled = {}
+    for (category, name), column in stat_columns.items():
+        for category_key, name_key in [(category, name), (category.lower(), name.lower())]:
+            compiled.setdefault(category_key, {})[name_key] = column
+    return compiled
+
+STAT_LOOKUP = compile_stat_columns(ESPN_STAT_COLUMNS)
+STAT_DEFAULTS = dict.fromkeys(ESPN_STAT_COLUMNS.values(), 0)
+
+# (category, stat name) pairs seen in gamelogs but not in ESPN_STAT_COLUMNS
+UNKNOWN_STATS = Counter()
+unknown_stats_lock = threading.Lock()
+
+def parse_stats(stats_data, stat_lookup=STAT_LOOKUP, defaults=STAT_DEFAULTS):
+    """
+    Parse ESPN stats data - just raw numbers
+    Each stat is one dict lookup (two if ESPN changes its casing);
+    unmapped stats are counted in UNKNOWN_STATS
+    """
+    parsed_stats = dict(defaults)
+    unknown = []
     
     for stat_group in stats_data:
-        category = stat_group.get('name', '').lower()
-        stats = stat_group.get('stats', [])
+        category = stat_group.get('name', '')
+        columns = stat_lookup.get(category) or stat_lookup.get(category.lower(), {})
         
-        for stat in stats:
-            name = stat.get('name', '').lower()
-            value = stat.get('value', 0)
-            
-            if 'passing' in category:
-                if 'yards' in name:
-                    parsed_stats['passing_yards'] = value
-                elif 'touchdown' in name:
-                    parsed_stats['passing_touchdowns'] = value
-                elif 'completion' in name and 'percentage' not in name:
-                    parsed_stats['completions'] = value
-                elif 'attempt' in name:
-                    parsed_stats['passing_attempts'] = value
-                elif 'interception' in name:
-                    parsed_stats['interceptions'] = value
-                    
-            elif 'rushing' in category:
-                if 'yards' in name:
-                    parsed_stats['rushing_yards'] = value
-                elif 'touchdown' in name:
-                    parsed_stats['rushing_touchdowns'] = value
-                elif 'attempt' in name:
-                    parsed_stats['rushing_attempts'] = value
-                    
-            elif 'receiving' in category:
-                if 'yards' in name:
-                    parsed_stats['receiving_yards'] = value
-                elif 'touchdown' in name:
-                    parsed_stats['receiving_touchdowns'] = value
-                elif 'reception' in name and 'yard' not in name:
-                    parsed_stats['receptions'] = value
-                elif 'target' in name:
-                    parsed_stats['receiving_targets'] = value
+        for stat in stat_group.get('stats', []):
+            name = stat.get('name', '')
+            column = columns.get(name)
+            if column is None:
+                column = columns.get(name.lower())
+            if column is None:
+                unknown.append((category, name))
+            else:
+                parsed_stats[column] = stat.get('value', 0)
+    
+    if unknown:
+        with unknown_stats_lock:
+            UNKNOWN_STATS.update(unknown)
     
     return parsed_stats
 
-import time
+def fetch_concurrently(players, fetch, max_workers=8):
+    """
+    Run fetch(espn_id, session, throttle) for (team_jersey, player_info) pairs on a bounded worker pool
+    Yields (team_jersey, player_info, result) as each request completes
+
+    All workers share one pooled session and one AdaptiveThrottle, so the
+    request rate follows ESPN's latency and 429/5xx responses instead of a
+    fixed sleep. At most 2 x max_workers players are in flight at once.
+    """
+    session = make_session(pool_size=max_workers)
+    throttle = AdaptiveThrottle()
+    players = iter(players)
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {}
+        
+        def submit_next():
+            for team_jersey, player_info in players:
+                future = executor.submit(fetch, player_info['espn_id'], session, throttle)
+                pending[future] = (team_jersey, player_info)
+                return True
+            return False
+        
+        while len(pending) < 2 * max_workers and submit_next():
+            pass
+        
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                team_jersey, player_info = pending.pop(future)
+                yield team_jersey, player_info, future.result()
+                submit_next()
+    
+    session.close()
+
+def fetch_stats_concurrently(players, week=3, season=2025, max_workers=8):
+    """Fetch one week of stats per player, yielding (team_jersey, player_info, stats)"""
+    def fetch(espn_id, session, throttle):
+        return fetch_player_stats(espn_id, week, season, session, throttle)
+    return fetch_concurrently(players, fetch, max_workers)
+
+def skill_players(player_lookup):
+    """(team_jersey, player_info) pairs worth fetching stats for"""
+    # Only fetch stats for skill position players
+    return [
+        (team_jersey, player_info) for team_jersey, player_info in player_lookup.items()
+        if player_info.get('espn_id') and player_info.get('position', '') in SKILL_POSITIONS
+    ]
 
-def scrape_week3_stats():
-    """Scrape Week 3 stats for all players"""
-    print("Fetching Week 3 stats...")
+def shard_players(players, shard=None):
+    """
+    This process's share of (team_jersey, player_info) pairs
+    shard is (index, count); each player lands in exactly one of the count
+    shards by a stable hash of team_jersey, so processes never overlap
+    """
+    if not shard:
+        return list(players)
+    index, count = shard
+    if not 0 <= index < count:
+        raise ValueError(f"Shard index {index} is not in 0..{count - 1}")
+    return [(team_jersey, player_info) for team_jersey, player_info in players
+            if zlib.crc32(team_jersey.encode()) % count == index]
+
+def checkpoint_status(status, final):
+    """
+    Checkpoint status for a fetch_gamelog_status result
+    A fetch made before the run's last week is over is only 'partial':
+    the games may still be in progress, so the player is fetched again
+    """
+    if status == 'failed':
+        return 'failed'
+    return 'done' if final else 'partial'
+
+def pending_players(players, checkpoints, max_age_hours=None, now=None):
+    """
+    Players a run still has to fetch: never attempted, failed, fetched while
+    the week was in progress ('partial'), or (with max_age_hours) last
+    fetched longer ago than that
+    """
+    cutoff = (now or datetime.now()) - timedelta(hours=max_age_hours) if max_age_hours is not None else None
+    pending = []
+    for team_jersey, player_info in players:
+        checkpoint = checkpoints.get(team_jersey)
+        if (checkpoint is None or checkpoint[0] != 'done'
+                or (cutoff and datetime.fromisoformat(checkpoint[1]) < cutoff)):
+            pending.append((team_jersey, player_info))
+    return pending
+
+def checkpointed_players(run, players, db_path, shard=None, max_age_hours=None):
+    """Shard the players, then drop everyone the run's checkpoints already cover"""
+    players = shard_players(players, shard)
+    conn = get_connection(db_path)
+    checkpoints = load_checkpoints(run, conn)
+    conn.close()
     
-    player_lookup = load_player_lookup()
+    pending = pending_players(players, checkpoints, max_age_hours)
+    print(f"{run}: {len(players) - len(pending)} players already done, {len(pending)} to fetch"
+          + (f" (shard {shard[0]}/{shard[1]})" if shard else ""))
+    return pending
+
+@metrics.timed('scrape_week_stats')
+def scrape_week3_stats(week=3, season=2025, max_workers=8, db_path="fantasy_data.db",
+                       shard=None, max_age_hours=None):
+    """
+    Scrape Week 3 stats for all players
+    Progress is checkpointed per player, so a rerun after a crash or a
+    rate-limit stall only fetches players that were never finished or failed.
+    Until the week is over (see completed_weeks) nobody is marked done.
+    shard=(index, count) splits the players across processes without overlap.
+    """
+    print(f"Fetching Week {week} stats...")
+    
+    player_lookup = load_player_lookup(db_path)
     if not player_lookup:
         print("No player lookup data found. Run player_lookup.py first.")
         return
     
-    conn = sqlite3.connect("fantasy_data.db")
-    cursor = conn.cursor()
+    run = f"week:{season}:{week}"
+    players = checkpointed_players(run, skill_players(player_lookup), db_path, shard, max_age_hours)
+    final = week <= completed_weeks(season)
+    
+    def fetch(espn_id, session, throttle):
+        return fetch_gamelog_status(espn_id, season, session, throttle)
     
     successful_fetches = 0
     failed_fetches = 0
     
-    for team_jersey, player_info in player_lookup.items():
-        espn_id = player_info.get('espn_id')
-        if not espn_id:
-            continue
-            
-        # Only fetch stats for skill position players
-        position = player_info.get('position', '')
-        if position not in ['QB', 'RB', 'WR', 'TE']:
-            continue
-        
-        # Add delay to avoid rate limiting
-        time.sleep(0.5)
-        
-        try:
-            stats = fetch_player_stats(espn_id, week=3)
-            if stats:
-                # Database insertion code here
+    # Rows stream to the writer thread as each fetch completes
+    with StatsWriter(db_path) as writer:
+        for team_jersey, player_info, (status, weeks) in fetch_concurrently(players, fetch, max_workers):
+            game = weeks.get(week) if weeks else None
+            if game:
+                writer.put({'date': game['date'], 'season': season, 'week': week,
+                            'team_jersey': team_jersey, **game['stats']})
                 successful_fetches += 1
                 print(f"✓ {player_info['name']}")
             else:
                 failed_fetches += 1
-                
-        except Exception as e:
-            print(f"✗ Failed: {player_info['name']} - {e}")
-            failed_fetches += 1
-            continue
-
-    conn.commit()
-    conn.close()
+            # No game that week (bye, injury, 404) is a finished player too
+            writer.checkpoint(run, team_jersey, checkpoint_status(status, final))
     
     print(f"Successfully fetched stats for {successful_fetches} players")
     print(f"Failed to fetch stats for {failed_fetches} players")
+    print(f"Stored {writer.rows_written} weekly stat rows")
+
+@metrics.timed('scrape_season_stats')
+def scrape_season_stats(season=2025, through_week=None, max_workers=8, db_path="fantasy_data.db",
+                        shard=None, max_age_hours=None, player_lookup=None):
+    """
+    Ingest every completed week of a season with one gamelog request per player
+    Players already fetched for this season and through_week are skipped by
+    their checkpoints. A fetched player's weeks through through_week are all
+    upserted, so stat corrections and lines stored mid-week are replaced;
+    insert_player_stats leaves unchanged rows (and their updated_at) alone.
+    Checkpointing and sharding work as in scrape_week3_stats.
+    An already open player_lookup can be passed in.
+    """
+    if through_week is None:
+        through_week = completed_weeks(season)
+    print(f"Fetching {season} stats through Week {through_week}...")
+    
+    player_lookup = player_lookup if player_lookup is not None else load_player_lookup(db_path)
+    if not player_lookup:
+        print("No player lookup data found. Run player_lookup.py first.")
+        return
+    
+    run = f"season:{season}:{through_week}"
+    players = checkpointed_players(run, skill_players(player_lookup), db_path, shard, max_age_hours)
+    final = through_week <= completed_weeks(season)
+    
+    def fetch(espn_id, session, throttle):
+        return fetch_gamelog_status(espn_id, season, session, throttle)
+    
+    fetched_players = 0
+    
+    with StatsWriter(db_path) as writer:
+        for team_jersey, player_info, (status, weeks) in fetch_concurrently(players, fetch, max_workers):
+            if weeks:
+                fetched_players += 1
+                
+                # Fills gaps too, e.g. earlier weeks of a player first stored by a single-week scrape
+                for week, game in sorted(weeks.items()):
+                    if week <= through_week:
+                        writer.put({'date': game['date'], 'season': season, 'week': week,
+                                    'team_jersey': team_jersey, **game['stats']})
+            writer.checkpoint(run, team_jersey, checkpoint_status(status, final))
+    
+    print(f"Fetched gamelogs for {fetched_players} players")
+    print(f"Stored {writer.rows_written} weekly stat rows")
 
 if __name__ == "__main__":
-    scrape_week3_stats()
\ No newline at end of file
+    import sys
+    
+    # python stats_scraper.py [index/count], e.g. 0/4 ... 3/4 in four processes
+    shard = tuple(int(part) for part in sys.argv[1].split('/')) if len(sys.argv) > 1 else None
+    scrape_week3_stats(shard=shard)
\ No newline at end of file
@@ -0,0 +1,130 @@
+import contextlib
+import io
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from database import get_connection, insert_player_stats
+from correlations import update_correlations, pair_correlation, week_opponents, SHRINK_GAMES, MIN_GAMES
+
+TEAMS = ['KC', 'BAL', 'BUF', 'MIA']
+POSITIONS = {'1': 'QB', '2': 'WR', '3': 'WR', '4': 'TE'}
+OPENER = date(2025, 9, 4)
+
+def schedule(week):
+    """{team: opponent} - KC meets the other three teams in turn"""
+    order = [TEAMS[0]] + TEAMS[1:][week % 3:] + TEAMS[1:][:week % 3]
+    return {order[0]: order[1], order[1]: order[0], order[2]: order[3], order[3]: order[2]}
+
+def add_week(conn, week, rng):
+    slate_date = OPENER + timedelta(weeks=week - 1, days=1)
+    game_date = (slate_date + timedelta(days=3)).isoformat()
+    opponents = schedule(week)
+    game = {team: rng.standard_normal() for team in TEAMS}
+    stats, weekly = [], []
+    for team in TEAMS:
+        shared = game[team] + game[opponents[team]]
+        for jersey, position in POSITIONS.items():
+            yards = max(0, int(60 + 20 * shared + 15 * rng.standard_normal()))
+            column = 'passing_yards' if position == 'QB' else 'receiving_yards'
+            stats.append({'date': game_date, 'season': 2025, 'week': week, 'team_jersey': f"{team}_{jersey}",
+                          column: yards * 4 if position == 'QB' else yards})
+            weekly.append((slate_date.isoformat(), f"{team}_{jersey}", opponents[team]))
+    insert_player_stats(stats, conn)
+    conn.executemany('''
+        INSERT INTO weekly_data (date, slate_id, team_jersey, salary, projected_fpts, opponent)
+        VALUES (?, 8602, ?, 5000, 10, ?)
+    ''', weekly)
+    conn.commit()
+
+@pytest.fixture
+def db_path(tmp_path):
+    db_path = str(tmp_path / 'fantasy_data.db')
+    conn = get_connection(db_path)
+    conn.executemany("INSERT INTO players (team_jersey, name, position, team) VALUES (?, ?, ?, ?)",
+                     [(f"{team}_{jersey}", f"{team} {jersey}", position, team)
+                      for team in TEAMS for jersey, position in POSITIONS.items()])
+    rng = np.random.default_rng(11)
+    for week in range(1, 7):
+        add_week(conn, week, rng)
+    conn.close()
+    return db_path
+
+def update(*args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return update_correlations(*args, **kwargs)
+
+def stored(db_path):
+    conn = get_connection(db_path)
+    rows = conn.execute('''
+        SELECT player_a, player_b, relation, games, raw_correlation, correlation FROM player_correlations
+    ''').fetchall()
+    priors = {row[:3]: row[3] for row in conn.execute(
+        "SELECT relation, position_a, position_b, correlation FROM correlation_priors")}
+    conn.close()
+    return {row[:2]: row[2:] for row in rows}, priors
+
+def test_incremental_update_matches_a_full_rebuild(db_path):
+    assert update(db_path) == 6
+    conn = get_connection(db_path)
+    add_week(conn, 7, np.random.default_rng(12))
+    conn.close()
+    assert update(db_path) == 1
+    assert update(db_path) == 0
+    incremental, _ = stored(db_path)
+
+    assert update(db_path, rebuild=True) == 7
+    rebuilt, _ = stored(db_path)
+    assert incremental.keys() == rebuilt.keys()
+    for pair, (relation, games, raw, correlation) in rebuilt.items():
+        assert incremental[pair][:2] == (relation, games)
+        assert incremental[pair][3] == pytest.approx(correlation, abs=1e-4)
+
+def test_pairs_are_shrunk_toward_their_position_prior(db_path):
+    update(db_path)
+    pairs, priors = stored(db_path)
+    # Teammates share every game; opponents only the weeks they met
+    assert pairs[('KC_1', 'KC_2')][:2] == ('team', 6)
+    assert pairs[('BAL_1', 'KC_1')][:2] == ('opponent', 2)
+
+    for (a, b), (relation, games, raw, correlation) in pairs.items():
+        prior = priors[(relation, *sorted((POSITIONS[a[-1]], POSITIONS[b[-1]])))]
+        if games < MIN_GAMES:
+            assert raw is None
+            assert correlation == pytest.approx(prior, abs=1e-4)
+        else:
+            expected = (games * raw + SHRINK_GAMES * prior) / (games + SHRINK_GAMES)
+            assert correlation == pytest.approx(expected, abs=2e-4)
+
+def test_team_comes_from_the_key_not_the_current_roster(db_path):
+    # KC_2 signs with BAL: the players row moves, his KC games stay KC games
+    conn = get_connection(db_path)
+    with conn:
+        conn.execute("UPDATE players SET team = 'BAL' WHERE team_jersey = 'KC_2'")
+    conn.close()
+    update(db_path)
+    pairs, _ = stored(db_path)
+    assert pairs[('KC_1', 'KC_2')][:2] == ('team', 6)
+    assert pairs[('BAL_1', 'KC_2')][0] == 'opponent'
+
+def test_pair_correlation_priors_need_a_shared_game(db_path):
+    update(db_path)
+    conn = get_connection(db_path)
+    conn.executemany("INSERT INTO players (team_jersey, name, position, team) VALUES (?, ?, ?, ?)",
+                     [('KC_9', 'New WR', 'WR', 'KC'), ('BUF_9', 'New QB', 'QB', 'BUF')])
+    pairs, priors = stored(db_path)
+    opponents = week_opponents(conn)
+
+    # A stored pair comes back as is
+    assert pair_correlation('KC_2', 'KC_1', conn) == pairs[('KC_1', 'KC_2')][3]
+    # Teammates without a shared game get the teammate prior
+    assert pair_correlation('KC_9', 'KC_1', conn) == priors[('team', 'QB', 'WR')]
+    # Opponents only when their teams meet that week
+    assert opponents[(2025, 6, 'KC')] != 'BUF'
+    assert pair_correlation('KC_9', 'BUF_9', conn, week=(2025, 6)) is None
+    meet = next(week for week in range(1, 7) if opponents[(2025, week, 'KC')] == 'BUF')
+    assert pair_correlation('KC_9', 'BUF_9', conn, week=(2025, meet)) == priors[('opponent', 'QB', 'WR')]
+    # Unknown players have no prior
+    assert pair_correlation('KC_9', 'NYJ_1', conn) is None
+    conn.close()
@@ -0,0 +1,203 @@
+import json
+import sqlite3
+import time
+
+import pytest
+
+from database import (get_connection, load_checkpoints, diff_players, apply_player_diff, StatsWriter,
+                      SCHEMA_VERSION, STAT_COLUMNS)
+from player_lookup import PlayerLookup
+
+def legacy_database(db_path):
+    """weekly_data as old versions created it: no slate_id, no natural key, duplicate rows"""
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+        CREATE TABLE weekly_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            team_jersey TEXT NOT NULL,
+            salary REAL,
+            projected_fpts REAL,
+            actual_fpts REAL,
+            value_score REAL,
+            ownership_pct REAL,
+            opponent TEXT
+        )
+    ''')
+    conn.executemany("INSERT INTO weekly_data (date, team_jersey, salary) VALUES (?, ?, ?)", [
+        ('2025-09-26', 'KC_15', 7000), ('2025-09-26', 'KC_15', 7200), ('2025-09-26', 'BAL_8', 7500),
+    ])
+    conn.commit()
+    conn.close()
+
+def test_migration_dedupes_once_and_records_the_schema_version(tmp_path):
+    db_path = str(tmp_path / 'fantasy_data.db')
+    legacy_database(db_path)
+
+    conn = get_connection(db_path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    assert conn.execute("SELECT team_jersey, salary FROM weekly_data ORDER BY id").fetchall() == [
+        ('KC_15', 7200), ('BAL_8', 7500)]
+    assert 'slate_id' in {row[1] for row in conn.execute("PRAGMA table_info(weekly_data)")}
+
+    # Without the natural key a pre-versioning migration would dedupe again
+    conn.execute("DROP INDEX idx_weekly_data_natural_key")
+    conn.execute("INSERT INTO weekly_data (date, team_jersey, salary) VALUES ('2025-09-26', 'BAL_8', 7600)")
+    conn.commit()
+    conn.close()
+
+    conn = get_connection(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM weekly_data").fetchone()[0] == 3
+    conn.close()
+
+def test_new_database_is_created_at_the_current_version(tmp_path):
+    conn = get_connection(str(tmp_path / 'fantasy_data.db'))
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    assert conn.execute('''
+        SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_player_stats_natural_key'
+    ''').fetchone()
+    conn.close()
+
+def stat_row(team_jersey, week, receiving_yards):
+    return {'date': '2025-09-28', 'season': 2025, 'week': week, 'team_jersey': team_jersey,
+            'receiving_yards': receiving_yards, **{column: 0 for column in STAT_COLUMNS
+                                                   if column != 'receiving_yards'}}
+
+def test_stats_writer_saves_rows_and_checkpoints(tmp_path):
+    db_path = str(tmp_path / 'fantasy_data.db')
+    with StatsWriter(db_path, batch_size=2) as writer:
+        for week in (1, 2, 3):
+            writer.put(stat_row('KC_87', week, 50 + week))
+        writer.checkpoint('season:2025:3', 'KC_87', 'done')
+    assert writer.rows_written == 3
+
+    conn = get_connection(db_path)
+    assert conn.execute("SELECT week, receiving_yards FROM player_stats ORDER BY week").fetchall() == [
+        (1, 51), (2, 52), (3, 53)]
+    assert load_checkpoints('season:2025:3', conn)['KC_87'][0] == 'done'
+    conn.close()
+
+def test_stats_writer_raises_its_write_error(tmp_path):
+    writer = StatsWriter(str(tmp_path / 'missing' / 'fantasy_data.db'))
+    with pytest.raises(sqlite3.OperationalError):
+        with writer:
+            writer.queue.put(stat_row('KC_87', 1, 50))
+
+def test_stats_writer_keeps_the_body_exception(tmp_path):
+    # The writer fails too, but the caller's own error is the one that surfaces
+    with pytest.raises(ValueError, match='parse failed'):
+        with StatsWriter(str(tmp_path / 'missing' / 'fantasy_data.db')):
+            raise ValueError('parse failed')
+
+def test_stats_writer_flushes_queued_rows_when_the_body_fails(tmp_path):
+    db_path = str(tmp_path / 'fantasy_data.db')
+    with pytest.raises(KeyError):
+        with StatsWriter(db_path) as writer:
+            writer.put(stat_row('KC_87', 1, 50))
+            raise KeyError('KC_15')
+
+    conn = get_connection(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM player_stats").fetchone()[0] == 1
+    conn.close()
+
+ROSTER = {
+    'KC_15': {'name': 'Patrick Mahomes', 'position': 'QB', 'team': 'KC', 'jersey': '15', 'age': 30},
+    'KC_87': {'name': 'Travis Kelce', 'position': 'TE', 'team': 'KC', 'jersey': '87', 'age': 36},
+    'BAL_8': {'name': 'Lamar Jackson', 'position': 'QB', 'team': 'BAL', 'jersey': '8', 'age': 28},
+}
+
+def refreshed(conn, roster, teams=None):
+    diff = diff_players(roster, conn, teams)
+    apply_player_diff(diff, conn, changed_at='2025-10-01T00:00:00')
+    return diff
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'fantasy_data.db')
+
+@pytest.fixture
+def conn(db_path):
+    conn = get_connection(db_path)
+    refreshed(conn, ROSTER)
+    yield conn
+    conn.close()
+
+def test_diff_players_finds_added_changed_and_removed(conn):
+    roster = {key: dict(player) for key, player in ROSTER.items() if key != 'KC_87'}
+    roster['KC_15']['age'] = '31'   # ESPN sends strings, SQLite hands back ints
+    roster['KC_1'] = {'name': 'Xavier Worthy', 'position': 'WR', 'team': 'KC', 'jersey': '1'}
+
+    diff = diff_players(roster, conn)
+    assert list(diff['added']) == ['KC_1']
+    assert list(diff['changed']) == ['KC_15']
+    assert list(diff['removed']) == ['KC_87']
+    assert diff_players(ROSTER, conn) == {'added': {}, 'changed': {}, 'removed': {}}
+
+def test_diff_players_only_removes_from_fetched_teams(conn):
+    # BAL's roster failed to download - its players are not cut
+    diff = diff_players({'KC_15': ROSTER['KC_15'], 'KC_87': ROSTER['KC_87']}, conn)
+    assert diff['removed'] == {}
+    diff = diff_players({'KC_15': ROSTER['KC_15']}, conn, teams={'KC', 'BAL'})
+    assert sorted(diff['removed']) == ['BAL_8', 'KC_87']
+
+def test_apply_player_diff_logs_changed_fields(conn):
+    roster = {**ROSTER, 'KC_87': {**ROSTER['KC_87'], 'position': 'WR'}}
+    refreshed(conn, roster)
+    log = conn.execute('''
+        SELECT change, old_values, new_values FROM player_changes WHERE team_jersey = 'KC_87' ORDER BY id
+    ''').fetchall()
+    assert log == [('added', None, json.dumps(ROSTER['KC_87'])),
+                   ('changed', '{"position": "TE"}', '{"position": "WR"}')]
+
+def test_removed_players_stay_joinable(conn, db_path):
+    conn.execute('''
+        INSERT INTO weekly_data (date, slate_id, team_jersey, salary, projected_fpts)
+        VALUES ('2025-09-26', 8602, 'KC_87', 5000, 12.5)
+    ''')
+    conn.execute('''
+        INSERT INTO player_stats (date, season, week, team_jersey, receiving_yards)
+        VALUES ('2025-09-28', 2025, 4, 'KC_87', 80)
+    ''')
+    conn.commit()
+
+    diff = refreshed(conn, {key: player for key, player in ROSTER.items() if key != 'KC_87'})
+    assert list(diff['removed']) == ['KC_87']
+    assert conn.execute("SELECT active FROM players WHERE team_jersey = 'KC_87'").fetchone() == (0,)
+    assert conn.execute('''
+        SELECT p.name, p.position, s.receiving_yards FROM weekly_data w
+        JOIN players p ON p.team_jersey = w.team_jersey
+        JOIN player_stats s ON s.team_jersey = w.team_jersey
+    ''').fetchall() == [('Travis Kelce', 'TE', 80)]
+    # Gone from the lookup and from later diffs
+    lookup = PlayerLookup(db_path)
+    assert 'KC_87' not in lookup and len(lookup) == 2
+    lookup.close()
+    assert diff_players({key: player for key, player in ROSTER.items() if key != 'KC_87'}, conn) == {
+        'added': {}, 'changed': {}, 'removed': {}}
+
+def test_reused_key_is_reactivated(conn, db_path):
+    refreshed(conn, {key: player for key, player in ROSTER.items() if key != 'KC_87'})
+    signing = {'name': 'Noah Gray', 'position': 'TE', 'team': 'KC', 'jersey': '87'}
+    diff = refreshed(conn, {**ROSTER, 'KC_87': signing})
+
+    assert list(diff['added']) == ['KC_87']
+    assert conn.execute("SELECT name, active, age FROM players WHERE team_jersey = 'KC_87'").fetchone() == (
+        'Noah Gray', 1, None)
+    lookup = PlayerLookup(db_path)
+    assert lookup['KC_87']['name'] == 'Noah Gray'
+    lookup.close()
+
+def test_opening_a_current_database_does_not_wait_for_writers(tmp_path):
+    db_path = str(tmp_path / 'fantasy_data.db')
+    writer = get_connection(db_path)
+    writer.execute("BEGIN IMMEDIATE")
+    writer.execute("INSERT INTO players (team_jersey, name) VALUES ('KC_15', 'Patrick Mahomes')")
+
+    started = time.monotonic()
+    reader = get_connection(db_path)
+    assert reader.execute("SELECT COUNT(*) FROM players").fetchone() == (0,)
+    assert time.monotonic() - started < 1
+    writer.commit()
+    assert reader.execute("SELECT COUNT(*) FROM players").fetchone() == (1,)
+    reader.close()
+    writer.close()
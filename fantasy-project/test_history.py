@@ -0,0 +1,132 @@
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+from database import get_connection, insert_player_stats, diff_players, apply_player_diff
+from history import export_history, History, Dictionaries, season_week
+
+PLAYERS = {
+    'KC_15': {'name': 'Patrick Mahomes', 'position': 'QB', 'team': 'KC', 'jersey': '15'},
+    'KC_87': {'name': 'Travis Kelce', 'position': 'TE', 'team': 'KC', 'jersey': '87'},
+    'BAL_8': {'name': 'Lamar Jackson', 'position': 'QB', 'team': 'BAL', 'jersey': '8'},
+}
+
+@pytest.fixture
+def db_path(tmp_path):
+    db_path = str(tmp_path / 'fantasy_data.db')
+    conn = get_connection(db_path)
+    apply_player_diff(diff_players(PLAYERS, conn), conn, changed_at='2025-09-01T00:00:00')
+    conn.executemany('''
+        INSERT INTO weekly_data (date, slate_id, team_jersey, salary, projected_fpts, opponent)
+        VALUES (?, 8602, ?, ?, ?, ?)
+    ''', [('2025-09-26', 'KC_15', 7200, 22.0, 'BAL'), ('2025-09-26', 'KC_87', 5600, 12.5, 'BAL'),
+          ('2025-09-26', 'BAL_8', 7500, 23.0, '@KC'), ('2025-10-03', 'KC_15', 7300, 21.0, 'JAX')])
+    insert_player_stats([{'date': '2025-09-28', 'season': 2025, 'week': 4, 'team_jersey': 'KC_87',
+                          'receptions': 6, 'receiving_yards': 71}], conn)
+    conn.commit()
+    conn.close()
+    return db_path
+
+def export(root, db_path):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return export_history(str(root), db_path)
+
+def test_season_week_rolls_over_on_tuesday():
+    assert season_week('2025-09-04') == (2025, 1)
+    assert season_week('2025-09-08') == (2025, 1)
+    assert season_week('2025-09-09') == (2025, 2)
+    assert season_week('2026-01-04') == (2025, 18)
+
+def test_export_round_trips_the_rows(db_path, tmp_path):
+    root = tmp_path / 'history'
+    assert export(root, db_path) == {'weekly_data': [(2025, 4), (2025, 5)], 'player_stats': [(2025, 4)]}
+
+    history = History(str(root))
+    frame = history.frame('weekly_data', weeks=[4])
+    assert list(frame['team_jersey']) == ['KC_15', 'KC_87', 'BAL_8']
+    assert list(frame['team']) == ['KC', 'KC', 'BAL']
+    assert list(frame['position']) == ['QB', 'TE', 'QB']
+    assert frame['salary'].tolist() == [7200, 5600, 7500]
+    assert np.isnan(frame['actual_fpts']).all()
+    stats = history.frame('player_stats')
+    assert stats['receiving_yards'].tolist() == [71]
+
+def test_unchanged_partitions_are_skipped(db_path, tmp_path):
+    root = tmp_path / 'history'
+    export(root, db_path)
+    assert export(root, db_path) == {'weekly_data': [], 'player_stats': []}
+
+    conn = get_connection(db_path)
+    with conn:
+        conn.execute("UPDATE weekly_data SET ceiling_fpts = 30 WHERE date = '2025-10-03'")
+    conn.close()
+    assert export(root, db_path) == {'weekly_data': [(2025, 5)], 'player_stats': []}
+
+def test_changed_opponents_and_swapped_values_are_rewritten(db_path, tmp_path):
+    root = tmp_path / 'history'
+    export(root, db_path)
+
+    conn = get_connection(db_path)
+    with conn:
+        conn.execute("UPDATE weekly_data SET opponent = 'LAC' WHERE team_jersey = 'BAL_8'")
+    assert export(root, db_path) == {'weekly_data': [(2025, 4)], 'player_stats': []}
+    assert History(str(root)).frame('weekly_data', weeks=[4])['opponent'].tolist()[2] == 'LAC'
+
+    # Same totals, different rows
+    with conn:
+        conn.execute('''
+            UPDATE weekly_data SET salary = CASE team_jersey WHEN 'KC_15' THEN 5600 ELSE 7200 END
+            WHERE date = '2025-09-26' AND team_jersey IN ('KC_15', 'KC_87')
+        ''')
+    conn.close()
+    assert export(root, db_path) == {'weekly_data': [(2025, 4)], 'player_stats': []}
+    assert History(str(root)).frame('weekly_data', weeks=[4])['salary'].tolist() == [5600, 7200, 7500]
+
+def test_roster_changes_rewrite_the_partitions_of_that_player(db_path, tmp_path):
+    root = tmp_path / 'history'
+    export(root, db_path)
+
+    conn = get_connection(db_path)
+    moved = dict(PLAYERS, KC_87=dict(PLAYERS['KC_87'], position='WR'))
+    apply_player_diff(diff_players(moved, conn), conn, changed_at='2025-10-06T00:00:00')
+    conn.close()
+    assert export(root, db_path) == {'weekly_data': [(2025, 4)], 'player_stats': [(2025, 4)]}
+    assert list(History(str(root)).frame('player_stats')['position']) == ['WR']
+
+def test_team_comes_from_the_row_not_the_current_roster(db_path, tmp_path):
+    # KC_15 leaves the roster; his rows keep their team
+    conn = get_connection(db_path)
+    apply_player_diff(diff_players({'KC_87': PLAYERS['KC_87']}, conn, teams={'KC'}), conn)
+    conn.close()
+    root = tmp_path / 'history'
+    export(root, db_path)
+    assert list(History(str(root)).frame('weekly_data', weeks=[5])['team']) == ['KC']
+
+def test_dictionary_codes_never_change(db_path, tmp_path):
+    root = tmp_path / 'history'
+    export(root, db_path)
+    before = History(str(root)).dictionaries
+
+    conn = get_connection(db_path)
+    with conn:
+        conn.execute('''
+            INSERT INTO weekly_data (date, slate_id, team_jersey, salary, projected_fpts, opponent)
+            VALUES ('2025-09-19', 8602, 'BUF_17', 7800, 24.0, 'MIA')
+        ''')
+    conn.close()
+    export(root, db_path)
+    history = History(str(root))
+    after = history.dictionaries
+    for name, values in before.items():
+        assert after[name][:len(values)] == values
+    assert 'BUF_17' in after['player'][len(before['player']):]
+    # Partitions written before still decode to the same values
+    codes = history.column('weekly_data', 'team_jersey', weeks=[4])
+    assert list(history.decode('player', codes)) == ['KC_15', 'KC_87', 'BAL_8']
+
+def test_dictionaries_encode_missing_values_as_minus_one():
+    dictionaries = Dictionaries({'team': ['KC']})
+    assert dictionaries.encode('team', ['BAL', None, 'KC']).tolist() == [1, -1, 0]
+    assert dictionaries.values['team'] == ['KC', 'BAL']
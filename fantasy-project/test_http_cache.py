@@ -0,0 +1,139 @@
+import io
+import json
+import os
+
+import pytest
+import requests
+
+import http_cache
+from http_cache import HTTPCache, CacheMiss
+from http_client import get_json, stream_json_array
+
+URL = 'https://example.test/players'
+
+def make_response(status, body='', headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response.raw = io.BytesIO(body.encode())
+    response.encoding = 'utf-8'
+    response.headers.update(headers or {})
+    response.url = URL
+    return response
+
+class StubSession:
+    """Answers GETs from a list of responses and records the headers of each request"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, timeout=None, headers=None, stream=False):
+        self.requests.append(dict(headers or {}))
+        return self.responses.pop(0)
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(http_cache.time, 'time', lambda: now[0])
+    return now
+
+def test_fresh_entry_is_served_without_a_request(tmp_path, clock):
+    cache = HTTPCache(str(tmp_path), ttls=[('players', 60)])
+    session = StubSession(make_response(200, '[1, 2]', {'ETag': '"v1"'}))
+
+    assert get_json(session, URL, cache=cache) == [1, 2]
+    clock[0] += 59
+    assert get_json(session, URL, cache=cache) == [1, 2]
+    assert len(session.requests) == 1
+
+def test_expired_entry_is_revalidated_and_kept_on_304(tmp_path, clock):
+    cache = HTTPCache(str(tmp_path), ttls=[('players', 60)])
+    session = StubSession(
+        make_response(200, '[1, 2]', {'ETag': '"v1"', 'Last-Modified': 'Mon, 01 Sep 2025 00:00:00 GMT'}),
+        make_response(304, '', {'ETag': '"v2"'}),
+    )
+    get_json(session, URL, cache=cache)
+    clock[0] += 61
+
+    assert get_json(session, URL, cache=cache) == [1, 2]
+    assert session.requests[1] == {'If-None-Match': '"v1"',
+                                   'If-Modified-Since': 'Mon, 01 Sep 2025 00:00:00 GMT'}
+    entry = cache.get(URL)
+    assert entry['etag'] == '"v2"'
+    assert entry['last_modified'] == 'Mon, 01 Sep 2025 00:00:00 GMT'
+    # The 304 restarted the TTL
+    assert cache.is_fresh(entry, URL)
+
+def test_expired_entry_is_replaced_on_200(tmp_path, clock):
+    cache = HTTPCache(str(tmp_path), ttls=[('players', 60)])
+    session = StubSession(make_response(200, '[1]', {'ETag': '"v1"'}),
+                          make_response(200, '[1, 2, 3]', {'ETag': '"v2"'}))
+    get_json(session, URL, cache=cache)
+    clock[0] += 61
+
+    assert get_json(session, URL, cache=cache) == [1, 2, 3]
+    assert cache.get(URL)['body'] == '[1, 2, 3]'
+
+def test_default_ttl_applies_to_unmatched_urls(tmp_path):
+    cache = HTTPCache(str(tmp_path), ttls=[('gamelog', 3600)], default_ttl=5)
+    assert cache.ttl_for('https://example.test/athletes/1/gamelog') == 3600
+    assert cache.ttl_for(URL) == 5
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    entry_size = len(json.dumps({'url': 'https://example.test/0', 'stored_at': 1, 'etag': None,
+                                 'last_modified': None, 'body': '0' * 100}))
+    cache = HTTPCache(str(tmp_path), max_bytes=entry_size * 2 + 10)
+    urls = [f'https://example.test/{i}' for i in range(3)]
+    for i, url in enumerate(urls[:2]):
+        cache.write(url, {'url': url, 'stored_at': 1, 'etag': None, 'last_modified': None, 'body': '0' * 100})
+        os.utime(cache.path_for(url), (i, i))
+    # Reading the older entry makes the other one least recently used
+    assert cache.get(urls[0]) is not None
+
+    cache.write(urls[2], {'url': urls[2], 'stored_at': 1, 'etag': None, 'last_modified': None,
+                          'body': '0' * 100})
+    assert cache.get(urls[0]) is not None
+    assert cache.get(urls[1]) is None
+    assert cache.get(urls[2]) is not None
+    assert sum(cache.sizes.values()) <= cache.max_bytes
+
+def test_existing_entries_count_towards_the_size_limit(tmp_path):
+    cache = HTTPCache(str(tmp_path))
+    cache.write(URL, {'url': URL, 'stored_at': 1, 'body': '[]'})
+    assert list(HTTPCache(str(tmp_path)).sizes) == [cache.path_for(URL)]
+
+def test_offline_mode_serves_stale_entries_and_never_requests(tmp_path, clock):
+    cache = HTTPCache(str(tmp_path), ttls=[('players', 60)])
+    get_json(StubSession(make_response(200, '[1, 2]')), URL, cache=cache)
+    clock[0] += 3600
+
+    cache.cache_only = True
+    session = StubSession()
+    assert get_json(session, URL, cache=cache) == [1, 2]
+    with pytest.raises(CacheMiss):
+        get_json(session, 'https://example.test/unknown', cache=cache)
+    with pytest.raises(CacheMiss):
+        list(stream_json_array(session, 'https://example.test/unknown', cache=cache))
+    assert session.requests == []
+
+def test_streamed_response_is_spooled_into_the_cache(tmp_path):
+    cache = HTTPCache(str(tmp_path), ttls=[('players', 60)])
+    body = json.dumps([{'name': 'A "quoted" \\ name'}, {'name': 'B'}])
+    session = StubSession(make_response(200, body, {'ETag': '"v1"'}))
+
+    assert list(stream_json_array(session, URL, cache=cache, chunk_size=7)) == json.loads(body)
+    assert cache.get(URL)['body'] == body
+    assert cache.get(URL)['etag'] == '"v1"'
+    # Served from disk the second time
+    assert list(stream_json_array(session, URL, cache=cache, chunk_size=7)) == json.loads(body)
+    assert len(session.requests) == 1
+
+def test_abandoned_stream_leaves_no_entry(tmp_path):
+    cache = HTTPCache(str(tmp_path), ttls=[('players', 60)])
+    session = StubSession(make_response(200, json.dumps(list(range(100)))))
+
+    stream = stream_json_array(session, URL, cache=cache, chunk_size=8)
+    next(stream)
+    stream.close()
+    assert cache.get(URL) is None
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,119 @@
+import io
+import json
+import time
+
+import pytest
+import requests
+
+from http_client import iter_json_array, text_chunks, AdaptiveThrottle, request_with_retries
+
+ELEMENTS = [
+    {'firstName': 'Amon-Ra', 'lastName': 'St. Brown', 'salary': 8100, 'pts': 19.25},
+    {'note': 'brackets ] [ and braces } { in a string', 'escaped': 'quote \\" backslash \\\\ ]'},
+    [1, [2, [3, []]], {}],
+    -12.5e3, 0, True, None, 'plain',
+    {'unicode': 'Ja’Marr Chase é'},
+]
+BODY = ' \n[ ' + ',\n  '.join(json.dumps(element) for element in ELEMENTS) + ' ]\n'
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 5, 7, 16, 64, 4096])
+def test_every_chunk_size_gives_the_same_elements(chunk_size):
+    assert list(iter_json_array(text_chunks(BODY, chunk_size))) == ELEMENTS
+
+def test_every_split_point():
+    # Two chunks split anywhere - mid-number, mid-escape, mid-literal
+    for split in range(len(BODY) + 1):
+        assert list(iter_json_array([BODY[:split], BODY[split:]])) == ELEMENTS, split
+
+def test_numbers_cut_off_between_chunks_are_not_truncated():
+    assert list(iter_json_array(['[12', '34, 5', '6.', '75]'])) == [1234, 56.75]
+    assert list(iter_json_array(['[tr', 'ue,nu', 'll]'])) == [True, None]
+
+def test_empty_arrays_and_empty_chunks():
+    assert list(iter_json_array(['[]'])) == []
+    assert list(iter_json_array(['', ' [', '', ' ]', ''])) == []
+
+def test_elements_are_yielded_before_the_body_ends():
+    def chunks():
+        yield '[{"a": 1}, '
+        raise AssertionError("read past the first element")
+
+    assert next(iter_json_array(chunks())) == {'a': 1}
+
+@pytest.mark.parametrize('body', [
+    '[1 2]',
+    '[1,,2]',
+    '[,1]',
+    '[1,]',
+    '["a""b"]',
+    '[{"a": 1} {"b": 2}]',
+    '[1',
+    '[1,',
+    '[',
+    '',
+    '{"a": 1}',
+    '[1, nope]',
+])
+def test_malformed_input_raises(body):
+    for chunk_size in (1, 3, 4096):
+        with pytest.raises(ValueError):
+            list(iter_json_array(text_chunks(body, chunk_size)))
+
+def response(status, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response.raw = io.BytesIO(b'{}')
+    response.headers.update(headers or {})
+    response.url = 'https://example.test/gamelog'
+    return response
+
+class StubSession:
+    """Answers GETs from a list of responses"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+
+    def get(self, url, timeout=None, headers=None, stream=False):
+        return self.responses.pop(0)
+
+@pytest.mark.parametrize('status', [429, 500, 503, None])
+def test_throttle_backs_off_on_errors(status):
+    throttle = AdaptiveThrottle(max_delay=1.0, initial_delay=0.1)
+    throttle.record(status, 0.05)
+    assert throttle.delay == pytest.approx(0.2)
+    for _ in range(10):
+        throttle.record(status, 0.05)
+    assert throttle.delay == 1.0
+
+def test_throttle_decays_after_successes():
+    throttle = AdaptiveThrottle(min_delay=0.01, initial_delay=0.1)
+    throttle.record(429, 0.05)
+    for _ in range(40):
+        throttle.record(200, 0.05)
+    assert throttle.delay == pytest.approx(0.01)
+
+def test_throttle_slows_down_when_latency_climbs():
+    throttle = AdaptiveThrottle(initial_delay=0.1)
+    for _ in range(5):
+        throttle.record(200, 0.05)
+    fast = throttle.delay
+    for _ in range(10):
+        throttle.record(200, 2.0)
+    assert throttle.delay > fast
+
+def test_throttle_waits_out_retry_after():
+    throttle = AdaptiveThrottle(initial_delay=0)
+    throttle.record(429, 0.05, retry_after=0.2)
+    started = time.monotonic()
+    throttle.acquire()
+    assert time.monotonic() - started >= 0.18
+
+def test_retries_feed_the_throttle():
+    throttle = AdaptiveThrottle(initial_delay=0)
+    session = StubSession(response(429, {'Retry-After': '0.1'}), response(503), response(200))
+    started = time.monotonic()
+    assert request_with_retries(session, 'https://example.test/gamelog', rate_limiter=throttle,
+                                backoff=0).status_code == 200
+    # The 429's Retry-After was honoured; the errors raised the delay and the success eased it
+    assert time.monotonic() - started >= 0.09
+    assert throttle.delay == pytest.approx(0.05 * 2 * 0.8)
@@ -0,0 +1,108 @@
+import json
+import logging
+
+import pytest
+
+import metrics
+from database import get_connection, insert_player_stats
+from metrics import Registry, format_labels, endpoint
+
+def test_counters_add_up_per_label_set():
+    registry = Registry()
+    counter = registry.counter('requests_total', 'Requests')
+    counter.inc(status='200')
+    counter.inc(3, status='200')
+    counter.inc(status='404')
+    assert registry.counter('requests_total') is counter
+    assert sorted(counter.samples(), key=lambda sample: sample[0]['status']) == [
+        ({'status': '200'}, 4), ({'status': '404'}, 1)]
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    histogram = registry.histogram('latency_seconds', buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value, endpoint='a')
+    ((labels, cumulative, count, total),) = histogram.samples()
+    assert labels == {'endpoint': 'a'}
+    assert cumulative == [2, 3, 4]
+    assert (count, total) == (4, pytest.approx(3.65))
+
+def test_reset_keeps_metric_objects():
+    registry = Registry()
+    counter = registry.counter('rows_total')
+    counter.inc(5)
+    registry.reset()
+    assert counter.samples() == []
+    counter.inc()
+    assert registry.counter('rows_total').samples() == [({}, 1)]
+
+def test_snapshot_is_json_with_rows_per_second():
+    registry = Registry()
+    registry.counter('fantasy_rows_written_total').inc(500, table='player_stats')
+    registry.histogram('fantasy_write_seconds').observe(0.25, table='player_stats')
+    registry.histogram('fantasy_write_seconds').observe(0.25, table='player_stats')
+
+    snapshot = json.loads(json.dumps(registry.snapshot()))
+    assert snapshot['counters']['fantasy_rows_written_total'] == [
+        {'labels': {'table': 'player_stats'}, 'value': 500}]
+    (write_seconds,) = snapshot['histograms']['fantasy_write_seconds']
+    assert write_seconds['count'] == 2 and write_seconds['buckets']['+Inf'] == 2
+    assert snapshot['rows_per_second'] == {'player_stats': 1000.0}
+
+def test_prometheus_text_format():
+    registry = Registry()
+    registry.counter('b_total', 'Things counted').inc(2, kind='say "hi"\\')
+    registry.histogram('a_seconds', 'Latency', buckets=(1,)).observe(0.5)
+
+    assert registry.prometheus_text().splitlines() == [
+        '# HELP a_seconds Latency',
+        '# TYPE a_seconds histogram',
+        'a_seconds_bucket{le="1"} 1',
+        'a_seconds_bucket{le="+Inf"} 1',
+        'a_seconds_sum 0.5',
+        'a_seconds_count 1',
+        '# HELP b_total Things counted',
+        '# TYPE b_total counter',
+        'b_total{kind="say \\"hi\\"\\\\"} 2',
+    ]
+
+def test_labels_and_endpoints():
+    assert format_labels({}) == ''
+    assert format_labels({'a': 1, 'b': 'x'}) == '{a="1",b="x"}'
+    assert endpoint('http://site.api.espn.com/athletes/4241389/gamelog?x=1') == \
+        'site.api.espn.com/athletes/{id}/gamelog'
+
+def test_stage_times_and_logs_failures(caplog):
+    metrics.REGISTRY.reset()
+    with caplog.at_level(logging.INFO, logger='fantasy'):
+        with pytest.raises(KeyError):
+            with metrics.stage('load', source='test'):
+                raise KeyError('x')
+    ((labels, _, count, _),) = metrics.histogram('fantasy_stage_seconds').samples()
+    assert (labels, count) == ({'stage': 'load', 'source': 'test'}, 1)
+    assert json.loads(caplog.records[-1].getMessage())['status'] == 'error'
+
+def test_write_snapshot(tmp_path, monkeypatch):
+    metrics.REGISTRY.reset()
+    metrics.record_match('exact')
+    monkeypatch.delenv('FANTASY_METRICS_FILE', raising=False)
+    assert metrics.write_snapshot() is None
+
+    prom = metrics.write_snapshot(str(tmp_path / 'metrics.prom'))
+    with open(prom) as f:
+        assert 'fantasy_matches_total{match_type="exact"} 1' in f.read()
+    with open(metrics.write_snapshot(str(tmp_path / 'metrics.json'))) as f:
+        assert json.load(f)['counters']['fantasy_matches_total'][0]['value'] == 1
+
+def test_player_stats_writes_count_only_inserted_and_updated_rows(tmp_path):
+    conn = get_connection(str(tmp_path / 'fantasy_data.db'))
+    rows = [{'date': '2025-09-28', 'season': 2025, 'week': 4, 'team_jersey': key, 'receiving_yards': 50}
+            for key in ('KC_1', 'KC_87', 'KC_15')]
+    metrics.REGISTRY.reset()
+
+    assert insert_player_stats(rows, conn) == 3
+    rows[0] = {**rows[0], 'receiving_yards': 75}
+    assert insert_player_stats(rows, conn) == 1
+    assert insert_player_stats(rows, conn) == 0
+    conn.close()
+    assert metrics.counter('fantasy_rows_written_total').samples() == [({'table': 'player_stats'}, 4)]
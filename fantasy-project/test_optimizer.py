@@ -0,0 +1,84 @@
+from collections import Counter
+from itertools import combinations, product
+
+import numpy as np
+import pytest
+
+from optimizer import Slate, LineupOptimizer, ROSTER_CONFIGS, SLOTS
+
+SLATE_SIZES = {'QB': 2, 'RB': 4, 'WR': 5, 'TE': 3, 'DST': 2}
+
+def random_slate(seed):
+    rng = np.random.default_rng(seed)
+    keys, positions = [], []
+    for position, count in SLATE_SIZES.items():
+        for n in range(count):
+            keys.append(f"{position}{n}")
+            positions.append(position)
+    salaries = rng.integers(30, 90, len(keys)) * 100
+    projections = rng.uniform(2, 30, len(keys)).round(3)
+    return Slate(keys, positions, salaries, projections)
+
+def brute_force(slate, salary_cap):
+    """Every legal lineup as (projection, frozenset of keys), best first"""
+    by_position = {position: [i for i in range(len(slate))
+                              if slate.keys[i].startswith(position)] for position in SLATE_SIZES}
+    lineups = []
+    for config in ROSTER_CONFIGS:
+        for groups in product(*(combinations(by_position[position], count)
+                                for position, count in config.items())):
+            indexes = [i for group in groups for i in group]
+            if slate.salaries[indexes].sum() <= salary_cap:
+                lineups.append((slate.projections[indexes].sum(), frozenset(slate.keys[indexes])))
+    return sorted(lineups, key=lambda lineup: -lineup[0])
+
+def lineup_keys(lineup):
+    return frozenset(key for _, key in lineup['players'])
+
+@pytest.mark.parametrize('seed,salary_cap', [(1, 50000), (2, 45000), (3, 40000), (4, 38000)])
+def test_top_lineups_match_exhaustive_enumeration(seed, salary_cap):
+    slate = random_slate(seed)
+    expected = brute_force(slate, salary_cap)[:10]
+    lineups = LineupOptimizer(slate, salary_cap).optimize(num_lineups=10)
+
+    assert [lineup_keys(lineup) for lineup in lineups] == [keys for _, keys in expected]
+    assert ([lineup['projected_fpts'] for lineup in lineups]
+            == pytest.approx([value for value, _ in expected], abs=0.01))
+
+def test_lineups_respect_the_salary_cap_and_slots():
+    slate = random_slate(5)
+    positions = dict(zip(slate.keys, (key.rstrip('0123456789') for key in slate.keys)))
+    for lineup in LineupOptimizer(slate, 42000).optimize(num_lineups=20):
+        assert lineup['salary'] <= 42000
+        assert [slot for slot, _ in lineup['players']] == SLOTS
+        for slot, key in lineup['players']:
+            assert positions[key] in (('RB', 'WR', 'TE') if slot == 'FLEX' else (slot,))
+        assert len(lineup_keys(lineup)) == len(SLOTS)
+
+def test_exposure_uniqueness_and_exclusions():
+    slate = random_slate(6)
+    best = lineup_keys(LineupOptimizer(slate).optimize()[0])
+    excluded = sorted(best)[0]
+
+    lineups = LineupOptimizer(slate).optimize(num_lineups=6, max_exposure=0.5, min_unique=2,
+                                              exclude=[excluded])
+    exposure = Counter(key for lineup in lineups for key in lineup_keys(lineup))
+    assert excluded not in exposure
+    assert max(exposure.values()) <= 3
+    for a, b in combinations(map(lineup_keys, lineups), 2):
+        assert len(a - b) >= 2
+
+def test_slate_without_defenses_fills_the_other_slots():
+    slate = random_slate(7)
+    keep = [i for i, key in enumerate(slate.keys) if not key.startswith('DST')]
+    positions = [key.rstrip('0123456789') for key in slate.keys[keep]]
+    lineup = LineupOptimizer(Slate(slate.keys[keep], positions, slate.salaries[keep],
+                                   slate.projections[keep])).optimize()[0]
+    assert [slot for slot, _ in lineup['players']] == [slot for slot in SLOTS if slot != 'DST']
+
+def test_unfillable_slate_raises():
+    with pytest.raises(ValueError):
+        LineupOptimizer(Slate(['QB0', 'RB0'], ['QB', 'RB'], [5000, 5000], [20, 10]))
+
+def test_cap_too_low_for_any_lineup_returns_nothing():
+    assert LineupOptimizer(random_slate(8), salary_cap=20000).optimize(num_lineups=3) == []
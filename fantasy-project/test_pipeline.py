@@ -0,0 +1,88 @@
+import contextlib
+import io
+
+import pytest
+
+import pipeline
+from pipeline import PipelineContext, run_pipeline, rosters_fingerprint
+
+@pytest.fixture
+def context(tmp_path):
+    context = PipelineContext(str(tmp_path / 'fantasy_data.db'), date='2025-09-26')
+    yield context
+    context.close()
+
+def fake_stages(inputs, outcomes, calls):
+    """Stages a -> b -> c whose fingerprints and run results come from the inputs/outcomes dicts"""
+    def stage(name, dependencies):
+        def run(context):
+            calls.append(name)
+            outcome = outcomes.get(name)
+            if outcome == 'fail':
+                raise RuntimeError(f"{name} broke")
+            return outcome
+        return dependencies, lambda context: inputs.get(name), run
+    return {'a': stage('a', []), 'b': stage('b', ['a']), 'c': stage('c', ['b'])}
+
+def run(context, stages, force=()):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return run_pipeline(context, stages, force)
+
+def test_unchanged_fingerprints_are_skipped(context):
+    inputs, calls = {'a': 1, 'b': 1, 'c': 1}, []
+    stages = fake_stages(inputs, {}, calls)
+    assert run(context, stages) == {'a': 'done', 'b': 'done', 'c': 'done'}
+    assert run(context, stages) == {'a': 'skipped', 'b': 'skipped', 'c': 'skipped'}
+
+    # A changed input reruns that stage and everything downstream of it
+    inputs['b'] = 2
+    assert run(context, stages) == {'a': 'skipped', 'b': 'done', 'c': 'done'}
+    assert calls == ['a', 'b', 'c', 'b', 'c']
+    assert run(context, stages, force={'a'})['a'] == 'done'
+
+def test_partial_stages_stay_pending(context):
+    outcomes, calls = {'b': False}, []
+    stages = fake_stages({}, outcomes, calls)
+    assert run(context, stages) == {'a': 'done', 'b': 'partial', 'c': 'done'}
+    assert run(context, stages) == {'a': 'skipped', 'b': 'partial', 'c': 'skipped'}
+
+    del outcomes['b']
+    assert run(context, stages)['b'] == 'done'
+    assert run(context, stages)['b'] == 'skipped'
+    assert calls.count('b') == 3
+
+def test_failed_stages_block_downstream(context):
+    calls = []
+    results = run(context, fake_stages({}, {'b': 'fail'}, calls))
+    assert results == {'a': 'done', 'b': 'failed', 'c': 'blocked'}
+    assert calls == ['a', 'b']
+    # A failure is not recorded, so the next run tries it again
+    assert run(context, fake_stages({}, {}, calls))['b'] == 'done'
+
+def test_missing_dependencies_block_instead_of_spinning(context):
+    stages = fake_stages({}, {}, [])
+    del stages['a']
+    assert run(context, stages) == {'b': 'blocked', 'c': 'blocked'}
+
+def test_rosters_fingerprint_follows_the_stored_roster(context):
+    before = rosters_fingerprint(context)
+    with context.lock, context.conn:
+        context.conn.execute("INSERT INTO players (team_jersey, name, position, team) "
+                             "VALUES ('KC_15', 'Patrick Mahomes', 'QB', 'KC')")
+    assert rosters_fingerprint(context) != before
+
+def test_a_roster_change_is_not_followed_by_a_second_run(context, monkeypatch):
+    roster = {'KC_15': {'name': 'Patrick Mahomes', 'position': 'QB', 'team': 'KC', 'jersey': '15'}}
+    monkeypatch.setattr(pipeline, 'build_player_lookup', lambda: dict(roster))
+    calls = []
+    stages = {'rosters': pipeline.STAGES['rosters'], **fake_stages({}, {}, calls)}
+    stages['a'] = (['rosters'], *stages['a'][1:])
+
+    assert run(context, stages)['rosters'] == 'done'
+    # The recorded fingerprint is the roster the run left behind
+    assert run(context, stages) == {'rosters': 'skipped', 'a': 'skipped', 'b': 'skipped', 'c': 'skipped'}
+
+    roster['KC_87'] = {'name': 'Travis Kelce', 'position': 'TE', 'team': 'KC', 'jersey': '87'}
+    assert run(context, stages, force={'rosters'}) == {'rosters': 'done', 'a': 'done', 'b': 'done', 'c': 'done'}
+    assert run(context, stages)['a'] == 'skipped'
+    assert calls == ['a', 'b', 'c'] * 2
@@ -0,0 +1,293 @@
+import contextlib
+import io
+import json
+import re
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from config import ROTOWIRE_TO_ESPN_TEAM_IDS
+from player_lookup import (build_player_lookup, PlayerMatcher, NameResolver, PlayerLookup, canonical_name,
+                           save_player_lookup, load_player_lookup)
+
+ESPN_TO_ROTOWIRE = {espn_id: abbrev for abbrev, espn_id in ROTOWIRE_TO_ESPN_TEAM_IDS.items()}
+
+def fake_roster(espn_team_id):
+    """Two offense players and one player without a jersey for every team"""
+    abbrev = ESPN_TO_ROTOWIRE[espn_team_id]
+    return {
+        'athletes': [
+            {'position': 'offense', 'items': [
+                {'id': f"{espn_team_id}01", 'displayName': f"{abbrev} Quarterback", 'jersey': '1',
+                 'position': {'abbreviation': 'QB'}, 'displayHeight': "6' 2\"",
+                 'displayWeight': '220 lbs', 'age': 27},
+                {'id': f"{espn_team_id}02", 'displayName': f"{abbrev} Receiver", 'jersey': '11',
+                 'position': {'abbreviation': 'WR'}, 'age': 24},
+                {'id': f"{espn_team_id}03", 'displayName': f"{abbrev} Practice Squad",
+                 'position': {'abbreviation': 'WR'}},
+            ]},
+        ]
+    }
+
+class StubESPN:
+    """Local ESPN roster server that can fail the first N requests for chosen teams"""
+
+    def __init__(self, failures=None, status=503):
+        self.failures = dict(failures or {})
+        self.status = status
+        self.hits = {}
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                match = re.fullmatch(r'/teams/(\d+)/roster', self.path)
+                if not match:
+                    return self.reply(404, {})
+                team_id = int(match.group(1))
+
+                with stub.lock:
+                    stub.hits[team_id] = stub.hits.get(team_id, 0) + 1
+                    failing = stub.failures.get(team_id, 0) > 0
+                    if failing:
+                        stub.failures[team_id] -= 1
+
+                if failing:
+                    return self.reply(stub.status, {'error': 'try again'})
+                self.reply(200, fake_roster(team_id))
+
+            def reply(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def fast_fetch():
+    return dict(requests_per_second=1000, backoff=0.01, cache=False)
+
+def test_concurrent_fetch_matches_serial(fast_fetch):
+    with StubESPN() as stub:
+        serial = build_player_lookup(max_workers=1, base_url=stub.url, **fast_fetch)
+        concurrent = build_player_lookup(max_workers=8, base_url=stub.url, **fast_fetch)
+
+    assert concurrent == serial
+    assert list(concurrent) == list(serial)
+    assert len(concurrent) == 2 * len(ROTOWIRE_TO_ESPN_TEAM_IDS)
+    assert concurrent['KC_1'] == {
+        'name': 'KC Quarterback',
+        'position': 'QB',
+        'team': 'KC',
+        'jersey': '1',
+        'espn_id': '1201',
+        'height': "6' 2\"",
+        'weight': '220 lbs',
+        'age': 27,
+    }
+
+def test_transient_failures_are_retried(fast_fetch):
+    kc, buf = ROTOWIRE_TO_ESPN_TEAM_IDS['KC'], ROTOWIRE_TO_ESPN_TEAM_IDS['BUF']
+    with StubESPN(failures={kc: 2, buf: 1}) as stub:
+        lookup = build_player_lookup(base_url=stub.url, retries=3, **fast_fetch)
+
+    assert 'KC_1' in lookup and 'BUF_11' in lookup
+    assert stub.hits[kc] == 3
+    assert stub.hits[buf] == 2
+
+def test_team_fails_after_retries_exhausted(fast_fetch, capsys):
+    kc = ROTOWIRE_TO_ESPN_TEAM_IDS['KC']
+    with StubESPN(failures={kc: 10}) as stub:
+        lookup = build_player_lookup(base_url=stub.url, retries=2, **fast_fetch)
+
+    assert not any(key.startswith('KC_') for key in lookup)
+    assert len(lookup) == 2 * (len(ROTOWIRE_TO_ESPN_TEAM_IDS) - 1)
+    assert stub.hits[kc] == 3
+    assert "Failed teams: KC" in capsys.readouterr().out
+
+def test_client_errors_are_not_retried(fast_fetch):
+    kc = ROTOWIRE_TO_ESPN_TEAM_IDS['KC']
+    with StubESPN(failures={kc: 10}, status=404) as stub:
+        lookup = build_player_lookup(base_url=stub.url, retries=3, **fast_fetch)
+
+    assert 'KC_1' not in lookup
+    assert stub.hits[kc] == 1
+
+ROSTER = {
+    'DET_14': {'name': 'Amon-Ra St. Brown', 'position': 'WR', 'team': 'DET', 'jersey': '14'},
+    'DET_26': {'name': 'Jahmyr Gibbs', 'position': 'RB', 'team': 'DET', 'jersey': '26'},
+    'ATL_17': {'name': 'A.J. Terrell Jr.', 'position': 'CB', 'team': 'ATL', 'jersey': '17'},
+    'ATL_8': {'name': 'Kyle Pitts Sr.', 'position': 'TE', 'team': 'ATL', 'jersey': '8'},
+}
+
+def test_canonical_name_drops_punctuation_and_suffixes():
+    assert canonical_name('A.J. Terrell Jr.') == canonical_name('AJ Terrell') == 'aj terrell'
+    assert canonical_name('Amon-Ra St. Brown') == 'amon ra st brown'
+
+def test_name_resolver_falls_back_to_fuzzy_and_remembers(tmp_path):
+    db_path = str(tmp_path / 'fantasy_data.db')
+    resolver = NameResolver(PlayerMatcher(ROSTER), db_path)
+
+    ((key, _, match_type),) = resolver.match('Amon-Ra St Brown', 'DET', 'WR')
+    assert (key, match_type) == ('DET_14', 'fuzzy')
+    # Restricted to the player's own team and position
+    assert resolver.match('Amon-Ra St Brown', 'ATL', 'WR') == []
+    assert resolver.fuzzy_match('Jahmyr Gibs', 'DET', 'WR') == []
+    assert resolver.save() == 1
+
+    reloaded = NameResolver(PlayerMatcher(ROSTER), db_path)
+    assert reloaded.match('Amon-Ra St Brown', 'DET', 'WR')[0][0] == 'DET_14'
+    assert reloaded.hits == 1
+
+MATCHER_ROSTER = {
+    'PIT_56': {'name': 'Alex Highsmith', 'position': 'LB', 'team': 'PIT', 'jersey': '56'},
+    'MIA_21': {'name': 'DeVon Smith', 'position': 'WR', 'team': 'MIA', 'jersey': '21'},
+    'NYJ_21': {'name': 'DeVon Smith', 'position': 'WR', 'team': 'NYJ', 'jersey': '21'},
+    'DET_14': {'name': 'Amon-Ra St. Brown', 'position': 'WR', 'team': 'DET', 'jersey': '14'},
+}
+
+def test_matcher_matches_whole_words_only():
+    matcher = PlayerMatcher(MATCHER_ROSTER)
+
+    keys = [key for key, _, _ in matcher.match('Smith')]
+    assert 'PIT_56' not in keys
+    assert keys == ['MIA_21', 'NYJ_21']
+    # A hyphenated surname part is a word of its own
+    assert [key for key, _, _ in matcher.match('Brown')] == ['DET_14']
+
+def test_matcher_ranks_exact_then_same_team():
+    matcher = PlayerMatcher(MATCHER_ROSTER)
+
+    assert [(key, kind) for key, _, kind in matcher.match('devon smith', 'NYJ')] == [
+        ('MIA_21', 'exact'), ('NYJ_21', 'exact')]
+    assert [(key, kind) for key, _, kind in matcher.match('Smith', 'NYJ')] == [
+        ('NYJ_21', 'partial_team'), ('MIA_21', 'partial')]
+
+def test_match_many_keeps_order_and_memoizes():
+    matcher = PlayerMatcher(MATCHER_ROSTER)
+    memo = {}
+    queries = [('Smith', 'NYJ'), ('Nobody Here', 'KC'), ('SMITH', 'NYJ')]
+
+    results = matcher.match_many(queries, memo)
+    assert results == [matcher.match(name, team) for name, team in queries]
+    assert results[1] == []
+    # 'Smith' and 'SMITH' normalize to the same query
+    assert len(memo) == 2
+    assert results[0] is results[2]
+
+def test_threads_sharing_a_resolver_match_each_player_once(tmp_path):
+    resolver = NameResolver(PlayerMatcher(MATCHER_ROSTER), str(tmp_path / 'fantasy_data.db'))
+    calls = []
+    match = resolver.matcher.match
+
+    def slow_match(name, team=None):
+        calls.append((name, team))
+        time.sleep(0.01)   # widen the window two unlocked threads would both miss the memo in
+        return match(name, team)
+
+    resolver.matcher.match = slow_match
+    memo = {}
+    queries = [('DeVon Smith', 'MIA', 'WR'), ('DeVon Smith', 'NYJ', 'WR'), ('Amon-Ra St. Brown', 'DET', 'WR')]
+    threads = [threading.Thread(target=resolver.match_many, args=(queries, memo)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(calls) == sorted((name, team) for name, team, _ in queries)
+    assert len(memo) == 3
+    assert resolver.save() == 3
+
+
+def test_player_lookup_reads_through_the_players_table(tmp_path):
+    db_path = str(tmp_path / 'fantasy_data.db')
+    with contextlib.redirect_stdout(io.StringIO()):
+        save_player_lookup(MATCHER_ROSTER, db_path)
+    lookup = PlayerLookup(db_path)
+
+    assert len(lookup) == 4
+    assert list(lookup) == list(MATCHER_ROSTER)
+    assert 'DET_14' in lookup and 'KC_15' not in lookup
+    assert lookup['DET_14']['name'] == 'Amon-Ra St. Brown'
+    assert lookup.get('KC_15') is None
+    with pytest.raises(KeyError):
+        lookup['KC_15']
+    assert {key: info['team'] for key, info in lookup.items()} == {
+        key: info['team'] for key, info in MATCHER_ROSTER.items()}
+
+    # Writes made while the lookup is open show up, length included
+    with contextlib.redirect_stdout(io.StringIO()):
+        save_player_lookup({**MATCHER_ROSTER, 'KC_15': {'name': 'Patrick Mahomes', 'position': 'QB',
+                                                        'team': 'KC', 'jersey': '15'}}, db_path)
+    assert len(lookup) == 5
+    assert lookup['KC_15']['position'] == 'QB'
+    lookup.close()
+
+def test_player_lookup_of_a_new_database_is_empty(tmp_path):
+    lookup = PlayerLookup(str(tmp_path / 'empty.db'))
+    assert len(lookup) == 0
+    assert not lookup
+    assert list(lookup.items()) == []
+    # Anything else is a real error
+    with pytest.raises(sqlite3.OperationalError):
+        lookup.query("SELEC 1")
+    lookup.close()
+
+def test_legacy_json_is_imported_once(tmp_path):
+    db_path = str(tmp_path / 'fantasy_data.db')
+    legacy_json = tmp_path / 'player_lookup.json'
+    legacy_json.write_text(json.dumps(MATCHER_ROSTER))
+
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        lookup = load_player_lookup(db_path, str(legacy_json))
+    assert 'Importing' in output.getvalue()
+    assert dict(lookup.items()).keys() == MATCHER_ROSTER.keys()
+    assert lookup['MIA_21']['jersey'] == '21'
+    lookup.close()
+
+    # Already in the database - the JSON file is not read again
+    legacy_json.write_text('not json')
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        lookup = load_player_lookup(db_path, str(legacy_json))
+    assert 'Importing' not in output.getvalue()
+    assert len(lookup) == 4
+    lookup.close()
+
+def test_name_resolver_only_returns_same_team_players(tmp_path):
+    resolver = NameResolver(PlayerMatcher(MATCHER_ROSTER), str(tmp_path / 'fantasy_data.db'))
+
+    assert [(key, kind) for key, _, kind in resolver.match('DeVon Smith', 'NYJ', 'WR')] == [('NYJ_21', 'exact')]
+    # Namesakes on other rosters are not a fallback
+    assert resolver.match('DeVon Smith', 'BUF', 'WR') == []
+    assert resolver.match('Smith', 'PIT', 'LB') == []
+    assert list(resolver.pending) == [('devon smith', 'NYJ')]
+
+def test_fuzzy_ties_go_to_the_first_player_in_lookup_order(tmp_path):
+    jon = ('BUF_10', {'name': 'Jon Smith', 'position': 'WR', 'team': 'BUF', 'jersey': '10'})
+    jan = ('BUF_11', {'name': 'Jan Smith', 'position': 'WR', 'team': 'BUF', 'jersey': '11'})
+    db_path = str(tmp_path / 'fantasy_data.db')
+
+    for roster, expected in [((jon, jan), 'BUF_10'), ((jan, jon), 'BUF_11')]:
+        resolver = NameResolver(PlayerMatcher(dict(roster)), db_path)
+        ((key, _, match_type),) = resolver.fuzzy_match('Jen Smith', 'BUF', 'WR')
+        assert (key, match_type) == (expected, 'fuzzy')
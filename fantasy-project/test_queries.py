@@ -0,0 +1,63 @@
+import contextlib
+import io
+
+import pytest
+
+import queries
+from database import create_database, get_connection
+
+PARAMS = {
+    'slate_by_date': ('2025-09-26',),
+    'player_history': ('KC_15',),
+    'player_stats_history': ('KC_15',),
+    'week_stats': (2025, 4),
+    'projection_vs_actual': ('2025-09-26',),
+    'player_changes_since': ('2025-09-01',),
+}
+
+@pytest.fixture
+def conn(tmp_path):
+    db_path = str(tmp_path / 'fantasy_data.db')
+    with contextlib.redirect_stdout(io.StringIO()):
+        create_database(db_path)
+    conn = get_connection(db_path)
+
+    conn.execute('''
+        INSERT INTO players (team_jersey, name, position, team, jersey)
+        VALUES ('KC_15', 'Patrick Mahomes', 'QB', 'KC', '15')
+    ''')
+    conn.execute('''
+        INSERT INTO weekly_data (date, slate_id, team_jersey, salary, projected_fpts, opponent)
+        VALUES ('2025-09-26', 8602, 'KC_15', 7200, 21.4, 'BAL')
+    ''')
+    conn.execute('''
+        INSERT INTO player_stats (date, season, week, team_jersey, passing_yards, passing_touchdowns)
+        VALUES ('2025-09-28', 2025, 4, 'KC_15', 270, 2)
+    ''')
+    conn.commit()
+    yield conn
+    conn.close()
+
+def test_every_query_is_covered():
+    assert set(PARAMS) == set(queries.QUERIES)
+
+@pytest.mark.parametrize('name', sorted(PARAMS))
+def test_query_plan_uses_indexes(conn, name):
+    plan = [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + queries.QUERIES[name], PARAMS[name])]
+
+    table_steps = [step for step in plan if step.startswith(('SCAN', 'SEARCH'))]
+    assert table_steps
+    for step in table_steps:
+        assert 'USING' in step and ('INDEX' in step or 'PRIMARY KEY' in step), f"{name}: {step}"
+
+def test_queries_return_rows(conn):
+    (slate,) = queries.slate_by_date('2025-09-26', conn)
+    assert slate[:3] == ('KC_15', 'Patrick Mahomes', 'QB')
+
+    assert len(queries.player_history('KC_15', conn)) == 1
+    assert len(queries.player_stats_history('KC_15', conn)) == 1
+    assert len(queries.week_stats(2025, 4, conn)) == 1
+
+    (row,) = queries.projection_vs_actual('2025-09-26', conn)
+    assert row[0] == 'KC_15'
+    assert row[6:9] == (2025, 4, 270)
@@ -0,0 +1,111 @@
+import contextlib
+import io
+import sqlite3
+
+import pytest
+
+from database import get_connection, insert_player_stats, STAT_COLUMNS
+from scoring import (fantasy_points, salary_tier_sql, score_weekly_data, projection_error_report,
+                     DK_RULES, FD_RULES, HALF_PPR_RULES)
+
+def stat_line(**stats):
+    return [stats.get(column, 0) for column in STAT_COLUMNS]
+
+QB_LINE = stat_line(passing_yards=300, passing_touchdowns=2, interceptions=1, rushing_yards=20)
+WR_LINE = stat_line(receptions=8, receiving_yards=100, receiving_touchdowns=1)
+
+def test_fantasy_points_per_rule_table():
+    assert fantasy_points([QB_LINE, WR_LINE], DK_RULES).tolist() == pytest.approx([24, 27])
+    assert fantasy_points([QB_LINE, WR_LINE], FD_RULES).tolist() == pytest.approx([21, 20])
+    assert fantasy_points([QB_LINE, WR_LINE], HALF_PPR_RULES).tolist() == pytest.approx([20, 20])
+
+def test_bonus_needs_the_threshold():
+    assert fantasy_points(stat_line(receiving_yards=99), DK_RULES).tolist() == pytest.approx([9.9])
+
+def test_salary_tiers():
+    conn = sqlite3.connect(':memory:')
+    sql = f"SELECT {salary_tier_sql('salary')} FROM (SELECT ? AS salary)"
+    tiers = [conn.execute(sql, (salary,)).fetchone()[0] for salary in (3000, 4000, 4999, 7500, 9000)]
+    assert tiers == ['<4000', '4000-4999', '4000-4999', '7000-7999', '8000+']
+
+@pytest.fixture
+def db_path(tmp_path):
+    db_path = str(tmp_path / 'fantasy_data.db')
+    conn = get_connection(db_path)
+    conn.executemany("INSERT INTO players (team_jersey, name, position, team) VALUES (?, ?, ?, ?)", [
+        ('KC_15', 'Patrick Mahomes', 'QB', 'KC'), ('KC_1', 'Xavier Worthy', 'WR', 'KC')])
+    conn.executemany('''
+        INSERT INTO weekly_data (date, slate_id, team_jersey, salary, projected_fpts)
+        VALUES ('2025-09-26', 8602, ?, ?, ?)
+    ''', [('KC_15', 7200, 20.0), ('KC_1', 4500, 15.0)])
+    insert_player_stats([
+        {'date': '2025-09-28', 'season': 2025, 'week': 4, 'team_jersey': 'KC_15',
+         **dict(zip(STAT_COLUMNS, QB_LINE))},
+        {'date': '2025-09-28', 'season': 2025, 'week': 4, 'team_jersey': 'KC_1',
+         **dict(zip(STAT_COLUMNS, WR_LINE))},
+    ], conn)
+    conn.commit()
+    conn.close()
+    return db_path
+
+def actual_fpts(db_path):
+    conn = get_connection(db_path)
+    rows = dict(conn.execute("SELECT team_jersey, actual_fpts FROM weekly_data"))
+    conn.close()
+    return rows
+
+def score(*args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return score_weekly_data(*args, **kwargs)
+
+def test_score_weekly_data_scores_only_stale_rows(db_path):
+    assert score(DK_RULES, db_path) == 2
+    assert actual_fpts(db_path) == {'KC_15': 24, 'KC_1': 27}
+    assert score(DK_RULES, db_path) == 0
+
+    # A stat correction rescores just that player
+    conn = get_connection(db_path)
+    insert_player_stats([{'date': '2025-09-28', 'season': 2025, 'week': 4, 'team_jersey': 'KC_1',
+                          **dict(zip(STAT_COLUMNS, WR_LINE)), 'receiving_touchdowns': 2}], conn)
+    conn.close()
+    assert score(DK_RULES, db_path) == 1
+    assert actual_fpts(db_path)['KC_1'] == 33
+
+def test_rescore_all_applies_new_rules(db_path):
+    score(DK_RULES, db_path)
+    assert score(FD_RULES, db_path, rescore_all=True) == 2
+    assert actual_fpts(db_path) == {'KC_15': 21, 'KC_1': 20}
+
+def test_projection_error_report(db_path):
+    score(DK_RULES, db_path)
+    report = {(row['position'], row['salary_tier']): row for row in projection_error_report(db_path)}
+    assert report[('QB', 'all')]['bias'] == 4
+    assert report[('WR', '4000-4999')] == {'position': 'WR', 'salary_tier': '4000-4999', 'players': 1,
+                                           'mae': 12, 'bias': 12}
+    assert projection_error_report(db_path, since='2025-10-01') == []
+
+def test_switching_rules_rescores_without_rescore_all(db_path):
+    score(DK_RULES, db_path)
+    assert score(FD_RULES, db_path) == 2
+    assert actual_fpts(db_path) == {'KC_15': 21, 'KC_1': 20}
+    assert score(FD_RULES, db_path) == 0
+
+def test_players_without_a_stat_line_in_a_completed_week_score_zero(db_path):
+    conn = get_connection(db_path)
+    conn.execute("INSERT INTO players (team_jersey, name, position, team) VALUES ('KC_87', 'T. Kelce', 'TE', 'KC')")
+    conn.execute('''
+        INSERT INTO weekly_data (date, slate_id, team_jersey, salary, projected_fpts)
+        VALUES ('2025-09-26', 8602, 'KC_87', 6000, 14.0), ('2099-09-26', 8602, 'KC_87', 6000, 14.0)
+    ''')
+    conn.commit()
+
+    # A week still to be played (or without stats yet) stays unscored
+    assert score(DK_RULES, db_path) == 3
+    assert conn.execute('''
+        SELECT date, actual_fpts FROM weekly_data WHERE team_jersey = 'KC_87' ORDER BY date
+    ''').fetchall() == [('2025-09-26', 0), ('2099-09-26', None)]
+    conn.close()
+
+    report = {(row['position'], row['salary_tier']): row for row in projection_error_report(db_path)}
+    assert report[('TE', 'all')]['players'] == 1
+    assert report[('TE', 'all')]['bias'] == -14
@@ -0,0 +1,53 @@
+import pytest
+
+from database import get_connection
+from scraper import store_weekly_data
+
+def slate_player(team_jersey, salary, fpts=10.0):
+    return {'team_jersey': team_jersey, 'salary': salary, 'fpts': fpts, 'value': fpts / salary * 1000,
+            'roster_pct': 5.0, 'opponent': 'BAL'}
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'fantasy_data.db')
+
+def test_store_weekly_data_counts_inserted_updated_and_unchanged(db_path):
+    players = [slate_player('KC_15', 7200), slate_player('KC_87', 5000), slate_player('KC_1', 4000)]
+    assert store_weekly_data(players, 8602, db_path) == {'inserted': 3, 'updated': 0, 'unchanged': 0}
+
+    players[1] = slate_player('KC_87', 5100)
+    players.append(slate_player('BAL_8', 7500))
+    assert store_weekly_data(players, 8602, db_path) == {'inserted': 1, 'updated': 1, 'unchanged': 2}
+    assert store_weekly_data(players, 8602, db_path) == {'inserted': 0, 'updated': 0, 'unchanged': 4}
+
+    conn = get_connection(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM weekly_data").fetchone()[0] == 4
+    assert conn.execute("SELECT salary FROM weekly_data WHERE team_jersey = 'KC_87'").fetchone()[0] == 5100
+    conn.close()
+
+def test_store_weekly_data_keeps_slates_apart(db_path):
+    players = [slate_player('KC_15', 7200)]
+    assert store_weekly_data(players, 8602, db_path)['inserted'] == 1
+    assert store_weekly_data(players, 8603, db_path)['inserted'] == 1
+
+def test_store_weekly_data_counts_a_repeated_player_once(db_path):
+    # Last match wins when two RotoWire entries resolve to the same player
+    players = [slate_player('KC_15', 7200), slate_player('KC_15', 7300)]
+    assert store_weekly_data(players, 8602, db_path) == {'inserted': 1, 'updated': 0, 'unchanged': 0}
+
+    conn = get_connection(db_path)
+    assert conn.execute("SELECT salary FROM weekly_data").fetchall() == [(7300,)]
+    conn.close()
+
+def test_store_weekly_data_batches_share_a_connection(db_path):
+    conn = get_connection(db_path)
+    first = store_weekly_data([slate_player('KC_15', 7200)], 8602, conn=conn)
+    second = store_weekly_data([slate_player('KC_15', 7200), slate_player('KC_87', 5000)], 8602, conn=conn)
+    assert (first['inserted'], second['inserted'], second['unchanged']) == (1, 1, 1)
+    conn.close()
+
+def test_store_weekly_data_under_a_given_date(db_path):
+    store_weekly_data([slate_player('KC_15', 7200)], 8602, db_path, date='2025-09-26')
+    conn = get_connection(db_path)
+    assert conn.execute("SELECT date FROM weekly_data").fetchall() == [('2025-09-26',)]
+    conn.close()
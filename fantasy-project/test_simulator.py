@@ -0,0 +1,116 @@
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+from database import get_connection, insert_player_stats
+from simulator import SlateSimulation, history_sd, load_simulation, simulate_slate, POSITION_CV
+
+# (key, position, team, opponent, projection)
+PLAYERS = [
+    ('KC_15', 'QB', 'KC', 'BAL', 22.0),
+    ('KC_87', 'TE', 'KC', 'BAL', 12.0),
+    ('KC_1', 'WR', 'KC', 'BAL', 14.0),
+    ('BAL_8', 'QB', 'BAL', '@KC', 24.0),
+    ('BAL_DST', 'DST', 'BAL', '@KC', 6.0),
+    ('BUF_17', 'QB', 'BUF', 'MIA', 23.0),
+    ('MIA_10', 'WR', 'MIA', '@BUF', 0.0),
+]
+
+def simulation(players=PLAYERS):
+    keys, positions, teams, opponents, projections = zip(*players)
+    sd = np.array(projections) * 0.5
+    return SlateSimulation(range(len(keys)), keys, positions, teams, opponents, projections, sd)
+
+@pytest.fixture(scope='module')
+def simulated():
+    sim = simulation()
+    sim.run(n_sims=40000, seed=7, chunk_size=15000)
+    return sim
+
+def test_draws_match_projection_means(simulated):
+    projections = np.array([player[4] for player in PLAYERS])
+    means = simulated.samples.mean(axis=0)
+    assert means[projections > 0] == pytest.approx(projections[projections > 0], rel=0.03)
+    # A zero projection never scores
+    assert not simulated.samples[:, simulated.index['MIA_10']].any()
+
+def test_draws_are_correlated_within_games(simulated):
+    logs = np.log(simulated.samples[:, :6])
+    corr = np.corrcoef(logs, rowvar=False)
+    index = simulated.index
+    # Teammates share the game and team factors, opponents only the game one
+    assert corr[index['KC_15'], index['KC_1']] > corr[index['KC_15'], index['BAL_8']] > 0.05
+    # Defenses lean against the game total
+    assert corr[index['BAL_DST'], index['KC_15']] < -0.05
+    # Different games are independent
+    assert abs(corr[index['KC_15'], index['BUF_17']]) < 0.02
+
+def test_seeded_runs_repeat():
+    first, second = simulation(), simulation()
+    assert np.array_equal(first.run(1000, seed=3), second.run(1000, seed=3))
+
+def test_score_lineups_sums_player_draws(simulated):
+    lineups = [['KC_15', 'KC_1'], ['BAL_8', 'BAL_DST'], ['BUF_17']]
+    scores, summary = simulated.score_lineups(lineups)
+    index = simulated.index
+    expected = simulated.samples[:, index['KC_15']] + simulated.samples[:, index['KC_1']]
+    assert np.allclose(scores[:, 0], expected, rtol=1e-5)
+    assert summary['win_rate'].sum() == pytest.approx(1)
+    assert summary['percentiles'].shape == (3, 3)
+
+def test_duplicate_players_are_rejected():
+    with pytest.raises(ValueError):
+        simulation(PLAYERS + [PLAYERS[0]])
+
+@pytest.fixture
+def db_path(tmp_path):
+    db_path = str(tmp_path / 'fantasy_data.db')
+    conn = get_connection(db_path)
+    conn.executemany("INSERT INTO players (team_jersey, name, position, team) VALUES (?, ?, ?, ?)",
+                     [(key, key, position, team) for key, position, team, _, _ in PLAYERS])
+    # KC_15 is on two slates of the same date with different projections
+    conn.executemany('''
+        INSERT INTO weekly_data (date, slate_id, team_jersey, opponent, projected_fpts, salary)
+        VALUES ('2025-09-26', ?, ?, ?, ?, 5000)
+    ''', [(8602, key, opponent, fpts) for key, _, _, opponent, fpts in PLAYERS]
+       + [(8603, 'KC_15', 'BAL', 18.0), (8603, 'BAL_8', '@KC', 20.0)])
+    conn.commit()
+    conn.close()
+    return db_path
+
+def test_load_simulation_needs_a_slate_when_the_date_has_several(db_path):
+    with pytest.raises(ValueError):
+        load_simulation('2025-09-26', db_path=db_path)
+    sim = load_simulation('2025-09-26', 8603, db_path)
+    assert sorted(sim.keys) == ['BAL_8', 'KC_15']
+    assert sim.mean[sim.index['KC_15']] == 18.0
+
+def test_simulate_slate_writes_percentiles_for_every_slate(db_path):
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulations = simulate_slate('2025-09-26', n_sims=2000, seed=1, db_path=db_path)
+    assert sorted(simulations) == [8602, 8603]
+
+    conn = get_connection(db_path)
+    rows = conn.execute('''
+        SELECT floor_fpts, median_fpts, ceiling_fpts FROM weekly_data
+        WHERE team_jersey = 'KC_15' ORDER BY slate_id
+    ''').fetchall()
+    conn.close()
+    assert all(floor <= median <= ceiling for floor, median, ceiling in rows)
+    # Each slate is drawn around its own projection
+    assert rows[0][1] > rows[1][1]
+
+def test_history_sd_shrinks_toward_the_position_prior(db_path):
+    conn = get_connection(db_path)
+    prior = history_sd(['KC_1'], ['WR'], [14.0], conn)
+    assert prior[0] == pytest.approx(POSITION_CV['WR'] * 14.0)
+
+    # Twelve identical games pull the spread well below the prior
+    insert_player_stats([{'date': f'2025-09-{day:02d}', 'season': 2025, 'week': week, 'team_jersey': 'KC_1',
+                          'receptions': 5, 'receiving_yards': 60}
+                         for week, day in zip(range(1, 13), range(1, 25, 2))], conn)
+    shrunk = history_sd(['KC_1'], ['WR'], [14.0], conn)
+    conn.close()
+    assert shrunk[0] == pytest.approx(prior[0] * np.sqrt(4 / 15))
@@ -0,0 +1,159 @@
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from config import ESPN_STAT_COLUMNS
+from database import get_connection, STAT_COLUMNS
+from http_client import AdaptiveThrottle
+import stats_scraper
+from stats_scraper import parse_gamelog, parse_stats, season_opener, completed_weeks
+
+def gamelog_event(week, year, date, receiving_yards):
+    return {
+        'week': {'number': week},
+        'season': {'year': year},
+        'gameDate': date,
+        'statistics': [
+            {'name': 'receiving', 'stats': [
+                {'name': 'receivingYards', 'value': receiving_yards},
+                {'name': 'receptions', 'value': 5},
+            ]},
+        ],
+    }
+
+def test_parse_gamelog_keys_weeks_of_the_season():
+    data = {'events': [
+        gamelog_event(1, 2025, '2025-09-07T17:00Z', 80),
+        gamelog_event(2, 2025, '2025-09-14T20:25Z', 45),
+        gamelog_event(18, 2024, '2025-01-05T18:00Z', 99),
+    ]}
+    weeks = parse_gamelog(data, season=2025)
+
+    assert sorted(weeks) == [1, 2]
+    assert weeks[1]['date'] == '2025-09-07'
+    assert weeks[1]['stats']['receiving_yards'] == 80
+    assert weeks[2]['stats']['receptions'] == 5
+
+def test_parse_gamelog_skips_events_without_a_week():
+    event = gamelog_event(1, 2025, '2025-09-07', 80)
+    del event['week']
+    assert parse_gamelog({'events': [event]}, season=2025) == {}
+    assert parse_gamelog({}, season=2025) == {}
+
+def test_season_opener_uses_config_then_the_thursday_after_labor_day():
+    assert season_opener(2025) == datetime(2025, 9, 4)
+    assert season_opener(2023) == datetime(2023, 9, 7)
+    assert season_opener(2026) == datetime(2026, 9, 10)
+
+def test_completed_weeks_for_a_season_without_a_configured_opener():
+    assert completed_weeks(2026, today=datetime(2026, 9, 1)) == 0
+    # Week 1 is complete once the Tuesday after the opener comes round
+    assert completed_weeks(2026, today=datetime(2026, 9, 14)) == 0
+    assert completed_weeks(2026, today=datetime(2026, 9, 15)) == 1
+    assert completed_weeks(2026, today=datetime(2027, 2, 1)) == 18
+
+def test_parse_stats_maps_every_configured_stat():
+    stats_data = {}
+    for (category, name), column in ESPN_STAT_COLUMNS.items():
+        stats_data.setdefault(category, []).append({'name': name, 'value': STAT_COLUMNS.index(column) + 1})
+    parsed = parse_stats([{'name': category, 'stats': stats} for category, stats in stats_data.items()])
+    assert parsed == {column: index + 1 for index, column in enumerate(STAT_COLUMNS)}
+
+def test_parse_stats_falls_back_to_lowercased_spellings():
+    parsed = parse_stats([
+        {'name': 'Rushing', 'stats': [{'name': 'RushingYards', 'value': 64}]},
+        {'name': 'receiving', 'stats': [{'name': 'receivingyards', 'value': 31}]},
+    ])
+    assert parsed['rushing_yards'] == 64
+    assert parsed['receiving_yards'] == 31
+
+def test_parse_stats_counts_unknown_stats():
+    stats_scraper.UNKNOWN_STATS.clear()
+    parsed = parse_stats([{'name': 'fumbles', 'stats': [{'name': 'fumblesLost', 'value': 1}]},
+                          {'name': 'passing', 'stats': [{'name': 'QBRating', 'value': 101.2}]}])
+    assert parsed == dict.fromkeys(STAT_COLUMNS, 0)
+    assert stats_scraper.UNKNOWN_STATS == {('fumbles', 'fumblesLost'): 1, ('passing', 'QBRating'): 1}
+
+PLAYERS = [(f"KC_{jersey}", {'name': f"Player {jersey}"}) for jersey in range(40)]
+
+def test_shards_cover_every_player_exactly_once():
+    shards = [stats_scraper.shard_players(PLAYERS, (index, 3)) for index in range(3)]
+    keys = [team_jersey for shard in shards for team_jersey, _ in shard]
+    assert sorted(keys) == sorted(team_jersey for team_jersey, _ in PLAYERS)
+    assert all(shards)
+    assert stats_scraper.shard_players(PLAYERS) == PLAYERS
+
+def test_invalid_shard_index_raises():
+    for shard in [(3, 3), (-1, 3)]:
+        with pytest.raises(ValueError):
+            stats_scraper.shard_players(PLAYERS, shard)
+
+def test_pending_players_refetches_failed_partial_and_stale():
+    now = datetime(2025, 10, 1, 12)
+    checkpoints = {
+        'KC_0': ('done', '2025-10-01T10:00:00'),
+        'KC_1': ('failed', '2025-10-01T10:00:00'),
+        'KC_2': ('partial', '2025-10-01T10:00:00'),
+        'KC_3': ('done', '2025-09-29T10:00:00'),
+    }
+    pending = [team_jersey for team_jersey, _ in
+               stats_scraper.pending_players(PLAYERS[:5], checkpoints, now=now)]
+    assert pending == ['KC_1', 'KC_2', 'KC_4']
+    pending = [team_jersey for team_jersey, _ in
+               stats_scraper.pending_players(PLAYERS[:5], checkpoints, max_age_hours=24, now=now)]
+    assert pending == ['KC_1', 'KC_2', 'KC_3', 'KC_4']
+
+def test_fetches_before_the_week_is_over_are_partial():
+    assert stats_scraper.checkpoint_status('done', final=True) == 'done'
+    assert stats_scraper.checkpoint_status('empty', final=True) == 'done'
+    assert stats_scraper.checkpoint_status('done', final=False) == 'partial'
+    assert stats_scraper.checkpoint_status('failed', final=True) == 'failed'
+
+def test_refetched_players_replace_stored_weeks(tmp_path, monkeypatch, capsys):
+    db_path = str(tmp_path / 'fantasy_data.db')
+    yards = {1: 40, 2: 12}
+
+    def fake_gamelog(espn_id, season, session, throttle):
+        return 'done', {week: {'date': f'2025-09-{week * 7:02d}', 'stats': {'receiving_yards': value}}
+                        for week, value in yards.items()}
+
+    monkeypatch.setattr(stats_scraper, 'fetch_gamelog_status', fake_gamelog)
+    lookup = {'KC_1': {'name': 'Xavier Worthy', 'espn_id': '4683062', 'position': 'WR'}}
+    stats_scraper.scrape_season_stats(2025, 2, max_workers=1, db_path=db_path, player_lookup=lookup)
+
+    # Week 2 was still being played (or ESPN corrected it) - the refetch replaces it
+    yards[2] = 87
+    stats_scraper.scrape_season_stats(2025, 2, max_workers=1, db_path=db_path, player_lookup=lookup,
+                                      max_age_hours=0)
+    assert 'Stored 1 weekly stat rows' in capsys.readouterr().out
+    conn = get_connection(db_path)
+    rows = conn.execute("SELECT week, receiving_yards FROM player_stats ORDER BY week").fetchall()
+    assert rows == [(1, 40), (2, 87)]
+    conn.close()
+
+def test_fetch_concurrently_returns_every_player_and_reports_failures(monkeypatch):
+    monkeypatch.setattr(stats_scraper, 'AdaptiveThrottle', lambda: AdaptiveThrottle(initial_delay=0))
+    players = [(f"KC_{n}", {'name': f"Player {n}", 'espn_id': str(n)}) for n in range(50)]
+    in_flight, most = [0], [0]
+    lock = threading.Lock()
+
+    def fetch(espn_id, session, throttle):
+        with lock:
+            in_flight[0] += 1
+            most[0] = max(most[0], in_flight[0])
+        time.sleep(0.002)
+        with lock:
+            in_flight[0] -= 1
+        if int(espn_id) % 7 == 0:
+            return 'failed', None
+        return 'done', {1: espn_id}
+
+    results = {team_jersey: result for team_jersey, _, result
+               in stats_scraper.fetch_concurrently(players, fetch, max_workers=4)}
+    assert sorted(results) == sorted(team_jersey for team_jersey, _ in players)
+    failed = sorted(key for key, (status, _) in results.items() if status == 'failed')
+    assert failed == sorted(f"KC_{n}" for n in range(0, 50, 7))
+    assert results['KC_3'] == ('done', {1: '3'})
+    assert most[0] <= 4